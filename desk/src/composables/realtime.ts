@@ -8,14 +8,25 @@ export function useActiveViewers(ticketId: string) {
   const { $socket } = globalStore();
 
   const { userId } = useAuthStore();
-  $socket.on("ticket_viewers", (data: { ticket_id: string; users: string }) => {
-    if (data.ticket_id === ticketId) {
-      const viewers = JSON.parse(data.users).filter(
-        (u: string) => u !== userId
-      );
-      currentViewers[ticketId] = viewers;
+  $socket.on(
+    "ticket_viewers",
+    (data: { ticket_id: string; users: string[] }) => {
+      if (data.ticket_id === ticketId) {
+        currentViewers[ticketId] = data.users.filter((u) => u !== userId);
+      }
     }
-  });
+  );
+
+  $socket.on(
+    "ticket_viewers_delta",
+    (data: { ticket_id: string; joined: string[]; left: string[] }) => {
+      if (data.ticket_id !== ticketId) return;
+      const viewers = new Set(currentViewers[ticketId] || []);
+      data.left.forEach((u) => viewers.delete(u));
+      data.joined.forEach((u) => u !== userId && viewers.add(u));
+      currentViewers[ticketId] = Array.from(viewers);
+    }
+  );
 
   const handleBeforeUnload = (_ticketId: string) => {
     $socket.emit("stop_view_ticket", _ticketId);
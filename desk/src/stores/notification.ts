@@ -27,10 +27,17 @@ export const useNotificationStore = defineStore("notification", () => {
     ],
     orderBy: "modified desc",
   });
+  const unreadCount = createResource({
+    url: "helpdesk.helpdesk.doctype.hd_notification.utils.get_unread_count",
+    auto: false,
+  });
   const clear = createResource({
     url: "helpdesk.helpdesk.doctype.hd_notification.utils.clear",
     auto: false,
-    onSuccess: () => resource.reload(),
+    onSuccess: () => {
+      resource.reload();
+      unreadCount.reload();
+    },
   });
 
   const read = (ticket: string) => {
@@ -40,12 +47,16 @@ export const useNotificationStore = defineStore("notification", () => {
       params: {
         ticket,
       },
-      onSuccess: () => resource.reload(),
+      onSuccess: () => {
+        resource.reload();
+        unreadCount.reload();
+      },
     });
   };
 
   const data = computed(() => resource.data || []);
-  const unread = computed(() => data.value.filter((d) => !d.read).length);
+  // Served from a Redis counter, the list itself is paginated
+  const unread = computed(() => unreadCount.data || 0);
 
   function toggle() {
     visible.value = !visible.value;
@@ -59,9 +70,16 @@ export const useNotificationStore = defineStore("notification", () => {
         user_to: ["=", authStore.userId],
       };
       resource.reload();
+      unreadCount.reload();
     },
     { immediate: true }
   );
+  $socket.on("helpdesk:notification-count", ({ count }) => {
+    if (isCustomerPortal.value) return;
+    if (count === unread.value) return;
+    unreadCount.setData(count);
+    resource.reload();
+  });
   $socket.on("helpdesk:comment-reaction-update", () => {
     if (isCustomerPortal.value) return;
     resource.reload();
@@ -711,5 +711,6 @@ declare global {
     date_format: string;
     time_format: string;
     session_user: string;
+    reference_data?: Record<string, any>;
   }
 }
@@ -2,22 +2,38 @@ from typing import Literal
 
 import frappe
 
+from helpdesk.helpdesk.doctype.hd_contact_search_term.hd_contact_search_term import (
+    search_contact_names,
+)
+
 
 @frappe.whitelist(methods=["GET"])
 def search_contacts(
     txt: str,
 ) -> list[dict[Literal["full_name", "name", "email_id"], str]]:
     doctype = "Contact"
-    or_filters: list[list[str]] = []
+    filters: list[list] = [[doctype, "email_id", "is", "set"]]
     search_fields = ["full_name", "email_id", "name"]
     if txt:
-        for field in search_fields:
-            or_filters.append([doctype, field, "like", f"%{txt}%"])
+        names = search_contact_names(txt, with_email=True)
+        if not names:
+            return []
+        filters.append([doctype, "name", "in", names])
+        # Permissions apply to all matches, which keep their match order
+        contacts = frappe.get_list(
+            doctype,
+            filters=filters,
+            fields=search_fields,
+            limit_page_length=0,
+            ignore_permissions=False,
+            strict=False,
+        )
+        rank = {name: i for i, name in enumerate(names)}
+        return sorted(contacts, key=lambda c: rank[c.name])[:10]
     return frappe.get_list(
         doctype,
-        filters=[[doctype, "email_id", "is", "set"]],
+        filters=filters,
         fields=search_fields,
-        or_filters=or_filters,
         limit_start=0,
         limit_page_length=10,
         order_by="email_id, full_name, name",
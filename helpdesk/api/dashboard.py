@@ -7,6 +7,7 @@ from frappe.query_builder import DocType
 from frappe.query_builder.functions import Avg, Count, Function
 from pypika import Case
 
+from helpdesk.reference_data import get_statuses
 from helpdesk.utils import agent_only, is_frappe_version
 
 HD_TICKET = "HD Ticket"
@@ -90,16 +91,8 @@ class HelpdeskDashboard:
         self.prev_from_date = frappe.utils.add_days(self.from_date, -self.diff)
         self.to_date_next = frappe.utils.add_days(self.to_date, 1)
 
-        self.open_statuses = frappe.get_all(
-            "HD Ticket Status",
-            filters={"category": "Open"},
-            pluck="name",
-        )
-        self.resolved_statuses = frappe.get_all(
-            "HD Ticket Status",
-            filters={"category": "Resolved"},
-            pluck="name",
-        )
+        self.open_statuses = get_statuses("Open")
+        self.resolved_statuses = get_statuses("Resolved")
 
     def _get_conditions(self):
         conds = []
@@ -1,19 +1,45 @@
+import base64
+import hashlib
+import json
+import re
+
 import frappe
 from frappe import _
 from frappe.desk.form.assign_to import set_status
 from frappe.model import no_value_fields
 from frappe.model.document import get_controller
+from frappe.utils import cint
 from frappe.utils.caching import redis_cache
 from pypika import Criterion
 
 from helpdesk.api.dashboard import COUNT_NAME
+from helpdesk.helpdesk.doctype.hd_ticket_seen.hd_ticket_seen import set_unread_flags
 from helpdesk.utils import (
     call_log_default_columns,
     check_permissions,
     contact_default_columns,
+    get_link_labels,
     parse_call_logs,
 )
 
+# seconds for which an exact `total_count` is reused in the "estimate" count mode
+LIST_COUNT_TTL = 60 * 5
+LIST_META_TTL = 60 * 60 * 24
+
+STANDARD_LIST_FIELDS = [
+    {"label": "Name", "type": "Data", "value": "name"},
+    {"label": "Created On", "type": "Datetime", "value": "creation"},
+    {"label": "Last Modified", "type": "Datetime", "value": "modified"},
+    {
+        "label": "Modified By",
+        "type": "Link",
+        "value": "modified_by",
+        "options": "User",
+    },
+    {"label": "Assigned To", "type": "Text", "value": "_assign"},
+    {"label": "Owner", "type": "Link", "value": "owner", "options": "User"},
+]
+
 
 @frappe.whitelist()
 def get_list_data(
@@ -28,6 +54,8 @@ def get_list_data(
     show_customer_portal_fields: bool = False,
     view: dict | None = None,
     is_default: bool = False,
+    cursor: str | None = None,
+    count_mode: str = "exact",
 ) -> dict:
     is_custom = False
 
@@ -45,9 +73,14 @@ def get_list_data(
     handle_at_me_support(filters)
 
     _list = get_controller(doctype)
-    default_rows = []
+    default_list_data = {}
     if hasattr(_list, "default_list_data"):
-        default_rows = _list.default_list_data().get("rows")
+        default_list_data = (
+            _list.default_list_data(show_customer_portal_fields)
+            if doctype == "HD Ticket"
+            else _list.default_list_data()
+        )
+    default_rows = default_list_data.get("rows")
 
     if columns or rows:
         is_default = False
@@ -78,11 +111,7 @@ def get_list_data(
             elif doctype == "TP Call Log":
                 columns = call_log_default_columns
             elif hasattr(_list, "default_list_data"):
-                columns = (
-                    _list.default_list_data(show_customer_portal_fields).get("columns")
-                    if doctype == "HD Ticket"
-                    else _list.default_list_data().get("columns")
-                )
+                columns = default_list_data.get("columns")
                 rows = default_rows
         else:
             [columns, rows] = handle_default_view(
@@ -104,56 +133,44 @@ def get_list_data(
 
     rows.append("name") if "name" not in rows else rows
     if doctype == "HD Ticket":
-        rows.append("_seen") if "_seen" not in rows else rows
-    data = (
-        frappe.get_list(
-            doctype,
-            fields=rows,
-            filters=filters,
-            order_by=order_by,
-            page_length=page_length,
+        rows.append("modified") if "modified" not in rows else rows
+
+    keyset = get_keyset_order(order_by)
+    if keyset and keyset[0] not in rows:
+        rows.append(keyset[0])
+
+    if cursor and keyset:
+        data = get_keyset_page(doctype, rows, filters, keyset, cursor, page_length)
+    else:
+        data = (
+            frappe.get_list(
+                doctype,
+                fields=rows,
+                filters=filters,
+                # The cursor of the next page relies on the tie-breaker
+                order_by=get_keyset_order_by(keyset) if keyset else order_by,
+                page_length=page_length,
+            )
+            or []
         )
-        or []
-    )
+
+    next_cursor = None
+    if keyset and data and len(data) >= cint(page_length):
+        next_cursor = encode_cursor(data[-1], keyset[0])
 
     if doctype == "TP Call Log":
         data = parse_call_logs(data)
 
-    fields = frappe.get_meta(doctype).fields
-    fields = [field for field in fields if field.fieldtype not in no_value_fields]
-    fields = [
-        {
-            "label": field.label,
-            "type": field.fieldtype,
-            "value": field.fieldname,
-            "options": field.options,
-        }
-        for field in fields
-        if field.label and field.fieldname
-    ]
-
-    std_fields = [
-        {"label": "Name", "type": "Data", "value": "name"},
-        {"label": "Created On", "type": "Datetime", "value": "creation"},
-        {"label": "Last Modified", "type": "Datetime", "value": "modified"},
-        {
-            "label": "Modified By",
-            "type": "Link",
-            "value": "modified_by",
-            "options": "User",
-        },
-        {"label": "Assigned To", "type": "Text", "value": "_assign"},
-        {"label": "Owner", "type": "Link", "value": "owner", "options": "User"},
-    ]
+    if doctype == "HD Ticket":
+        set_unread_flags(data)
 
-    for field in std_fields:
-        if field.get("value") not in rows:
-            rows.append(field.get("value"))
-        if field not in fields:
-            fields.append(field)
+    fields = get_list_fields(doctype, show_customer_portal_fields)
 
-    if show_customer_portal_fields:
-        fields = get_customer_portal_fields(doctype, fields)
+    row_keys = set(rows)
+    for field in STANDARD_LIST_FIELDS:
+        if field["value"] not in row_keys:
+            rows.append(field["value"])
+            row_keys.add(field["value"])
 
     if group_by_field and view_type == "group_by":
 
@@ -165,13 +182,14 @@ def get_list_data(
                 options = list(set([d.get(group_by_field) for d in data]))
                 options = [u for u in options if u]
                 options = [category_name for category_name in options if category_name]
+                labels = get_link_labels(
+                    label_doc if label_doc else doctype,
+                    label_field if label_field else group_by_field,
+                    options,
+                )
                 options = [
                     {
-                        "label": frappe.db.get_value(
-                            label_doc if label_doc else doctype,
-                            option,
-                            label_field if label_field else group_by_field,
-                        ),
+                        "label": labels.get(option),
                         "value": option,
                     }
                     for option in options
@@ -216,20 +234,157 @@ def get_list_data(
                     "options": options,
                 }
 
+    total_count, count_key = get_total_count(doctype, filters, count_mode)
+
     return {
         "data": data,
         "columns": columns,
         "rows": rows,
         "fields": fields if doctype == "HD Ticket" else [],
-        "total_count": frappe.get_list(doctype, fields=[COUNT_NAME], filters=filters)[
-            0
-        ].get("count", 0),
+        "total_count": total_count,
+        "count_key": count_key,
+        "next_cursor": next_cursor,
         "row_count": len(data),
         "group_by_field": group_by_field,
         "view_type": view_type,
     }
 
 
+@frappe.whitelist()
+def get_list_meta(
+    doctype: str,
+    show_customer_portal_fields: bool = False,
+    view: str | None = None,
+    etag: str | None = None,
+) -> dict:
+    """
+    Everything a list page needs about `doctype` besides the rows, in one call.
+    The bundle is cached until a Custom Field, Property Setter, HD View or
+    ticket template of `doctype` changes. If `etag` matches the current
+    bundle, only `{"etag": etag, "not_modified": True}` is returned.
+    """
+    check_permissions(doctype, None)
+    show_customer_portal_fields = bool(cint(show_customer_portal_fields))
+    key = get_list_meta_cache_key(
+        "bundle",
+        doctype,
+        show_customer_portal_fields,
+        frappe.session.user,
+        view or "",
+    )
+    current_etag = hashlib.sha1(key.encode()).hexdigest()
+    if etag and etag == current_etag:
+        return {"etag": current_etag, "not_modified": True}
+
+    bundle = frappe.cache().get_value(key)
+    if bundle is None:
+        bundle = {
+            "etag": current_etag,
+            "fields": get_list_fields(doctype, show_customer_portal_fields),
+            "filterable_fields": get_filterable_fields(
+                doctype, show_customer_portal_fields
+            ),
+            "sort_options": sort_options(doctype, show_customer_portal_fields),
+            "quick_filters": get_quick_filters(doctype, show_customer_portal_fields),
+            "default_view": get_default_view_meta(
+                doctype, view, show_customer_portal_fields
+            ),
+        }
+        frappe.cache().set_value(key, bundle, expires_in_sec=LIST_META_TTL)
+    return bundle
+
+
+def get_list_meta_version(doctype: str) -> str:
+    key = f"helpdesk:list_meta_version:{doctype}"
+    version = frappe.cache().get_value(key)
+    if not version:
+        version = frappe.generate_hash(length=10)
+        frappe.cache().set_value(key, version)
+    return version
+
+
+def get_list_meta_cache_key(prefix: str, doctype: str, *args) -> str:
+    parts = [str(cint(a)) if isinstance(a, bool) else str(a) for a in args]
+    version = get_list_meta_version(doctype)
+    return ":".join(["helpdesk:list_meta", prefix, doctype, version, *parts])
+
+
+def clear_list_meta_cache(doc, method=None):
+    """
+    Bump the list meta version of the doctype `doc` customizes. Stale bundles
+    are never read again and expire on their own.
+    """
+    doctype = None
+    if doc.doctype in ("Custom Field", "HD View"):
+        doctype = doc.dt
+    elif doc.doctype == "Property Setter":
+        doctype = doc.doc_type
+    elif doc.doctype == "HD Ticket Template":
+        doctype = "HD Ticket"
+
+    if doctype:
+        frappe.cache().delete_value(f"helpdesk:list_meta_version:{doctype}")
+        # Cached apart from the bundle, keyed on its arguments only
+        get_filterable_fields.clear_cache()
+
+
+def get_list_fields(doctype: str, show_customer_portal_fields: bool = False) -> list:
+    show_customer_portal_fields = bool(cint(show_customer_portal_fields))
+    key = get_list_meta_cache_key("fields", doctype, show_customer_portal_fields)
+    fields = frappe.cache().get_value(key)
+    if fields is not None:
+        return fields
+
+    fields = [
+        {
+            "label": field.label,
+            "type": field.fieldtype,
+            "value": field.fieldname,
+            "options": field.options,
+        }
+        for field in frappe.get_meta(doctype).fields
+        if field.fieldtype not in no_value_fields and field.label and field.fieldname
+    ]
+    values = {field["value"] for field in fields}
+    fields.extend(f for f in STANDARD_LIST_FIELDS if f["value"] not in values)
+
+    if show_customer_portal_fields:
+        fields = get_customer_portal_fields(doctype, fields)
+
+    frappe.cache().set_value(key, fields, expires_in_sec=LIST_META_TTL)
+    return fields
+
+
+def get_default_view_meta(
+    doctype: str, view: str | None, show_customer_portal_fields: bool
+) -> dict:
+    _list = get_controller(doctype)
+    if view:
+        frappe.has_permission("HD View", "read", view, throw=True)
+        columns, rows = frappe.get_value("HD View", view, ["columns", "rows"]) or [
+            None,
+            None,
+        ]
+        return {
+            "columns": frappe.parse_json(columns or "[]"),
+            "rows": frappe.parse_json(rows or "[]"),
+        }
+    if default_view_exists(doctype):
+        columns, rows = handle_default_view(doctype, _list, show_customer_portal_fields)
+        return {"columns": columns, "rows": rows}
+    if doctype == "Contact":
+        return {"columns": contact_default_columns, "rows": []}
+    if doctype == "TP Call Log":
+        return {"columns": call_log_default_columns, "rows": []}
+    if hasattr(_list, "default_list_data"):
+        return (
+            _list.default_list_data(show_customer_portal_fields)
+            if doctype == "HD Ticket"
+            else _list.default_list_data()
+        )
+    return {"columns": [], "rows": []}
+
+
 @frappe.whitelist()
 @redis_cache()
 def get_filterable_fields(
@@ -522,6 +677,178 @@ def handle_at_me_support(filters):
     return filters
 
 
+def get_keyset_order(order_by: str) -> tuple[str, str] | None:
+    """
+    Return `(fieldname, direction)` if `order_by` sorts on a single column and can
+    be paginated with a keyset cursor. `name` is used as the tie-breaker.
+    """
+    parts = (order_by or "").split()
+    if len(parts) == 1:
+        parts.append("asc")
+    if len(parts) != 2 or "," in order_by:
+        return None
+
+    fieldname = parts[0].split(".")[-1].strip("`")
+    direction = parts[1].lower()
+    if direction not in ("asc", "desc") or not re.fullmatch(r"\w+", fieldname):
+        return None
+    return fieldname, direction
+
+
+def get_keyset_order_by(keyset: tuple[str, str]) -> str:
+    fieldname, direction = keyset
+    return f"{fieldname} {direction}, name {direction}"
+
+
+def encode_cursor(row: dict, fieldname: str) -> str:
+    payload = json.dumps([row.get(fieldname), row.get("name")], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        value, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        frappe.throw(_("Invalid pagination cursor"), frappe.ValidationError)
+    return value, name
+
+
+def as_filter_list(doctype: str, filters) -> list:
+    """
+    Normalize dict or list filters into a list of `[doctype, field, op, value]`
+    so that extra conditions can be added on fields which are already filtered.
+    """
+    if isinstance(filters, dict):
+        filters = [filters]
+
+    res = []
+    for f in filters or []:
+        if not isinstance(f, dict):
+            res.append(f)
+            continue
+        for key, value in f.items():
+            if isinstance(value, (list, tuple)):
+                res.append([doctype, key, *value])
+            else:
+                res.append([doctype, key, "=", value])
+    return res
+
+
+def get_keyset_page(
+    doctype: str,
+    fields: list,
+    filters,
+    keyset: tuple[str, str],
+    cursor: str,
+    page_length: int,
+) -> list:
+    """
+    Fetch the page after `cursor` without an OFFSET. Rows sharing the cursor's
+    sort value are fetched first (ordered by `name`), then rows strictly past it.
+    """
+    fieldname, direction = keyset
+    value, name = decode_cursor(cursor)
+    operator = "<" if direction == "desc" else ">"
+    order_by = get_keyset_order_by(keyset)
+    page_length = cint(page_length)
+    filters = as_filter_list(doctype, filters)
+
+    same_value = (
+        [doctype, fieldname, "is", "not set"]
+        if value is None
+        else [doctype, fieldname, "=", value]
+    )
+    data = frappe.get_list(
+        doctype,
+        fields=fields,
+        filters=[*filters, same_value, [doctype, "name", operator, name]],
+        order_by=order_by,
+        page_length=page_length,
+    )
+
+    remaining = page_length - len(data)
+    if remaining <= 0:
+        return data
+
+    # Pages past the cursor's value, NULLs sort first in ascending order and
+    # last in descending order
+    if value is None:
+        pages = [[doctype, fieldname, "is", "set"]] if direction == "asc" else []
+    elif direction == "asc":
+        pages = [[doctype, fieldname, operator, value]]
+    else:
+        pages = [
+            [doctype, fieldname, operator, value],
+            [doctype, fieldname, "is", "not set"],
+        ]
+
+    for after_value in pages:
+        data += frappe.get_list(
+            doctype,
+            fields=fields,
+            filters=[*filters, after_value],
+            order_by=order_by,
+            page_length=remaining,
+        )
+        remaining = page_length - len(data)
+        if remaining <= 0:
+            break
+    return data
+
+
+def get_exact_count(doctype: str, filters) -> int:
+    return frappe.get_list(doctype, fields=[COUNT_NAME], filters=filters)[0].get(
+        "count", 0
+    )
+
+
+def get_count_cache_key(doctype: str, filters) -> str:
+    # permission query conditions are per user, so is the count
+    filters_hash = hashlib.sha1(
+        json.dumps(filters, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"helpdesk:list_count:{doctype}:{frappe.session.user}:{filters_hash}"
+
+
+def get_total_count(doctype: str, filters, count_mode: str = "exact"):
+    """
+    Returns `(count, count_key)`.
+
+    In the "estimate" mode a cached exact count is returned if available. Otherwise
+    `None` is returned, and the exact count is computed in background and
+    published as `helpdesk:list-count`. The table estimate is not used, as it
+    ignores permission query conditions.
+    """
+    if count_mode != "estimate":
+        return get_exact_count(doctype, filters), None
+
+    key = get_count_cache_key(doctype, filters)
+    count = frappe.cache().get_value(key)
+    if count is not None:
+        return count, key
+
+    frappe.enqueue(
+        "helpdesk.api.doc.refresh_list_count",
+        doctype=doctype,
+        filters=filters,
+        key=key,
+        job_id=key,
+        deduplicate=True,
+    )
+    return None, key
+
+
+def refresh_list_count(doctype: str, filters, key: str):
+    count = get_exact_count(doctype, filters)
+    frappe.cache().set_value(key, count, expires_in_sec=LIST_COUNT_TTL)
+    frappe.publish_realtime(
+        "helpdesk:list-count",
+        message={"key": key, "count": count},
+        user=frappe.session.user,
+        after_commit=True,
+    )
+
+
 @frappe.whitelist()
 def remove_assignments(
     doctype: str,
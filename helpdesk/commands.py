@@ -0,0 +1,89 @@
+import time
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("helpdesk-index-advisor")
+@click.option(
+    "--user",
+    default="Administrator",
+    help="User whose permission query conditions are applied",
+)
+@pass_context
+def index_advisor(context, user):
+    "Explain the common HD Ticket queries and report full table scans"
+    from helpdesk.setup.index_advisor import run
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        run(user)
+    finally:
+        frappe.destroy()
+
+
+@click.command("helpdesk-migrate-ticket-versions")
+@click.option(
+    "--purge",
+    is_flag=True,
+    default=False,
+    help="Delete HD Ticket Version rows once they are in the journal",
+)
+@pass_context
+def migrate_ticket_versions(context, purge):
+    "Move HD Ticket Version rows into the ticket change journal"
+    from frappe.utils import now_datetime
+
+    from helpdesk.helpdesk.doctype.hd_ticket_change.hd_ticket_change import (
+        delete_ticket_versions,
+        migrate_ticket_versions,
+    )
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        # Versions written while migrating are left for the next run
+        started = now_datetime()
+        click.echo(f"Journaled {migrate_ticket_versions(before=started)} changes")
+        if purge:
+            click.echo(f"Deleted {delete_ticket_versions(before=started)} versions")
+    finally:
+        frappe.destroy()
+
+
+@click.command("helpdesk-benchmark-assignment")
+@click.option("--team", required=True, help="Team whose agents are picked from")
+@click.option("--iterations", default=1000, help="Number of warm picks to time")
+@pass_context
+def benchmark_assignment(context, team, iterations):
+    "Time picking the least loaded agent of a team, with cold and warm caches"
+    from helpdesk.helpdesk.doctype.hd_team.utils import (
+        clear_team_agents,
+        get_load_key,
+        pick_agent,
+    )
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        clear_team_agents()
+        frappe.cache().delete(get_load_key())
+        start = time.perf_counter()
+        agent = pick_agent(team)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _i in range(iterations):
+            # Every request reads the team map version once
+            frappe.flags.helpdesk_versioned_cache = None
+            pick_agent(team)
+        warm = (time.perf_counter() - start) / max(iterations, 1)
+        click.echo(f"Picked {agent or 'no agent'} for {team}")
+        click.echo(f"Cold: {cold * 1000:.2f} ms, warm: {warm * 1000:.3f} ms per pick")
+    finally:
+        frappe.destroy()
+
+
+commands = [index_advisor, migrate_ticket_versions, benchmark_assignment]
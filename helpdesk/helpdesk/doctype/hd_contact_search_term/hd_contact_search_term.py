@@ -0,0 +1,218 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import re
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder import Order
+from frappe.query_builder.functions import Min
+from frappe.utils import now_datetime
+from pypika import Case
+
+PHONE_CACHE_KEY = "helpdesk:contact_by_phone"
+# Search text is matched against phone numbers only when it looks like one
+PHONE_SEARCH_PATTERN = re.compile(r"^\+?[\d\s()\-]+$")
+PHONE_SEARCH_MIN_DIGITS = 4
+
+
+class HDContactSearchTerm(Document):
+    pass
+
+
+def normalize_phone(number: str | None) -> str:
+    return re.sub(r"\D", "", number or "")
+
+
+def get_contact_terms(contact: Document) -> set[tuple[str, str]]:
+    """
+    Searchable terms of `contact` as `(term_type, term)`: lowercase emails, lowercase
+    name tokens and digits-only phone numbers (also without the country code).
+    """
+    from helpdesk.utils import parse_phone_number
+
+    terms = set()
+
+    emails = {contact.email_id, *[e.email_id for e in contact.get("email_ids", [])]}
+    for email in filter(None, emails):
+        terms.add(("Email", email.strip().lower()))
+
+    name = (contact.full_name or "").lower()
+    for token in {name.strip(), *name.split()}:
+        if token:
+            terms.add(("Name", token))
+
+    numbers = {
+        contact.phone,
+        contact.mobile_no,
+        *[p.phone for p in contact.get("phone_nos", [])],
+    }
+    for number in filter(None, numbers):
+        if digits := normalize_phone(number):
+            terms.add(("Phone", digits))
+        parsed = parse_phone_number(number)
+        if parsed.get("is_valid"):
+            terms.add(("Phone", parsed.get("national_number")))
+
+    return {(t, term[:140]) for t, term in terms}
+
+
+def sync_contact_search_terms(doc, method=None):
+    """
+    Rewrite the search terms of a `Contact`. Hooked on `Contact` update.
+    """
+    frappe.db.delete("HD Contact Search Term", {"contact": doc.name})
+    now = now_datetime()
+    values = [
+        (frappe.generate_hash(length=10), doc.name, t, term, now, now, "Administrator")
+        for t, term in sorted(get_contact_terms(doc))
+    ]
+    if values:
+        frappe.db.bulk_insert(
+            "HD Contact Search Term",
+            fields=[
+                "name",
+                "contact",
+                "term_type",
+                "term",
+                "creation",
+                "modified",
+                "owner",
+            ],
+            values=values,
+        )
+    frappe.cache().delete_value(PHONE_CACHE_KEY)
+
+
+def delete_contact_search_terms(doc, method=None):
+    frappe.db.delete("HD Contact Search Term", {"contact": doc.name})
+    frappe.cache().delete_value(PHONE_CACHE_KEY)
+
+
+def is_phone_search(txt: str) -> bool:
+    return bool(PHONE_SEARCH_PATTERN.match(txt)) and (
+        len(normalize_phone(txt)) >= PHONE_SEARCH_MIN_DIGITS
+    )
+
+
+def search_contact_names(
+    txt: str, limit: int = 50, with_email: bool = False
+) -> list[str]:
+    """
+    Contacts with an email, name token or phone number starting with `txt`.
+    Uses the index on `term` instead of scanning `Contact`. Best matches come
+    first: contacts with a term equal to `txt`, then by their closest term.
+
+    :param with_email: Only contacts having an email id, filtered before the limit
+    """
+    QBTerm = frappe.qb.DocType("HD Contact Search Term")
+    txt = txt.strip().lower()
+    escaped = txt.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    criterion = QBTerm.term.like(f"{escaped}%")
+    exact = QBTerm.term == txt
+    if is_phone_search(txt):
+        digits = normalize_phone(txt)
+        is_phone = QBTerm.term_type == "Phone"
+        criterion |= is_phone & QBTerm.term.like(f"{digits}%")
+        exact |= is_phone & (QBTerm.term == digits)
+
+    query = (
+        frappe.qb.from_(QBTerm)
+        .select(QBTerm.contact)
+        .where(criterion)
+        .groupby(QBTerm.contact)
+        .orderby(Min(Case().when(exact, 0).else_(1)))
+        .orderby(Min(QBTerm.term))
+        .orderby(QBTerm.contact)
+    )
+    if with_email:
+        QBContact = frappe.qb.DocType("Contact")
+        query = (
+            query.join(QBContact)
+            .on(QBContact.name == QBTerm.contact)
+            .where(QBContact.email_id.notnull())
+            .where(QBContact.email_id != "")
+        )
+    return query.limit(limit).run(pluck=True)
+
+
+def get_contacts_by_phone(numbers: list[str]) -> dict[str, dict]:
+    """
+    Batched `get_contact_by_phone`: resolves all uncached numbers with one query.
+
+    :param numbers: Phone numbers in any format
+    :return: Mapping of digits-only number to contact, for numbers having one
+    """
+    cache = frappe.cache()
+    contacts = {}
+    missing = []
+    for digits in {normalize_phone(n) for n in numbers}:
+        if not digits:
+            continue
+        contact = cache.hget(PHONE_CACHE_KEY, digits)
+        if contact is None:
+            missing.append(digits)
+        elif contact:
+            contacts[digits] = contact
+
+    if not missing:
+        return contacts
+
+    QBContact = frappe.qb.DocType("Contact")
+    QBTerm = frappe.qb.DocType("HD Contact Search Term")
+    rows = (
+        frappe.qb.from_(QBContact)
+        .join(QBTerm)
+        .on(QBTerm.contact == QBContact.name)
+        .select(
+            QBTerm.term,
+            QBContact.name,
+            QBContact.full_name,
+            QBContact.image,
+            QBContact.phone,
+        )
+        .where(QBTerm.term_type == "Phone")
+        .where(QBTerm.term.isin(missing))
+        .orderby(QBContact.modified, order=Order.desc)
+        .run(as_dict=True)
+    )
+    for row in rows:
+        digits = row.pop("term")
+        contacts.setdefault(digits, row)
+
+    for digits in missing:
+        cache.hset(PHONE_CACHE_KEY, digits, contacts.get(digits, {}))
+    return contacts
+
+
+def get_contact_by_phone(number: str) -> dict | None:
+    """
+    Most recently modified contact having exactly `number` (digits only compared).
+    Results are cached until any contact changes, as call logs look up the same
+    numbers over and over.
+    """
+    digits = normalize_phone(number)
+    if not digits:
+        return None
+
+    cache = frappe.cache()
+    contact = cache.hget(PHONE_CACHE_KEY, digits)
+    if contact is not None:
+        return contact or None
+
+    QBContact = frappe.qb.DocType("Contact")
+    QBTerm = frappe.qb.DocType("HD Contact Search Term")
+    contacts = (
+        frappe.qb.from_(QBContact)
+        .join(QBTerm)
+        .on(QBTerm.contact == QBContact.name)
+        .select(QBContact.name, QBContact.full_name, QBContact.image, QBContact.phone)
+        .where(QBTerm.term_type == "Phone")
+        .where(QBTerm.term == digits)
+        .orderby(QBContact.modified, order=Order.desc)
+        .limit(1)
+        .run(as_dict=True)
+    )
+    contact = contacts[0] if contacts else {}
+    cache.hset(PHONE_CACHE_KEY, digits, contact)
+    return contact or None
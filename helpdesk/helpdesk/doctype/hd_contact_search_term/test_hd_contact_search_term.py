@@ -0,0 +1,75 @@
+# Copyright (c) 2026, Frappe Technologies and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from helpdesk.api.contact import search_contacts
+from helpdesk.helpdesk.doctype.hd_contact_search_term.hd_contact_search_term import (
+    get_contact_by_phone,
+    is_phone_search,
+    search_contact_names,
+)
+
+
+class TestHDContactSearchTerm(IntegrationTestCase):
+    def setUp(self):
+        self.contact = frappe.get_doc(
+            {
+                "doctype": "Contact",
+                "first_name": "Searchable",
+                "last_name": "Person",
+                "email_ids": [{"email_id": "searchable.person@example.com"}],
+                "phone_nos": [{"phone": "+1 (415) 555-0134", "is_primary_phone": 1}],
+            }
+        ).insert(ignore_permissions=True)
+
+    def tearDown(self):
+        self.contact.delete(ignore_permissions=True)
+
+    def test_prefix_search(self):
+        for txt in ["searchable.p", "Pers", "SEARCHABLE"]:
+            names = [c.name for c in search_contacts(txt)]
+            self.assertIn(self.contact.name, names, txt)
+
+    def test_phone_search(self):
+        for txt in ["+1 (415) 555", "1415-555"]:
+            self.assertTrue(is_phone_search(txt), txt)
+            self.assertIn(self.contact.name, search_contact_names(txt), txt)
+        for txt in ["room 1415", "12", "searchable 4"]:
+            self.assertFalse(is_phone_search(txt), txt)
+            self.assertNotIn(self.contact.name, search_contact_names(txt), txt)
+
+    def test_search_with_email(self):
+        contact = frappe.get_doc(
+            {"doctype": "Contact", "first_name": "Searchable", "last_name": "Nomail"}
+        ).insert(ignore_permissions=True)
+        self.addCleanup(contact.delete, ignore_permissions=True)
+        names = search_contact_names("searchable", with_email=True)
+        self.assertIn(self.contact.name, names)
+        self.assertNotIn(contact.name, names)
+
+    def test_exact_match_first(self):
+        contact = frappe.get_doc(
+            {
+                "doctype": "Contact",
+                "first_name": "Pers",
+                "email_ids": [{"email_id": "pers@example.com"}],
+            }
+        ).insert(ignore_permissions=True)
+        self.addCleanup(contact.delete, ignore_permissions=True)
+        self.assertEqual(search_contact_names("pers")[0], contact.name)
+        self.assertEqual(search_contacts("Pers")[0].name, contact.name)
+
+    def test_phone_lookup(self):
+        contact = get_contact_by_phone("14155550134")
+        self.assertEqual(contact.name, self.contact.name)
+        self.assertIsNone(get_contact_by_phone("0000000"))
+
+    def test_terms_removed_on_delete(self):
+        name = self.contact.name
+        self.contact.delete(ignore_permissions=True)
+        self.assertFalse(frappe.db.exists("HD Contact Search Term", {"contact": name}))
+        self.contact = frappe.get_doc(
+            {"doctype": "Contact", "first_name": "Searchable"}
+        ).insert(ignore_permissions=True)
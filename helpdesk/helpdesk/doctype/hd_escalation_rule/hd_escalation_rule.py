@@ -4,22 +4,62 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.utils import add_to_date, flt, now_datetime
+from pypika import Criterion
 
-from helpdesk.utils import capture_event, publish_event
+from helpdesk.utils import (
+    capture_event,
+    clear_versioned_cache,
+    get_versioned_cache,
+    publish_event,
+)
+
+ESCALATION_RULES_VERSION_KEY = "helpdesk:escalation_rules_version"
+SWEEP_BATCH_SIZE = 500
+SWEEP_MAX_BATCHES = 20
+# Rule criteria and the ticket fields they match
+CRITERIA = {"priority": "priority", "team": "agent_group", "ticket_type": "ticket_type"}
+# Criteria a rule is set for, most specific first. A ticket is escalated by
+# the first rule found in this order.
+LOOKUP_ORDER = [
+    ("priority", "team", "ticket_type"),
+    ("priority", "team"),
+    ("priority", "ticket_type"),
+    ("team", "ticket_type"),
+    ("priority",),
+    ("team",),
+    ("ticket_type",),
+]
 
 
 class HDEscalationRule(Document):
     def validate(self):
         self.validate_criterion()
         self.validate_duplicate()
+        self.validate_threshold()
 
     def after_insert(self):
         self.emit_after_insert()
 
     def on_update(self):
+        clear_escalation_rules()
         self.emit_on_update()
 
+    def after_rename(self, old, new, merge=False):
+        clear_escalation_rules()
+
+    def on_trash(self):
+        # Runs before the link check, tickets it escalated keep no reference
+        QBTicket = frappe.qb.DocType("HD Ticket")
+        (
+            frappe.qb.update(QBTicket)
+            .set(QBTicket.escalation_rule, None)
+            .where(QBTicket.escalation_rule == self.name)
+            .run()
+        )
+
     def after_delete(self):
+        clear_escalation_rules()
         self.emit_after_delete()
 
     def validate_criterion(self):
@@ -42,6 +82,10 @@ class HDEscalationRule(Document):
         if is_duplicate:
             frappe.throw(_("Escalation rule already exists for this criteria"))
 
+    def validate_threshold(self):
+        if flt(self.escalate_after_hours) < 0:
+            frappe.throw(_("Escalate after hours cannot be negative"))
+
     def emit_after_insert(self):
         capture_event("escalation_rule_created")
         publish_event("helpdesk:new-escalation-rule", self)
@@ -53,3 +97,186 @@ class HDEscalationRule(Document):
     def emit_after_delete(self):
         capture_event("escalation_rule_deleted")
         publish_event("helpdesk:delete-escalation-rule", self)
+
+
+def clear_escalation_rules():
+    clear_versioned_cache(ESCALATION_RULES_VERSION_KEY)
+
+
+def get_escalation_rules() -> dict:
+    """
+    Enabled rules keyed on their `(priority, team, ticket_type)` criteria, with
+    `None` for criteria left empty. Built once per process and rebuilt when a
+    rule changes.
+    """
+    return get_versioned_cache(ESCALATION_RULES_VERSION_KEY, build_escalation_rules)
+
+
+def build_escalation_rules() -> dict:
+    rules = frappe.get_all(
+        "HD Escalation Rule",
+        filters={"is_enabled": 1},
+        fields=[
+            "name",
+            "priority",
+            "team",
+            "ticket_type",
+            "to_agent",
+            "to_team",
+            "to_priority",
+            "to_ticket_type",
+            "escalate_after_hours",
+            "escalate_on_sla_failure",
+        ],
+    )
+    return {tuple(rule[c] or None for c in CRITERIA): rule for rule in rules}
+
+
+def match_escalation_rule(
+    priority: str | None, team: str | None, ticket_type: str | None
+) -> frappe._dict | None:
+    """
+    Most specific enabled rule for a ticket with these values, found with at
+    most seven dictionary lookups
+    """
+    rules = get_escalation_rules()
+    if not rules:
+        return
+    values = {"priority": priority, "team": team, "ticket_type": ticket_type}
+    for criteria in LOOKUP_ORDER:
+        if not all(values[c] for c in criteria):
+            continue
+        key = tuple(values[c] if c in criteria else None for c in CRITERIA)
+        if rule := rules.get(key):
+            return rule
+
+
+def has_threshold(rule: frappe._dict) -> bool:
+    """
+    Rules with a threshold are applied by `sweep_escalations`, others as soon
+    as a ticket matching them is saved
+    """
+    return bool(flt(rule.escalate_after_hours) or rule.escalate_on_sla_failure)
+
+
+def get_escalation_values(rule: frappe._dict) -> dict:
+    values = {
+        "agent_group": rule.to_team,
+        "priority": rule.to_priority,
+        "ticket_type": rule.to_ticket_type,
+    }
+    return {field: value for field, value in values.items() if value}
+
+
+def sweep_escalations():
+    """
+    Escalate open tickets that crossed the age or SLA threshold of the rule
+    matching them. Tickets are updated in bulk, and are escalated only once,
+    so the values set by one rule never chain into another. Each batch is
+    committed, and a failing rule is logged without stopping the others. Runs
+    on the scheduler.
+    """
+    now = now_datetime()
+    rules = [rule for rule in get_escalation_rules().values() if has_threshold(rule)]
+    escalated = set()
+    for rule in rules:
+        try:
+            sweep_rule(rule, now, escalated)
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(
+                title=f"Helpdesk: escalation rule {rule.name} failed",
+                reference_doctype="HD Escalation Rule",
+                reference_name=rule.name,
+            )
+    return sorted(escalated)
+
+
+def sweep_rule(rule: frappe._dict, now, escalated: set):
+    """
+    :param escalated: Tickets escalated in this sweep, updated in place
+    """
+    QBTicket = frappe.qb.DocType("HD Ticket")
+    thresholds = []
+    if flt(rule.escalate_after_hours):
+        cutoff = add_to_date(now, hours=-flt(rule.escalate_after_hours))
+        thresholds.append(QBTicket.creation <= cutoff)
+    if rule.escalate_on_sla_failure:
+        thresholds.append(QBTicket.agreement_status == "Failed")
+    query = (
+        frappe.qb.from_(QBTicket)
+        .select(QBTicket.name, *(QBTicket[f] for f in CRITERIA.values()))
+        .where(QBTicket.status_category == "Open")
+        .where(Criterion.any(thresholds))
+        .where(QBTicket.escalation_rule.isnull() | (QBTicket.escalation_rule == ""))
+        .orderby(QBTicket.name)
+        .limit(SWEEP_BATCH_SIZE)
+    )
+    for criterion, field in CRITERIA.items():
+        if rule[criterion]:
+            query = query.where(QBTicket[field] == rule[criterion])
+
+    last = 0
+    for _batch in range(SWEEP_MAX_BATCHES):
+        rows = query.where(QBTicket.name > last).run(as_dict=True)
+        if not rows:
+            break
+        last = rows[-1].name
+        # A more specific rule may be the one governing some of these
+        names = [
+            row.name
+            for row in rows
+            if row.name not in escalated
+            and get_rule_name(
+                match_escalation_rule(row.priority, row.agent_group, row.ticket_type)
+            )
+            == rule.name
+        ]
+        if names:
+            escalated.update(escalate_batch(names, rule))
+        if len(rows) < SWEEP_BATCH_SIZE:
+            break
+
+
+def get_rule_name(rule: frappe._dict | None) -> str | None:
+    return rule.name if rule else None
+
+
+def escalate_batch(names: list, rule: frappe._dict) -> list:
+    """
+    Escalate and commit a batch. When it fails the tickets are escalated one by
+    one, so a failing ticket is logged and skipped without holding back the
+    rest of the sweep.
+
+    :return: Tickets which were escalated
+    """
+    try:
+        escalate_tickets(names, rule)
+        frappe.db.commit()  # nosemgrep
+        return names
+    except Exception:
+        frappe.db.rollback()
+    if len(names) == 1:
+        frappe.log_error(
+            title=f"Helpdesk: could not escalate ticket {names[0]}",
+            reference_doctype="HD Escalation Rule",
+            reference_name=rule.name,
+        )
+        return []
+    escalated = []
+    for name in names:
+        escalated += escalate_batch([name], rule)
+    return escalated
+
+
+def escalate_tickets(names: list, rule: frappe._dict):
+    from helpdesk.helpdesk.doctype.hd_ticket.api import apply_bulk_update
+
+    apply_bulk_update(names, get_escalation_values(rule), assign_to=rule.to_agent)
+    QBTicket = frappe.qb.DocType("HD Ticket")
+    (
+        frappe.qb.update(QBTicket)
+        .set(QBTicket.escalation_rule, rule.name)
+        .where(QBTicket.name.isin(names))
+        .run()
+    )
@@ -1,9 +1,156 @@
 # Copyright (c) 2023, Frappe Technologies and Contributors
 # See license.txt
 
-# import frappe
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from helpdesk.helpdesk.doctype.hd_escalation_rule.hd_escalation_rule import (
+    match_escalation_rule,
+    sweep_escalations,
+)
+from helpdesk.helpdesk.doctype.hd_ticket.api import apply_bulk_update
+from helpdesk.test_utils import make_ticket
 
 
 class TestHDEscalationRule(FrappeTestCase):
-    pass
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def make_rule(self, **args):
+        return frappe.get_doc(
+            {"doctype": "HD Escalation Rule", "is_enabled": 1, **args}
+        ).insert()
+
+    def test_most_specific_rule_wins(self):
+        general = self.make_rule(priority="High", to_priority="Urgent")
+        specific = self.make_rule(
+            priority="High", ticket_type="Bug", to_ticket_type="Incident"
+        )
+        self.make_rule(priority="Low", to_priority="Medium", is_enabled=0)
+
+        self.assertEqual(match_escalation_rule("High", None, "Bug").name, specific.name)
+        self.assertEqual(
+            match_escalation_rule("High", None, "Question").name, general.name
+        )
+        self.assertIsNone(match_escalation_rule("Low", None, "Bug"))
+
+        specific.is_enabled = 0
+        specific.save()
+        self.assertEqual(match_escalation_rule("High", None, "Bug").name, general.name)
+
+    def test_sweep_escalations(self):
+        rule = self.make_rule(
+            priority="Low", to_priority="Urgent", escalate_after_hours=1
+        )
+        old = make_ticket(priority="Low")
+        recent = make_ticket(priority="Low")
+        frappe.db.set_value(
+            "HD Ticket",
+            old.name,
+            "creation",
+            add_to_date(now_datetime(), hours=-2),
+            update_modified=False,
+        )
+
+        escalated = sweep_escalations()
+        self.assertIn(old.name, escalated)
+        self.assertNotIn(recent.name, escalated)
+        old.reload()
+        self.assertEqual(old.priority, "Urgent")
+        self.assertEqual(old.escalation_rule, rule.name)
+        self.assertEqual(
+            frappe.db.get_value("HD Ticket", recent.name, "priority"), "Low"
+        )
+
+        # A rule escalates a ticket only once
+        frappe.db.set_value("HD Ticket", old.name, "priority", "Low")
+        self.assertNotIn(old.name, sweep_escalations())
+
+    def test_sweep_skips_failing_ticket(self):
+        self.make_rule(priority="Low", to_priority="Urgent", escalate_after_hours=1)
+        tickets = [make_ticket(priority="Low") for _ in range(2)]
+        for ticket in tickets:
+            frappe.db.set_value(
+                "HD Ticket",
+                ticket.name,
+                "creation",
+                add_to_date(now_datetime(), hours=-2),
+                update_modified=False,
+            )
+        failing, passing = tickets
+
+        def fail_for_one(names, *args, **kwargs):
+            if failing.name in names:
+                frappe.throw("Cannot escalate")
+            return apply_bulk_update(names, *args, **kwargs)
+
+        with patch(
+            "helpdesk.helpdesk.doctype.hd_ticket.api.apply_bulk_update",
+            side_effect=fail_for_one,
+        ):
+            escalated = sweep_escalations()
+        self.assertEqual(escalated, [passing.name])
+        self.assertEqual(
+            frappe.db.get_value("HD Ticket", passing.name, "priority"), "Urgent"
+        )
+        self.assertEqual(
+            frappe.db.get_value("HD Ticket", failing.name, "priority"), "Low"
+        )
+        self.assertTrue(
+            frappe.db.exists(
+                "Error Log",
+                {"method": f"Helpdesk: could not escalate ticket {failing.name}"},
+            )
+        )
+
+    def test_escalation_does_not_chain_on_save(self):
+        first = self.make_rule(priority="Low", to_priority="High")
+        self.make_rule(priority="High", to_priority="Urgent")
+        ticket = make_ticket(priority="Medium")
+
+        ticket.priority = "Low"
+        ticket.save()
+        self.assertEqual(ticket.priority, "High")
+        self.assertEqual(ticket.escalation_rule, first.name)
+
+        # The rule matching the escalated values does not apply on later saves
+        ticket.subject = "Saved again"
+        ticket.save()
+        self.assertEqual(ticket.priority, "High")
+        self.assertEqual(ticket.escalation_rule, first.name)
+
+    def test_escalation_does_not_chain_on_sweep(self):
+        first = self.make_rule(
+            priority="Low", to_priority="High", escalate_after_hours=1
+        )
+        self.make_rule(priority="High", to_priority="Urgent", escalate_after_hours=1)
+        ticket = make_ticket(priority="Low")
+        frappe.db.set_value(
+            "HD Ticket",
+            ticket.name,
+            "creation",
+            add_to_date(now_datetime(), hours=-2),
+            update_modified=False,
+        )
+
+        self.assertIn(ticket.name, sweep_escalations())
+        self.assertNotIn(ticket.name, sweep_escalations())
+        ticket.reload()
+        self.assertEqual(ticket.priority, "High")
+        self.assertEqual(ticket.escalation_rule, first.name)
+
+    def test_delete_rule_with_escalated_tickets(self):
+        rule = self.make_rule(priority="Low", to_priority="High")
+        ticket = make_ticket(priority="Medium")
+        ticket.priority = "Low"
+        ticket.save()
+        self.assertEqual(ticket.escalation_rule, rule.name)
+
+        rule.delete()
+        self.assertFalse(frappe.db.exists("HD Escalation Rule", rule.name))
+        self.assertIsNone(
+            frappe.db.get_value("HD Ticket", ticket.name, "escalation_rule")
+        )
@@ -1,8 +1,22 @@
 import frappe
 from frappe.model.document import Document
 
+from helpdesk.helpdesk.doctype.hd_notification.utils import change_unread_counts
+
 
 class HDNotification(Document):
+    def on_update(self):
+        before = self.get_doc_before_save()
+        if before and before.user_to == self.user_to:
+            change_unread_counts({self.user_to: int(before.read) - int(self.read)})
+            return
+        if before:
+            change_unread_counts({before.user_to: int(before.read) - 1})
+        change_unread_counts({self.user_to: 1 - int(self.read)})
+
+    def on_trash(self):
+        change_unread_counts({self.user_to: int(self.read) - 1})
+
     def format_message(self):
         user_from = self.get_from()
         if self.notification_type == "Mention":
@@ -48,19 +62,13 @@ class HDNotification(Document):
                 "comment": self.parse_html(),
             }
 
-    def after_insert(self):
-        if self.notification_type == "Mention":
-            skip_email_workflow = frappe.db.get_single_value(
-                "HD Settings", "skip_email_workflow"
-            )
-
-            if skip_email_workflow:
-                return
 
-            frappe.sendmail(
-                recipients=self.user_to,
-                subject="New notification",
-                message=self.format_message(),
-                template="notification",
-                args=self.get_args(),
-            )
+def on_doctype_update():
+    frappe.db.add_index("HD Notification", ["user_to", "read"])
+    frappe.db.add_index("HD Notification", ["user_to", "modified"])
+    frappe.db.add_index("HD Notification", ["reference_ticket"])
+    frappe.db.add_index(
+        "HD Notification", ["reference_comment", "user_to", "notification_type"]
+    )
+    # Pending digest mails, see `send_notification_digests`
+    frappe.db.add_index("HD Notification", ["emailed", "notification_type"])
@@ -1,9 +1,42 @@
 # Copyright (c) 2022, Frappe Technologies and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from helpdesk.helpdesk.doctype.hd_notification.utils import (
+    clear,
+    count_unread,
+    create_notifications,
+    get_unread_counts,
+    get_unread_counts_key,
+    reconcile_unread_counts,
+)
+
 
 class TestHDNotification(FrappeTestCase):
-    pass
+    def setUp(self):
+        pipe = frappe.cache().pipeline()
+        pipe.delete(get_unread_counts_key())
+        pipe.execute()
+
+    def test_unread_counts(self):
+        user = frappe.session.user
+        create_notifications(
+            [
+                {
+                    "user_from": "Guest",
+                    "user_to": user,
+                    "notification_type": "Mention",
+                    "message": f"Unread {i}",
+                }
+                for i in range(3)
+            ]
+        )
+        expected = count_unread([user])[user]
+        self.assertGreaterEqual(expected, 3)
+        self.assertEqual(get_unread_counts([user])[user], expected)
+
+        clear()
+        reconcile_unread_counts()
+        self.assertEqual(get_unread_counts([user])[user], 0)
@@ -1,4 +1,30 @@
+from collections import Counter, defaultdict
+from functools import partial
+
 import frappe
+from frappe.query_builder.functions import Count
+from frappe.utils import now_datetime
+
+NOTIFICATION_KEY_FIELDS = [
+    "user_from",
+    "user_to",
+    "notification_type",
+    "reference_ticket",
+    "reference_comment",
+    "message",
+]
+DIGEST_BATCH_SIZE = 500
+UNREAD_COUNTS_KEY = "helpdesk:notification_unread"
+RECONCILE_BATCH_SIZE = 500
+# Counters missing from the hash are recounted on read, so only existing
+# ones are moved
+UNREAD_DELTA_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call("HEXISTS", KEYS[1], ARGV[i]) == 1 then
+        redis.call("HINCRBY", KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+"""
 
 
 @frappe.whitelist()
@@ -9,14 +35,273 @@ def clear(ticket: str | int | None = None, comment: str | None = None):
     :param ticket: Ticket to clear notifications for
     :param comment: Comment to clear notifications for
     """
-    filters = {"user_to": frappe.session.user, "read": False}
+    user = frappe.session.user
+    QBNotification = frappe.qb.DocType("HD Notification")
+    query = (
+        frappe.qb.from_(QBNotification)
+        .select(QBNotification.name)
+        .where(QBNotification.user_to == user)
+        .where(QBNotification.read == 0)
+    )
     if ticket:
-        filters["reference_ticket"] = ticket
+        query = query.where(QBNotification.reference_ticket == ticket)
     if comment:
-        filters["reference_comment"] = comment
-    for notification in frappe.get_all(
-        "HD Notification", filters=filters, pluck="name"
-    ):
-        frappe.db.set_value(
-            "HD Notification", notification, "read", 1, update_modified=False
+        query = query.where(QBNotification.reference_comment == comment)
+    # Locked, so a concurrent clear cannot count the same rows
+    if not (names := query.for_update().run(pluck=True)):
+        return
+    (
+        frappe.qb.update(QBNotification)
+        .set(QBNotification.read, 1)
+        .where(QBNotification.name.isin(names))
+        .run()
+    )
+    change_unread_counts({user: -len(names)})
+
+
+@frappe.whitelist()
+def get_unread_count() -> int:
+    """
+    Unread notifications of the current user, served from the Redis counter
+    """
+    return get_unread_counts([frappe.session.user])[frappe.session.user]
+
+
+def get_notification_key(notification: dict) -> tuple:
+    return tuple(str(notification.get(f) or "") for f in NOTIFICATION_KEY_FIELDS)
+
+
+def get_existing_keys(notifications: list[dict]) -> set[tuple]:
+    QBNotification = frappe.qb.DocType("HD Notification")
+    query = (
+        frappe.qb.from_(QBNotification)
+        .select(*[QBNotification[f] for f in NOTIFICATION_KEY_FIELDS])
+        .where(QBNotification.user_to.isin({n.user_to for n in notifications}))
+        .where(
+            QBNotification.notification_type.isin(
+                {n.notification_type for n in notifications}
+            )
+        )
+    )
+    if comments := {n.reference_comment for n in notifications if n.reference_comment}:
+        query = query.where(QBNotification.reference_comment.isin(comments))
+    if tickets := {n.reference_ticket for n in notifications if n.reference_ticket}:
+        query = query.where(QBNotification.reference_ticket.isin(tickets))
+    return {get_notification_key(row) for row in query.run(as_dict=True)}
+
+
+def create_notifications(
+    notifications: list[dict], skip_existing: bool = False
+) -> list[str]:
+    """
+    Insert `notifications` with a single query. Notifications to oneself and
+    duplicates within the batch are dropped
+
+    :param notifications: HD Notification values, without `doctype`
+    :param skip_existing: Also drop notifications which already exist
+    :return: Names of inserted notifications
+    """
+    rows, seen = [], set()
+    for notification in notifications:
+        notification = frappe._dict(notification)
+        # Why notify oneself?
+        if not notification.user_to or notification.user_from == notification.user_to:
+            continue
+        key = get_notification_key(notification)
+        if key in seen:
+            continue
+        seen.add(key)
+        rows.append(notification)
+
+    if rows and skip_existing:
+        existing = get_existing_keys(rows)
+        rows = [r for r in rows if get_notification_key(r) not in existing]
+    if not rows:
+        return []
+
+    now = now_datetime()
+    user = frappe.session.user
+    values = []
+    for row in rows:
+        row.name = frappe.generate_hash(length=10)
+        values.append(
+            [row.name, now, now, user, user, 0, 0]
+            + [row.get(f) for f in NOTIFICATION_KEY_FIELDS]
+        )
+    frappe.db.bulk_insert(
+        "HD Notification",
+        fields=[
+            "name",
+            "creation",
+            "modified",
+            "owner",
+            "modified_by",
+            "read",
+            "emailed",
+            *NOTIFICATION_KEY_FIELDS,
+        ],
+        values=values,
+    )
+    change_unread_counts(Counter(row.user_to for row in rows))
+    return [row.name for row in rows]
+
+
+def get_unread_counts_key() -> bytes:
+    return frappe.cache().make_key(UNREAD_COUNTS_KEY)
+
+
+def get_unread_counts(users: list[str]) -> dict[str, int]:
+    """
+    Unread notification count per user. Counters are kept in a Redis hash,
+    users without one are counted in the database and cached.
+    """
+    users = list(users)
+    key = get_unread_counts_key()
+    pipe = frappe.cache().pipeline()
+    pipe.hmget(key, users)
+    counts, missing = {}, []
+    for user, count in zip(users, pipe.execute()[0]):
+        if count is None:
+            missing.append(user)
+        else:
+            counts[user] = max(int(count), 0)
+    if missing:
+        fresh = count_unread(missing)
+        for user, count in fresh.items():
+            pipe.hsetnx(key, user, count)
+        pipe.execute()
+        counts.update(fresh)
+    return counts
+
+
+def change_unread_counts(deltas: dict[str, int]):
+    """
+    Move unread counters by `deltas` once the transaction commits, and push
+    the new counts to the users
+    """
+    deltas = {user: delta for user, delta in deltas.items() if user and delta}
+    if deltas:
+        frappe.db.after_commit.add(partial(apply_unread_deltas, deltas))
+
+
+def apply_unread_deltas(deltas: dict[str, int]):
+    args = []
+    for user, delta in deltas.items():
+        args.extend([user, delta])
+    frappe.cache().eval(UNREAD_DELTA_SCRIPT, 1, get_unread_counts_key(), *args)
+    publish_unread_counts(deltas)
+
+
+def get_ticket_unread_counts(tickets: list[str]) -> dict[str, int]:
+    """
+    Unread notifications per user which point at `tickets`
+    """
+    QBNotification = frappe.qb.DocType("HD Notification")
+    return dict(
+        frappe.qb.from_(QBNotification)
+        .select(QBNotification.user_to, Count("*"))
+        .where(QBNotification.reference_ticket.isin(tickets))
+        .where(QBNotification.read == 0)
+        .groupby(QBNotification.user_to)
+        .run()
+    )
+
+
+def reconcile_unread_counts():
+    """
+    Recount cached unread counters from the database, fixing any drift from
+    writes which bypass `change_unread_counts`
+    """
+    key = get_unread_counts_key()
+    pipe = frappe.cache().pipeline()
+    pipe.hkeys(key)
+    users = [frappe.safe_decode(user) for user in pipe.execute()[0]]
+    for i in range(0, len(users), RECONCILE_BATCH_SIZE):
+        counts = count_unread(users[i : i + RECONCILE_BATCH_SIZE])
+        pipe.hset(key, mapping=counts)
+        pipe.execute()
+
+
+def count_unread(users: list[str]) -> dict[str, int]:
+    QBNotification = frappe.qb.DocType("HD Notification")
+    rows = (
+        frappe.qb.from_(QBNotification)
+        .select(QBNotification.user_to, Count("*"))
+        .where(QBNotification.user_to.isin(list(users)))
+        .where(QBNotification.read == 0)
+        .groupby(QBNotification.user_to)
+        .run()
+    )
+    counts = dict.fromkeys(users, 0)
+    counts.update(dict(rows))
+    return counts
+
+
+def publish_unread_counts(users: list[str]):
+    """
+    Push one `helpdesk:notification-count` event per user with their unread count
+    """
+    if not users:
+        return
+    for user, count in get_unread_counts(users).items():
+        frappe.publish_realtime(
+            "helpdesk:notification-count",
+            message={"count": count},
+            user=user,
+        )
+
+
+def send_notification_digests():
+    """
+    Mail pending mention notifications, one mail per user. Runs on the scheduler
+    so that a burst of mentions ends up in a single digest
+    """
+    QBNotification = frappe.qb.DocType("HD Notification")
+    pending = (
+        frappe.qb.from_(QBNotification)
+        .select(QBNotification.name, QBNotification.user_to)
+        .where(QBNotification.notification_type == "Mention")
+        .where(QBNotification.emailed == 0)
+        .orderby(QBNotification.creation)
+        .limit(DIGEST_BATCH_SIZE)
+        .run(as_dict=True)
+    )
+    if not pending:
+        return
+
+    if not frappe.db.get_single_value("HD Settings", "skip_email_workflow"):
+        by_user = defaultdict(list)
+        for row in pending:
+            by_user[row.user_to].append(row.name)
+        for user, names in by_user.items():
+            send_digest(user, names)
+
+    (
+        frappe.qb.update(QBNotification)
+        .set(QBNotification.emailed, 1)
+        .where(QBNotification.name.isin([row.name for row in pending]))
+        .run()
+    )
+
+
+def send_digest(user: str, names: list[str]):
+    notifications = [frappe.get_doc("HD Notification", name) for name in names]
+    try:
+        if len(notifications) == 1:
+            notification = notifications[0]
+            frappe.sendmail(
+                recipients=user,
+                subject="New notification",
+                message=notification.format_message(),
+                template="notification",
+                args=notification.get_args(),
+            )
+            return
+        frappe.sendmail(
+            recipients=user,
+            subject=f"{len(notifications)} new notifications",
+            template="notification_digest",
+            args={"notifications": [n.get_args() for n in notifications]},
         )
+    except Exception:
+        frappe.log_error(title="Helpdesk: notification digest failed")
@@ -15,6 +15,7 @@ from frappe.utils import (
     to_timedelta,
 )
 
+from helpdesk.reference_data import get_statuses
 from helpdesk.utils import get_context, is_json_valid, publish_event
 
 from .utils import convert_to_seconds
@@ -169,7 +170,6 @@ class HDServiceLevelAgreement(Document):
         self.handle_doc_status(doc)
         self.handle_targets(doc)
         self.handle_agreement_status(doc)
-        self.validate_all_priorities()
 
     def handle_new(self, doc: Document):
         if not doc.is_new():
@@ -201,12 +201,7 @@ class HDServiceLevelAgreement(Document):
         doc.first_response_time = self.calc_elapsed_time(start_at, end_at)
 
     def set_resolution_date(self, doc: Document):
-        resolved_statuses = (
-            frappe.db.get_all(
-                "HD Ticket Status", {"category": "Resolved"}, pluck="name"
-            )
-            or []
-        )
+        resolved_statuses = get_statuses("Resolved")
         next_state = doc.get("status")
         is_fulfilled = next_state in resolved_statuses
         if not is_fulfilled:
@@ -222,10 +217,7 @@ class HDServiceLevelAgreement(Document):
         doc.resolution_time = time_took_effective
 
     def set_hold_time(self, doc: Document):
-        paused_statuses = (
-            frappe.db.get_all("HD Ticket Status", {"category": "Paused"}, pluck="name")
-            or []
-        )
+        paused_statuses = get_statuses("Paused")
         doc_old = doc.get_doc_before_save()
         prev_state = doc_old.get("status")
         next_state = doc.get("status")
@@ -387,6 +379,8 @@ class HDServiceLevelAgreement(Document):
         return workdays
 
     def get_working_hours(self) -> dict[str, dict]:
+        if (res := getattr(self, "_working_hours", None)) is not None:
+            return res
         res = {}
         for row in self.support_and_resolution:
             res[row.workday] = (row.start_time, row.end_time)
@@ -461,19 +455,33 @@ class HDServiceLevelAgreement(Document):
 
         return total_seconds
 
+    def prepare_runtime(self):
+        """
+        Parse holidays, working hours and targets once, for an SLA which is
+        kept in the runtime cache and only used to compute deadlines
+        """
+        self._holidays = set(self.get_holidays())
+        self._priorities = self.get_priorities()
+        self._workdays = self.get_workdays()
+        self._working_hours = self.get_working_hours()
+
     def get_holidays(self):
+        if (res := getattr(self, "_holidays", None)) is not None:
+            return res
         res = []
         if not self.holiday_list:
             return res
         holiday_list = frappe.get_doc("HD Service Holiday List", self.holiday_list)
         for row in holiday_list.holidays:
-            res.append(row.holiday_date)
+            res.append(getdate(row.holiday_date))
         return res
 
     def get_priorities(self):
         """
         Return priorities related info as a dict. With `priority` as key
         """
+        if (res := getattr(self, "_priorities", None)) is not None:
+            return res
         res = {}
         for row in self.priorities:
             res[row.priority] = row
@@ -483,6 +491,8 @@ class HDServiceLevelAgreement(Document):
         """
         Return workdays related info as a dict. With `workday` as key
         """
+        if (res := getattr(self, "_workdays", None)) is not None:
+            return res
         res = {}
         for row in self.support_and_resolution:
             res[row.workday] = row
@@ -3,8 +3,14 @@
 # See license.txt
 import frappe
 from frappe.tests import IntegrationTestCase
+from frappe.utils import add_to_date, now_datetime
 
-from helpdesk.test_utils import SLA_PRIORITY_NAME, make_sla, make_ticket
+from helpdesk.helpdesk.doctype.hd_service_level_agreement.utils import (
+    SLA_WARNING_LAST_RUN_KEY,
+    sweep_breached_tickets,
+    warn_upcoming_deadlines,
+)
+from helpdesk.test_utils import SLA_PRIORITY_NAME, create_agent, make_sla, make_ticket
 
 
 class TestHDServiceLevelAgreement(IntegrationTestCase):
@@ -24,3 +30,57 @@ class TestHDServiceLevelAgreement(IntegrationTestCase):
     def test_default_sla_assignment(self):
         ticket = make_ticket(priority="Low")
         self.assertEqual(ticket.sla, SLA_PRIORITY_NAME)
+
+    def test_sweep_breached_tickets(self):
+        ticket = make_ticket(priority="High")
+        self.assertEqual(ticket.agreement_status, "First Response Due")
+        frappe.db.set_value(
+            "HD Ticket",
+            ticket.name,
+            "response_by",
+            add_to_date(now_datetime(), hours=-1),
+            update_modified=False,
+        )
+
+        breached = sweep_breached_tickets()
+
+        self.assertIn(ticket.name, breached)
+        self.assertEqual(
+            frappe.db.get_value("HD Ticket", ticket.name, "agreement_status"),
+            "Failed",
+        )
+        self.assertNotIn(ticket.name, sweep_breached_tickets())
+
+    def test_deadline_warnings(self):
+        frappe.db.set_single_value("HD Settings", "sla_warning_lead_times", "30")
+        frappe.cache().delete_value(SLA_WARNING_LAST_RUN_KEY)
+        agent = create_agent("sla-warning-agent@example.com").name
+        ticket = make_ticket(priority="High")
+        frappe.db.set_value("HD Ticket", ticket.name, "_assign", f'["{agent}"]')
+
+        def warn(response_in: int):
+            if response_in:
+                frappe.db.set_value(
+                    "HD Ticket",
+                    ticket.name,
+                    "response_by",
+                    add_to_date(now_datetime(), minutes=response_in),
+                )
+            warn_upcoming_deadlines(now_datetime())
+            frappe.db.after_commit.run()
+            return frappe.get_all(
+                "HD Notification",
+                filters={
+                    "reference_ticket": ticket.name,
+                    "user_to": agent,
+                    "notification_type": "SLA Warning",
+                    "message": ["like", "First response%"],
+                },
+                pluck="message",
+            )
+
+        self.assertEqual(len(warn(10)), 1)
+        # Warned once per deadline
+        self.assertEqual(len(warn(0)), 1)
+        # A moved deadline is warned of again
+        self.assertEqual(len(warn(20)), 2)
@@ -1,64 +1,281 @@
+from functools import partial
+
 import frappe
+from frappe import _
 from frappe.model.document import Document
-from frappe.query_builder import JoinType
-from frappe.utils import now_datetime
+from frappe.utils import (
+    add_to_date,
+    cint,
+    format_datetime,
+    get_datetime,
+    now_datetime,
+    parse_json,
+)
 from pypika import Criterion
 
-from helpdesk.utils import get_context
+from helpdesk.helpdesk.doctype.hd_notification.utils import create_notifications
+from helpdesk.utils import (
+    clear_versioned_cache,
+    get_context,
+    get_versioned_cache,
+    publish_coalesced_event,
+)
 
 DOCTYPE = "HD Service Level Agreement"
+SWEEP_BATCH_SIZE = 500
+SWEEP_MAX_BATCHES = 20
+
 
+SLA_VERSION_KEY = "helpdesk:sla_version"
+# Time of the last deadline warning run, and the warnings sent as
+# "<ticket>:<field>:<deadline>:<lead>" scored by their deadline
+SLA_WARNING_LAST_RUN_KEY = "helpdesk:sla_warning_last_run"
+SLA_WARNED_KEY = "helpdesk:sla_warned"
 
-def get_sla(ticket: Document) -> Document:
+
+def get_sla(ticket: Document) -> frappe._dict | None:
     """
     Get Service Level Agreement for `ticket`
 
     :param doc: Ticket to use
-    :return: Applicable SLA
+    :return: Applicable SLA, with `name`
     """
-    QBSla = frappe.qb.DocType(DOCTYPE)
-    QBPriority = frappe.qb.DocType("HD Service Level Priority")
+    registry = get_sla_registry()
     now = now_datetime()
     priority = ticket.priority
-    q = (
-        frappe.qb.from_(QBSla)
-        .select(QBSla.name, QBSla.condition)
-        .where(QBSla.enabled == True)
-        .where(QBSla.default_sla == False)
-        .where(Criterion.any([QBSla.start_date.isnull(), QBSla.start_date <= now]))
-        .where(Criterion.any([QBSla.end_date.isnull(), QBSla.end_date >= now]))
-    )
-    if priority:
-        q = (
-            q.join(QBPriority, JoinType.inner)
-            .on(QBPriority.parent == QBSla.name)
-            .where(QBPriority.priority == priority)
-        )
-    sla_list = q.run(as_dict=True)
-    res = None
-    for sla in sla_list:
+    for sla in registry.slas:
+        if sla.start_date and get_datetime(sla.start_date) > now:
+            continue
+        if sla.end_date and get_datetime(sla.end_date) < now:
+            continue
+        if priority and priority not in sla.priorities:
+            continue
         cond = sla.get("condition")
         if not cond or frappe.safe_eval(cond, None, get_context(ticket)):
-            res = sla
-            break
-    return res or get_default()
+            return sla
+    return get_default()
 
 
-def get_default() -> Document:
+def get_default() -> frappe._dict | None:
     """
     Get default Service Level Agreement
 
-    :return: Default SLA
+    :return: Default SLA, with `name`
+    """
+    return get_sla_registry().default
+
+
+def get_sla_runtime(name: str) -> Document:
+    """
+    SLA `name` with its holidays, working hours and targets parsed. Loaded once
+    per SLA version and shared by every save in the process, treat as read only.
     """
-    return frappe.get_last_doc(
-        DOCTYPE,
-        filters={
-            "enabled": True,
-            "default_sla": True,
-        },
+    docs = get_sla_registry().docs
+    if name not in docs:
+        doc = frappe.get_doc(DOCTYPE, name)
+        doc.prepare_runtime()
+        docs[name] = doc
+    return docs[name]
+
+
+def get_sla_registry() -> frappe._dict:
+    return get_versioned_cache(SLA_VERSION_KEY, build_sla_registry)
+
+
+def build_sla_registry() -> frappe._dict:
+    QBSla = frappe.qb.DocType(DOCTYPE)
+    QBPriority = frappe.qb.DocType("HD Service Level Priority")
+    slas = (
+        frappe.qb.from_(QBSla)
+        .select(
+            QBSla.name,
+            QBSla.condition,
+            QBSla.start_date,
+            QBSla.end_date,
+            QBSla.default_sla,
+        )
+        .where(QBSla.enabled == True)
+        .orderby(QBSla.creation)
+        .run(as_dict=True)
+    )
+    priorities = {}
+    for parent, priority in (
+        frappe.qb.from_(QBPriority)
+        .select(QBPriority.parent, QBPriority.priority)
+        .where(QBPriority.parenttype == DOCTYPE)
+        .run()
+    ):
+        priorities.setdefault(parent, set()).add(priority)
+
+    default = None
+    for sla in slas:
+        sla.priorities = priorities.get(sla.name, set())
+        if sla.default_sla:
+            # Latest default wins, like `frappe.get_last_doc`
+            default = sla
+    return frappe._dict(
+        slas=[sla for sla in slas if not sla.default_sla],
+        default=default,
+        docs={},
     )
 
 
+def clear_sla_cache(doc=None, method=None):
+    clear_versioned_cache(SLA_VERSION_KEY)
+
+
+def sweep_breached_tickets():
+    """
+    Mark tickets whose response or resolution deadline passed as Failed,
+    without waiting for them to be saved, then warn assignees of deadlines
+    coming up. Runs on the scheduler.
+    """
+    now = now_datetime()
+    QBTicket = frappe.qb.DocType("HD Ticket")
+    resolution_slas = frappe.get_all(
+        DOCTYPE, filters={"apply_sla_for_resolution": 1}, pluck="name"
+    )
+    # Each lookup walks one of the (agreement_status, deadline) indexes
+    breaches = [
+        (QBTicket.agreement_status == "First Response Due")
+        & (QBTicket.response_by < now),
+    ]
+    if resolution_slas:
+        breaches += [
+            (QBTicket.agreement_status == status)
+            & (QBTicket.resolution_by < now)
+            & QBTicket.sla.isin(resolution_slas)
+            for status in ["First Response Due", "Resolution Due"]
+        ]
+
+    breached = []
+    for condition in breaches:
+        for _batch in range(SWEEP_MAX_BATCHES):
+            names = (
+                frappe.qb.from_(QBTicket)
+                .select(QBTicket.name)
+                .where(condition)
+                .limit(SWEEP_BATCH_SIZE)
+                .run(pluck=True)
+            )
+            if not names:
+                break
+            (
+                frappe.qb.update(QBTicket)
+                .set(QBTicket.agreement_status, "Failed")
+                .where(QBTicket.name.isin(names))
+                .run()
+            )
+            breached.extend(names)
+            if len(names) < SWEEP_BATCH_SIZE:
+                break
+
+    from helpdesk.helpdesk.doctype.hd_ticket.api import mark_navigation_changed
+
+    for name in breached:
+        publish_coalesced_event("helpdesk:ticket-update", name)
+        mark_navigation_changed(name)
+    warn_upcoming_deadlines(now)
+    return breached
+
+
+def get_warning_lead_times() -> list[int]:
+    """
+    Lead times in minutes from HD Settings, largest first
+    """
+    value = frappe.db.get_single_value("HD Settings", "sla_warning_lead_times")
+    leads = {cint(v) for v in (value or "").split(",")}
+    return sorted((lead for lead in leads if lead > 0), reverse=True)
+
+
+def warn_upcoming_deadlines(now):
+    """
+    Notify assignees once per ticket, deadline and lead time when a response or
+    resolution deadline is within one of the configured lead times. Only
+    tickets which crossed a lead time or were saved since the last run are
+    loaded, and warnings sent are remembered in Redis.
+    """
+    leads = get_warning_lead_times()
+    if not leads:
+        return
+    last_run = frappe.cache().get_value(SLA_WARNING_LAST_RUN_KEY) or add_to_date(
+        now, minutes=-leads[0]
+    )
+    QBTicket = frappe.qb.DocType("HD Ticket")
+    targets = [
+        ("response_by", "First response", ["First Response Due"]),
+        ("resolution_by", "Resolution", ["First Response Due", "Resolution Due"]),
+    ]
+    warnings = []
+    for field, label, statuses in targets:
+        crossed = Criterion.any(
+            QBTicket[field][
+                add_to_date(last_run, minutes=lead) : add_to_date(now, minutes=lead)
+            ]
+            for lead in leads
+        )
+        tickets = (
+            frappe.qb.from_(QBTicket)
+            .select(QBTicket.name, QBTicket._assign, QBTicket[field])
+            .where(QBTicket.agreement_status.isin(statuses))
+            .where(QBTicket[field] >= now)
+            .where(QBTicket[field] <= add_to_date(now, minutes=leads[0]))
+            # A save may have moved the deadline
+            .where(crossed | (QBTicket.modified > last_run))
+            .limit(SWEEP_BATCH_SIZE * SWEEP_MAX_BATCHES)
+            .run(as_dict=True)
+        )
+        for ticket in tickets:
+            deadline = get_datetime(ticket[field])
+            minutes_left = (deadline - now).total_seconds() / 60
+            lead = min(lead for lead in leads if minutes_left <= lead)
+            warnings.append((ticket, field, label, deadline, lead))
+
+    key = frappe.cache().make_key(SLA_WARNED_KEY)
+    members = [
+        f"{ticket.name}:{field}:{deadline.isoformat()}:{lead}"
+        for ticket, field, _label, deadline, lead in warnings
+    ]
+    pipe = frappe.cache().pipeline()
+    for member in members:
+        pipe.zscore(key, member)
+    sent = pipe.execute()
+
+    notifications, scores = [], {}
+    for (ticket, _field, label, deadline, lead), member, score in zip(
+        warnings, members, sent
+    ):
+        if score is not None:
+            continue
+        scores[member] = deadline.timestamp()
+        message = _("{0} due within {1} minutes, at {2}").format(
+            label, lead, format_datetime(deadline)
+        )
+        for agent in parse_json(ticket._assign or "[]"):
+            notifications.append(
+                {
+                    "user_from": "Administrator",
+                    "user_to": agent,
+                    "notification_type": "SLA Warning",
+                    "reference_ticket": ticket.name,
+                    "message": message,
+                }
+            )
+    create_notifications(notifications)
+    frappe.db.after_commit.add(partial(remember_sla_warnings, scores, now))
+
+
+def remember_sla_warnings(scores: dict[str, float], now):
+    key = frappe.cache().make_key(SLA_WARNED_KEY)
+    pipe = frappe.cache().pipeline()
+    if scores:
+        pipe.zadd(key, scores)
+    # Deadlines which passed cannot be warned of again
+    pipe.zremrangebyscore(key, 0, now.timestamp())
+    pipe.execute()
+    frappe.cache().set_value(SLA_WARNING_LAST_RUN_KEY, now)
+
+
 def convert_to_seconds(time):
     """
     Convert time string to seconds.
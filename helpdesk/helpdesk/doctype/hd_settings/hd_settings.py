@@ -15,6 +15,7 @@ from helpdesk.helpdesk.doctype.hd_ticket.hd_ticket import (
     remove_guest_ticket_creation_permission,
     set_guest_ticket_creation_permission,
 )
+from helpdesk.reference_data import get_status_category
 
 
 class HDSettings(Document):
@@ -32,9 +33,7 @@ class HDSettings(Document):
     def validate_send_feedback_when_ticket_closed(self):
         if not self.enable_email_ticket_feedback:
             return
-        status_category = frappe.db.get_value(
-            "HD Ticket Status", self.send_email_feedback_on_status, "category"
-        )
+        status_category = get_status_category(self.send_email_feedback_on_status)
         if status_category != "Resolved":
             frappe.throw(
                 _(
@@ -2,12 +2,15 @@
 # For license information, please see license.txt
 
 import frappe
-from frappe import _
-from frappe.core.doctype.version.version import get_diff
 from frappe.exceptions import DoesNotExistError
 from frappe.model.document import Document
 from frappe.model.naming import append_number_if_name_exists
 
+from helpdesk.helpdesk.doctype.hd_ticket.api import clear_user_navigation_windows
+
+# Membership changes touching more users are synced in a background job
+TEAM_SYNC_BACKGROUND_THRESHOLD = 20
+
 
 class HDTeam(Document):
     @frappe.whitelist()
@@ -16,17 +19,8 @@ class HDTeam(Document):
 
     def after_insert(self):
         self.create_assignment_rule()
-        assignment_rule_doc = frappe.get_doc("Assignment Rule", self.assignment_rule)
-
-        for user in self.users:
-            _user = user.get("user")
-            if not _user:
-                continue
-            assignment_rule_doc.append("users", {"user": _user})
-
-        if assignment_rule_doc.disabled and assignment_rule_doc.users:
-            assignment_rule_doc.disabled = False
-        assignment_rule_doc.save()
+        added = {row.user for row in self.users if row.user}
+        self.sync_support_rotation(added, len(added))
 
     def after_rename(self, olddn, newdn, merge=False):
         # Update the condition for the linked assignment rule
@@ -104,69 +98,74 @@ class HDTeam(Document):
 
     def update_support_rotations(self):
         """
-        Update the support rotations for the hd_agent
-        # If agent removed, remove from the support rule of the team
-        # If agent added add to the support rule of the team and also, while adding remove from base Support Rotation
+        Sync the team's assignment rule with the members added or removed in
+        this save
         """
-        assg_rule_doc = frappe.get_doc("Assignment Rule", self.assignment_rule)
-        if not assg_rule_doc:
-            return
-
-        previous_doc = self.get_doc_before_save()
-        diff = get_diff(previous_doc, self)
-        if not diff:
-            return
-
-        if not diff.get("removed") and not diff.get("added"):
+        # New teams are synced in after_insert
+        if self.flags.in_insert or not self.assignment_rule:
             return
+        previous = self.get_doc_before_save()
+        old = {row.user for row in previous.users} if previous else set()
+        new = {row.user for row in self.users if row.user}
+        added, removed = new - old, old - new
+        if added or removed:
+            # The tickets these agents can navigate through changed
+            clear_user_navigation_windows(added | removed)
+            self.sync_support_rotation(added, len(added) + len(removed))
+
+    def sync_support_rotation(self, added: set, changes: int):
+        """
+        Large membership changes are synced in the background
 
-        for user in diff.get("removed"):
-            self.update_assignment_rule_users(user, assg_rule_doc, action="remove")
-
-        for user in diff.get("added"):
-            self.update_assignment_rule_users(user, assg_rule_doc)
-
-    def update_assignment_rule_users(self, user, assignment_rule_doc, action="add"):
-        _user = user[1].get("user")
-        if not user:
-            frappe.throw(_("User Not found"))
+        :param added: Members who joined the team
+        :param changes: Number of members who joined or left
+        """
+        if changes > TEAM_SYNC_BACKGROUND_THRESHOLD:
+            frappe.enqueue(
+                "helpdesk.helpdesk.doctype.hd_team.hd_team.sync_team_rotation",
+                queue="long",
+                enqueue_after_commit=True,
+                team=self.name,
+                added=sorted(added),
+            )
             return
+        sync_team_rotation(self.name, sorted(added))
 
-        if action == "add":
-            assignment_rule_doc.append("users", {"user": _user})
-            if assignment_rule_doc.disabled:
-                assignment_rule_doc.disabled = False
-            assignment_rule_doc.save()
 
-            # remove the user from the base assignment rule
-            base_assignment_rule = frappe.get_value(
-                "HD Settings", "HD Settings", "base_support_rotation"
-            )
-            base_assignment_rule = frappe.get_doc(
-                "Assignment Rule", base_assignment_rule
-            )
-            user_id = frappe.get_value(
-                "Assignment Rule User",
-                {"user": _user, "parent": base_assignment_rule.name},
-            )
-            if user_id:
-                frappe.delete_doc("Assignment Rule User", user_id)
-        else:
-            user_id = frappe.get_value(
-                "Assignment Rule User",
-                {"user": _user, "parent": assignment_rule_doc.name},
-            )
-            if not user_id:
-                return
-            frappe.delete_doc("Assignment Rule User", user_id)
+def sync_team_rotation(team: str, added: list[str] | None = None):
+    """
+    Replace the users of the team's assignment rule with its current members,
+    and drop `added` from the base support rotation. One save per rule.
 
-            # disable the assignment rule if there are no users
-            total_users_in_assignment_rule = frappe.db.count(
-                "Assignment Rule User", {"parent": assignment_rule_doc.name}
-            )
-            if total_users_in_assignment_rule == 0:
-                assignment_rule_doc.disabled = True
-                assignment_rule_doc.save()
+    :param team: Team to sync
+    :param added: Members who joined the team
+    """
+    team = frappe.get_doc("HD Team", team)
+    members = list(dict.fromkeys(row.user for row in team.users if row.user))
+    rule = frappe.get_doc("Assignment Rule", team.assignment_rule)
+    users = [row.user for row in rule.users]
+    if users != members:
+        rule.set("users", [{"user": user} for user in members])
+        # The rule is disabled while the team has no members. Otherwise it is
+        # left as is, an admin may have disabled it on purpose.
+        if bool(users) != bool(members):
+            rule.disabled = not members
+        rule.save(ignore_permissions=True)
+
+    if added:
+        remove_from_base_rotation(added)
+
+
+def remove_from_base_rotation(users: list[str]):
+    base = frappe.db.get_single_value("HD Settings", "base_support_rotation")
+    if not base:
+        return
+    rule = frappe.get_doc("Assignment Rule", base)
+    users = set(users)
+    remaining = [row for row in rule.users if row.user not in users]
+    if len(remaining) != len(rule.users):
+        rule.set("users", remaining)
+        rule.save(ignore_permissions=True)
 
 
 @frappe.whitelist()
@@ -1,9 +1,108 @@
 # Copyright (c) 2022, Frappe Technologies and Contributors
 # See license.txt
 
-# import frappe
-import unittest
+import frappe
+from frappe.tests.utils import FrappeTestCase
 
+from helpdesk.helpdesk.doctype.hd_team.utils import (
+    get_agent_loads,
+    get_load_key,
+    pick_agent,
+)
+from helpdesk.test_utils import count_queries, create_agent, make_ticket
 
-class TestHDTeam(unittest.TestCase):
-    pass
+
+class TestHDTeam(FrappeTestCase):
+    def setUp(self):
+        # Counters left by rolled back tests would be off
+        frappe.cache().delete(get_load_key())
+        self.agents = [
+            create_agent(f"load.agent{i}@example.com", f"Load{i}").name
+            for i in range(3)
+        ]
+        self.team = frappe.get_doc(
+            {
+                "doctype": "HD Team",
+                "team_name": "Load Test Team",
+                "users": [{"user": agent} for agent in self.agents],
+            }
+        ).insert()
+
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def test_tickets_go_to_least_loaded_agent(self):
+        busy = make_ticket(agent_group=self.team.name)
+        make_ticket(agent_group=self.team.name)
+        first, second = self.agents[0], self.agents[1]
+        self.assertEqual(get_agent_loads([first])[first], (1, 0))
+        self.assertEqual(get_agent_loads([second])[second], (1, 0))
+
+        busy.reload()
+        busy.status = "Closed"
+        busy.save()
+        self.assertEqual(get_agent_loads([first])[first], (0, 0))
+        ticket = make_ticket(agent_group=self.team.name)
+        self.assertEqual(frappe.parse_json(ticket.reload()._assign), [first])
+
+    def test_warm_pick_runs_no_queries(self):
+        frappe.db.after_commit.run()
+        pick_agent(self.team.name)
+        # Counters counted in a transaction with writes are cached on commit
+        frappe.db.after_commit.run()
+        with count_queries() as counts:
+            agent = pick_agent(self.team.name)
+        self.assertEqual(counts["*"], 0)
+        self.assertIn(agent, self.agents)
+
+    def test_loads_seeded_after_commit(self):
+        make_ticket(agent_group=self.team.name)
+        first = self.agents[0]
+        field = f"open:{first}"
+        self.assertEqual(get_agent_loads([first])[first], (1, 0))
+        self.assertIsNone(frappe.cache().execute_command("HGET", get_load_key(), field))
+
+        frappe.db.after_commit.run()
+        self.assertEqual(
+            int(frappe.cache().execute_command("HGET", get_load_key(), field)), 1
+        )
+        self.assertEqual(get_agent_loads([first])[first], (1, 0))
+
+    def test_membership_sync(self):
+        base = frappe.db.get_single_value("HD Settings", "base_support_rotation")
+        newcomer = create_agent("load.agent3@example.com", "Load3").name
+        base_rule = frappe.get_doc("Assignment Rule", base)
+        base_rule.append("users", {"user": newcomer})
+        base_rule.save()
+
+        self.team.reload()
+        self.team.set(
+            "users",
+            [{"user": self.agents[1]}, {"user": self.agents[2]}, {"user": newcomer}],
+        )
+        self.team.save()
+
+        rule = frappe.get_doc("Assignment Rule", self.team.assignment_rule)
+        self.assertEqual(
+            [row.user for row in rule.users],
+            [self.agents[1], self.agents[2], newcomer],
+        )
+        self.assertFalse(rule.disabled)
+        base_users = frappe.get_all(
+            "Assignment Rule User", filters={"parent": base}, pluck="user"
+        )
+        self.assertNotIn(newcomer, base_users)
+
+        self.team.set("users", [])
+        self.team.save()
+        self.assertTrue(frappe.db.get_value("Assignment Rule", rule.name, "disabled"))
+
+    def test_membership_sync_keeps_disabled_rule(self):
+        frappe.db.set_value("Assignment Rule", self.team.assignment_rule, "disabled", 1)
+        self.team.reload()
+        self.team.set("users", [{"user": agent} for agent in self.agents[:2]])
+        self.team.save()
+
+        rule = frappe.get_doc("Assignment Rule", self.team.assignment_rule)
+        self.assertEqual([row.user for row in rule.users], self.agents[:2])
+        self.assertTrue(rule.disabled)
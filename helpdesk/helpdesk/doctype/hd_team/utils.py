@@ -0,0 +1,324 @@
+from collections import Counter
+
+import frappe
+from frappe.query_builder.functions import Count, Sum
+from frappe.utils import now_datetime
+from pypika.terms import Case
+
+from helpdesk.utils import clear_versioned_cache, get_versioned_cache
+
+TEAM_AGENTS_VERSION_KEY = "helpdesk:team_agents_version"
+AGENT_LOAD_KEY = "helpdesk:agent_load"
+RECONCILE_BATCH_SIZE = 500
+# Assignment Rule types which the load aware engine takes over, rules based on
+# a field are still applied by the framework
+AUTO_ASSIGN_RULES = ["Round Robin", "Load Balancing"]
+# Agreement statuses of an SLA which is still running
+ACTIVE_SLA_STATUSES = ["First Response Due", "Resolution Due", "Failed"]
+# Counters are fields named "open:<agent>" and "sla:<agent>" of one hash.
+# Counters missing from the hash are recounted on read, so only existing ones
+# are moved.
+LOAD_DELTA_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call("HEXISTS", KEYS[1], ARGV[i]) == 1 then
+        redis.call("HINCRBY", KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+"""
+
+
+def get_team_agents() -> dict[str, frappe._dict]:
+    """
+    Members, active agents and assignment rule state of every team. Built
+    once per process and rebuilt when a team, agent or assignment rule changes.
+    """
+    return get_versioned_cache(TEAM_AGENTS_VERSION_KEY, build_team_agents)
+
+
+def clear_team_agents(doc=None, method=None):
+    clear_versioned_cache(TEAM_AGENTS_VERSION_KEY)
+
+
+def build_team_agents() -> dict[str, frappe._dict]:
+    active = set(frappe.get_all("HD Agent", filters={"is_active": 1}, pluck="name"))
+    members = {}
+    for row in frappe.get_all(
+        "HD Team Member", fields=["parent", "user"], order_by="idx asc"
+    ):
+        members.setdefault(row.parent, []).append(row.user)
+    rules = {
+        rule.name: rule
+        for rule in frappe.get_all(
+            "Assignment Rule",
+            filters={"document_type": "HD Ticket"},
+            fields=["name", "disabled", "rule"],
+        )
+    }
+    rule_users, rule_days = set(), {}
+    for row in frappe.get_all(
+        "Assignment Rule User",
+        filters={"parenttype": "Assignment Rule", "parent": ["in", list(rules)]},
+        fields=["parent"],
+    ):
+        rule_users.add(row.parent)
+    for row in frappe.get_all(
+        "Assignment Rule Day",
+        filters={"parenttype": "Assignment Rule", "parent": ["in", list(rules)]},
+        fields=["parent", "day"],
+    ):
+        rule_days.setdefault(row.parent, set()).add(row.day)
+
+    teams = {}
+    for team in frappe.get_all("HD Team", fields=["name", "assignment_rule"]):
+        rule = rules.get(team.assignment_rule)
+        # Same check as the team rule applying at all: enabled and with users
+        rule_active = bool(rule and not rule.disabled and rule.name in rule_users)
+        team_members = members.get(team.name, [])
+        teams[team.name] = frappe._dict(
+            members=set(team_members),
+            agents=[user for user in team_members if user in active],
+            rule_active=rule_active,
+            auto_assign=rule_active and rule.rule in AUTO_ASSIGN_RULES,
+            days=rule_days.get(team.assignment_rule, set()),
+        )
+    return teams
+
+
+def get_team(team: str | None) -> frappe._dict | None:
+    return get_team_agents().get(team) if team else None
+
+
+def pick_agent(team: str) -> str | None:
+    """
+    Least loaded active agent of `team`, by open tickets and then by tickets
+    with a running SLA. Ties go to the first member in team order. One Redis
+    round trip once the team map and counters are warm.
+
+    :return: Agent, or None if the team does not assign automatically today
+    """
+    team = get_team(team)
+    if not team or not team.auto_assign or not team.agents:
+        return
+    if team.days and now_datetime().strftime("%A") not in team.days:
+        return
+    loads = get_agent_loads(team.agents)
+    return min(team.agents, key=lambda agent: loads[agent])
+
+
+def get_load_key() -> bytes:
+    return frappe.cache().make_key(AGENT_LOAD_KEY)
+
+
+def get_agent_loads(agents: list[str]) -> dict[str, tuple[int, int]]:
+    """
+    Open tickets and tickets with a running SLA assigned to each of `agents`,
+    including changes of the current transaction. Agents without counters
+    are counted in the database, and cached once that count is committed.
+    """
+    agents = list(agents)
+    key = get_load_key()
+    fields = [f"{kind}:{agent}" for agent in agents for kind in ("open", "sla")]
+    pipe = frappe.cache().pipeline()
+    pipe.hmget(key, fields)
+    cached = dict(zip(fields, pipe.execute()[0]))
+    missing = [
+        agent
+        for agent in agents
+        if cached[f"open:{agent}"] is None or cached[f"sla:{agent}"] is None
+    ]
+    if missing:
+        counts = count_agent_loads(missing)
+        cached.update(counts)
+        if frappe.db.transaction_writes:
+            # The count holds changes which may still roll back, and which
+            # would be counted again by the deltas applied on commit
+            track_agent_loads()
+            frappe.flags.helpdesk_agent_load_seeds.update(missing)
+        else:
+            seed_agent_loads(counts)
+
+    # Database counts already include what this transaction changed
+    pending = Counter(frappe.flags.helpdesk_agent_load_deltas or {})
+    for agent in missing:
+        pending.pop(f"open:{agent}", None)
+        pending.pop(f"sla:{agent}", None)
+    return {
+        agent: tuple(
+            max(int(cached[f"{kind}:{agent}"]) + pending.get(f"{kind}:{agent}", 0), 0)
+            for kind in ("open", "sla")
+        )
+        for agent in agents
+    }
+
+
+def get_ticket_load(ticket) -> Counter:
+    """
+    What `ticket` adds to the load of each of its assignees
+    """
+    load = Counter()
+    if ticket and ticket.get("status_category") == "Open":
+        load["open"] = 1
+        if ticket.get("sla") and ticket.get("agreement_status") in ACTIVE_SLA_STATUSES:
+            load["sla"] = 1
+    return load
+
+
+def get_ticket_load_deltas(ticket) -> Counter:
+    """
+    Counter deltas for the assignees of a saved `ticket`, from the change of
+    its status or SLA state
+    """
+    before = get_ticket_load(ticket.get_doc_before_save())
+    after = get_ticket_load(ticket)
+    if before == after:
+        return Counter()
+    deltas = Counter()
+    for agent in frappe.parse_json(ticket.get("_assign") or "[]"):
+        for kind in ("open", "sla"):
+            deltas[f"{kind}:{agent}"] += after[kind] - before[kind]
+    return deltas
+
+
+def update_todo_load(doc, method=None):
+    """
+    Move the counters of the agents a ticket is assigned to or unassigned from.
+    Hooked on ToDo.
+    """
+    if doc.reference_type != "HD Ticket":
+        return
+    before = doc.get_doc_before_save()
+    old_agent = before.allocated_to if before and before.status == "Open" else None
+    new_agent = (
+        doc.allocated_to if method != "on_trash" and doc.status == "Open" else None
+    )
+    if old_agent == new_agent:
+        return
+    load = get_ticket_load(
+        frappe.db.get_value(
+            "HD Ticket",
+            doc.reference_name,
+            ["status_category", "sla", "agreement_status"],
+            as_dict=True,
+        )
+    )
+    if not load:
+        return
+    deltas = Counter()
+    for kind, value in load.items():
+        if old_agent:
+            deltas[f"{kind}:{old_agent}"] -= value
+        if new_agent:
+            deltas[f"{kind}:{new_agent}"] += value
+    change_agent_loads(deltas)
+
+
+def change_agent_loads(deltas: Counter):
+    """
+    Move agent counters by `deltas` once the transaction commits. Until then
+    the deltas are seen by `get_agent_loads` in this transaction only.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    track_agent_loads()
+    frappe.flags.helpdesk_agent_load_deltas.update(deltas)
+
+
+def track_agent_loads():
+    """
+    Start collecting counter deltas and agents to seed for this transaction
+    """
+    if frappe.flags.helpdesk_agent_load_deltas is None:
+        frappe.flags.helpdesk_agent_load_deltas = Counter()
+        frappe.flags.helpdesk_agent_load_seeds = set()
+        frappe.db.after_commit.add(apply_agent_load_deltas)
+        frappe.db.after_rollback.add(discard_agent_load_deltas)
+
+
+def apply_agent_load_deltas():
+    pending = frappe.flags.helpdesk_agent_load_deltas or {}
+    seeds = frappe.flags.helpdesk_agent_load_seeds or set()
+    discard_agent_load_deltas()
+    args = []
+    for field, delta in pending.items():
+        if delta:
+            args.extend([field, delta])
+    if args:
+        frappe.cache().eval(LOAD_DELTA_SCRIPT, 1, get_load_key(), *args)
+    if seeds:
+        # Counted after the deltas, which skip missing counters, so the
+        # committed changes are counted once
+        seed_agent_loads(count_agent_loads(sorted(seeds)))
+
+
+def discard_agent_load_deltas():
+    frappe.flags.helpdesk_agent_load_deltas = None
+    frappe.flags.helpdesk_agent_load_seeds = None
+
+
+def seed_agent_loads(counts: dict[str, int]):
+    """
+    Cache counters which are still missing, counters set meanwhile win
+    """
+    key = get_load_key()
+    pipe = frappe.cache().pipeline()
+    for field, count in counts.items():
+        pipe.hsetnx(key, field, count)
+    pipe.execute()
+
+
+def reconcile_agent_loads():
+    """
+    Recount cached agent counters from the database, fixing any drift from
+    writes which bypass `change_agent_loads`
+    """
+    key = get_load_key()
+    pipe = frappe.cache().pipeline()
+    pipe.hkeys(key)
+    agents = sorted(
+        {frappe.safe_decode(field).split(":", 1)[1] for field in pipe.execute()[0]}
+    )
+    for i in range(0, len(agents), RECONCILE_BATCH_SIZE):
+        pipe.hset(key, mapping=count_agent_loads(agents[i : i + RECONCILE_BATCH_SIZE]))
+        pipe.execute()
+
+
+def count_agent_loads(agents: list[str]) -> dict[str, int]:
+    """
+    :return: Counter fields of `agents` with their values
+    """
+    QBToDo = frappe.qb.DocType("ToDo")
+    QBTicket = frappe.qb.DocType("HD Ticket")
+    rows = (
+        frappe.qb.from_(QBToDo)
+        .join(QBTicket)
+        .on(QBTicket.name == QBToDo.reference_name)
+        .select(
+            QBToDo.allocated_to,
+            Count("*"),
+            Sum(
+                Case()
+                .when(
+                    (QBTicket.sla.notnull())
+                    & (QBTicket.sla != "")
+                    & QBTicket.agreement_status.isin(ACTIVE_SLA_STATUSES),
+                    1,
+                )
+                .else_(0)
+            ),
+        )
+        .where(QBToDo.reference_type == "HD Ticket")
+        .where(QBToDo.status == "Open")
+        .where(QBToDo.allocated_to.isin(list(agents)))
+        .where(QBTicket.status_category == "Open")
+        .groupby(QBToDo.allocated_to)
+        .run()
+    )
+    counts = {}
+    for agent in agents:
+        counts[f"open:{agent}"] = 0
+        counts[f"sla:{agent}"] = 0
+    for agent, open_count, sla_count in rows:
+        counts[f"open:{agent}"] = int(open_count or 0)
+        counts[f"sla:{agent}"] = int(sla_count or 0)
+    return counts
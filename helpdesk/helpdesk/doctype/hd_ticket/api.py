@@ -1,10 +1,16 @@
 import json
+import time
+from collections import Counter, defaultdict
 from datetime import timedelta
+from functools import partial
 
 import frappe
 from bs4 import BeautifulSoup
 from frappe import _
+from frappe.desk.form.assign_to import add as assign
+from frappe.desk.form.assign_to import clear as clear_all_assignments
 from frappe.model.document import get_controller
+from frappe.query_builder.functions import Count
 from frappe.utils import (
     add_to_date,
     get_datetime,
@@ -12,14 +18,35 @@ from frappe.utils import (
     now_datetime,
 )
 from frappe.utils.caching import redis_cache
+from frappe.utils.file_manager import delete_file
 from pypika import Criterion, Order
 
 from helpdesk.api.doc import handle_at_me_support
 from helpdesk.consts import DEFAULT_TICKET_TEMPLATE
 from helpdesk.helpdesk.doctype.hd_form_script.hd_form_script import get_form_script
+from helpdesk.helpdesk.doctype.hd_notification.utils import (
+    change_unread_counts,
+    create_notifications,
+    get_ticket_unread_counts,
+)
+from helpdesk.helpdesk.doctype.hd_service_level_agreement.utils import get_sla_runtime
 from helpdesk.helpdesk.doctype.hd_settings.helpers import get_rendered_banner_msg
+from helpdesk.helpdesk.doctype.hd_team.utils import (
+    change_agent_loads,
+    get_team,
+    get_ticket_load_deltas,
+    pick_agent,
+)
+from helpdesk.helpdesk.doctype.hd_ticket_change.hd_ticket_change import (
+    get_field_changes,
+    get_ticket_changes,
+    log_ticket_changes,
+)
+from helpdesk.helpdesk.doctype.hd_ticket_seen.hd_ticket_seen import buffer_ticket_seen
 from helpdesk.helpdesk.doctype.hd_ticket_template.api import get_fields_meta
 from helpdesk.helpdesk.doctype.hd_ticket_template.api import get_one as get_template
+from helpdesk.reference_data import get_status_category
+from helpdesk.search import HelpdeskSearch
 from helpdesk.utils import (
     agent_only,
     check_permissions,
@@ -84,35 +111,7 @@ def get_one(name: str | int, is_customer_portal: bool = False):
         }
     template = ticket.template or DEFAULT_TICKET_TEMPLATE
 
-    linked_calls = frappe.db.get_all(
-        "Dynamic Link",
-        filters={"link_name": ticket["name"], "parenttype": "TP Call Log"},
-        pluck="parent",
-    )
-
-    calls = []
-
-    for call in linked_calls:
-        call = frappe.get_cached_doc(
-            "TP Call Log",
-            call,
-            fields=[
-                "name",
-                "caller",
-                "receiver",
-                "duration",
-                "type",
-                "status",
-                "from",
-                "to",
-                "recording_url",
-                "creation",
-            ],
-        ).as_dict()
-
-        calls.append(call)
-
-    call_logs = parse_call_logs(calls)
+    call_logs = get_call_logs(ticket["name"])
 
     return {
         **ticket,
@@ -234,7 +233,8 @@ def get_history(ticket: str):
         .where(QBActivity.ticket == str(ticket))
         .orderby(QBActivity.creation, order=Order.desc)
     )
-    history = history.run(as_dict=True)
+    history = history.run(as_dict=True) + get_ticket_changes(ticket)
+    history.sort(key=lambda h: h.creation, reverse=True)
     for h in history:
         h.user = get_user_info_for_avatar(h.owner)
     return history
@@ -278,36 +278,30 @@ def get_tags(ticket: str):
 
 
 def get_call_logs(ticket: str):
-    linked_calls = frappe.db.get_all(
-        "Dynamic Link",
-        filters={"link_name": ticket, "parenttype": "TP Call Log"},
-        pluck="parent",
-    )
-
-    calls = []
-
-    for call in linked_calls:
-        call = frappe.get_cached_doc(
-            "TP Call Log",
-            call,
-            fields=[
-                "name",
-                "caller",
-                "receiver",
-                "duration",
-                "type",
-                "status",
-                "from",
-                "to",
-                "recording_url",
-                "creation",
-            ],
-        ).as_dict()
-
-        calls.append(call)
-
-    call_logs = parse_call_logs(calls)
-    return call_logs
+    QBCallLog = frappe.qb.DocType("TP Call Log")
+    QBDynamicLink = frappe.qb.DocType("Dynamic Link")
+    calls = (
+        frappe.qb.from_(QBCallLog)
+        .join(QBDynamicLink)
+        .on(QBDynamicLink.parent == QBCallLog.name)
+        .select(
+            QBCallLog.name,
+            QBCallLog.caller,
+            QBCallLog.receiver,
+            QBCallLog.duration,
+            QBCallLog.type,
+            QBCallLog.status,
+            QBCallLog["from"],
+            QBCallLog.to,
+            QBCallLog.recording_url,
+            QBCallLog.creation,
+        )
+        .where(QBDynamicLink.parenttype == "TP Call Log")
+        .where(QBDynamicLink.link_name == str(ticket))
+        .orderby(QBCallLog.creation, order=Order.asc)
+        .run(as_dict=True)
+    )
+    return parse_call_logs(calls)
 
 
 @redis_cache()
@@ -323,6 +317,255 @@ def get_attachments(doctype, name):
     )
 
 
+BULK_UPDATE_FIELDS = {
+    "status": "HD Ticket Status",
+    "priority": "HD Ticket Priority",
+    "agent_group": "HD Team",
+    "ticket_type": "HD Ticket Type",
+}
+BULK_SIDE_EFFECT_FIELDS = [
+    "status_category",
+    "sla",
+    "first_responded_on",
+    "first_response_time",
+    "service_level_agreement_creation",
+    "response_by",
+    "resolution_by",
+    "resolution_date",
+    "resolution_time",
+    "on_hold_since",
+    "total_hold_time",
+    "agreement_status",
+]
+BULK_UPDATE_CHUNK_SIZE = 500
+
+
+@frappe.whitelist()
+@agent_only
+def bulk_update(
+    tickets: list[str | int], values: dict, assign_to: str | None = None
+) -> dict:
+    """
+    Update many tickets in one pass instead of a full save per ticket. SLA and
+    status category effects are computed in memory and written back with
+    batched UPDATEs, followed by one activity insert, one realtime event and
+    one search index batch.
+
+    :param tickets: Tickets to update
+    :param values: New values, only `status`, `priority`, `agent_group` and
+        `ticket_type` are accepted
+    :param assign_to: Agent to assign all tickets to
+    :return: Names of updated tickets
+    """
+    return apply_bulk_update(
+        frappe.parse_json(tickets) or [], frappe.parse_json(values) or {}, assign_to
+    )
+
+
+def apply_bulk_update(
+    tickets: list[str | int], values: dict, assign_to: str | None = None
+) -> dict:
+    """
+    Internal counterpart of `bulk_update`, for background jobs
+    """
+    if invalid := set(values) - set(BULK_UPDATE_FIELDS):
+        frappe.throw(
+            _("Cannot bulk update {0}").format(", ".join(sorted(invalid))),
+            frappe.ValidationError,
+        )
+    for field, value in values.items():
+        doctype = BULK_UPDATE_FIELDS[field]
+        if value and not frappe.db.exists(doctype, value):
+            frappe.throw(_("{0} {1} does not exist").format(_(doctype), value))
+    if assign_to and not frappe.db.exists("HD Agent", assign_to):
+        frappe.throw(_("{0} is not an agent").format(assign_to))
+
+    frappe.has_permission("HD Ticket", "write", throw=True)
+    # Permission query conditions apply once here, unreadable tickets are dropped
+    rows = frappe.get_list(
+        "HD Ticket",
+        filters={"name": ["in", tickets]},
+        fields=["*"],
+        limit_page_length=0,
+    )
+    if len(rows) != len(set(map(str, tickets))):
+        frappe.throw(
+            _("Insufficient Permission for {0}").format(_("HD Ticket")),
+            frappe.PermissionError,
+        )
+
+    docs = [get_bulk_ticket(row, values) for row in rows]
+    changed = [doc for doc in docs if get_bulk_changes(doc)]
+    write_bulk_changes(changed)
+    log_bulk_activities(changed)
+    change_agent_loads(sum(map(get_ticket_load_deltas, changed), Counter()))
+    assigned = apply_bulk_team_change(changed, auto_assign=not assign_to)
+    notify_reopened_tickets(changed)
+    for doc in changed:
+        doc.handle_email_feedback()
+
+    if assign_to:
+        assigned += assign_tickets(docs, assign_to)
+
+    changed_names = {doc.name for doc in changed}
+    for doc in changed:
+        # Whoever saves the ticket has seen the change
+        buffer_ticket_seen(doc.name)
+    for doc in changed + [doc for doc in assigned if doc.name not in changed_names]:
+        doc.publish_update()
+    HelpdeskSearch().index_docs(changed)
+    return {"updated": [doc.name for doc in changed]}
+
+
+def get_bulk_ticket(row: dict, values: dict):
+    """
+    Build a ticket from an already fetched row and run the same status
+    and SLA effects, permission checks and validations as a regular save,
+    without touching the database
+    """
+    doc = frappe.get_doc({**row, "doctype": "HD Ticket"})
+    doc._doc_before_save = frappe.get_doc({**row, "doctype": "HD Ticket"})
+    doc.update(values)
+    if doc.has_value_changed("status"):
+        doc.status_category = get_status_category(doc.status)
+    doc.set_first_responded_on()
+    doc.set_sla()
+    if doc.sla:
+        get_sla_runtime(doc.sla).apply(doc)
+    # Same checks as a regular save, against the updated ticket
+    doc.check_permission("write")
+    doc.check_update_perms()
+    doc.run_method("validate")
+    return doc
+
+
+def get_bulk_changes(doc) -> dict:
+    if not hasattr(doc, "_bulk_changes"):
+        doc._bulk_changes = {
+            field: doc.get(field)
+            for field in [*BULK_UPDATE_FIELDS, *BULK_SIDE_EFFECT_FIELDS]
+            if doc.has_value_changed(field)
+        }
+    return doc._bulk_changes
+
+
+def write_bulk_changes(docs: list):
+    if not docs:
+        return
+    now = now_datetime()
+    for doc in docs:
+        doc.modified = now
+        doc.modified_by = frappe.session.user
+    frappe.db.bulk_update(
+        "HD Ticket",
+        {doc.name: get_bulk_changes(doc) for doc in docs},
+        chunk_size=BULK_UPDATE_CHUNK_SIZE,
+        modified=now,
+    )
+
+
+def log_bulk_activities(docs: list):
+    log_ticket_changes([change for doc in docs for change in get_field_changes(doc)])
+
+
+def apply_bulk_team_change(docs: list, auto_assign: bool = True) -> list:
+    """
+    Bulk counterpart of `HDTicket.remove_assignment_if_not_in_team` and
+    `HDTicket.assign_from_team`, team membership comes from the cached team map
+
+    :param auto_assign: Assign tickets left without agent to their team
+    :return: Tickets which were assigned
+    """
+    assignments = []
+    for doc in docs:
+        if not (
+            "agent_group" in get_bulk_changes(doc)
+            and doc.agent_group
+            and doc.status_category == "Open"
+        ):
+            continue
+        assignees = json.loads(doc._assign or "[]")
+        team = get_team(doc.agent_group)
+        if assignees and team and team.rule_active and assignees[0] not in team.members:
+            clear_all_assignments("HD Ticket", doc.name)
+            frappe.publish_realtime(
+                "helpdesk:update-ticket-assignee",
+                {"ticket_id": doc.name},
+                after_commit=True,
+            )
+            assignees = []
+            doc._assign = "[]"
+        if auto_assign and not assignees:
+            if agent := pick_agent(doc.agent_group):
+                # Assigned right away so the next pick sees this ticket
+                add_assignments([(doc, agent)])
+                assignments.append((doc, agent))
+    notify_assignments(assignments)
+    return [doc for doc, _agent in assignments]
+
+
+def notify_reopened_tickets(docs: list):
+    notifications = []
+    for doc in docs:
+        if doc.status_category != "Open" or "status_category" not in (
+            get_bulk_changes(doc)
+        ):
+            continue
+        for agent in json.loads(doc._assign or "[]"):
+            notifications.append(
+                {
+                    "user_from": frappe.session.user,
+                    "reference_ticket": doc.name,
+                    "user_to": agent,
+                    "notification_type": "Reaction",
+                }
+            )
+    create_notifications(notifications)
+
+
+def assign_tickets(docs: list, agent: str) -> list:
+    """
+    :return: Tickets which were not assigned to `agent` yet
+    """
+    docs = [doc for doc in docs if agent not in json.loads(doc._assign or "[]")]
+    assignments = [(doc, agent) for doc in docs]
+    add_assignments(assignments)
+    notify_assignments(assignments)
+    return docs
+
+
+def notify_assignments(assignments: list[tuple]):
+    create_notifications(
+        [
+            {
+                "user_from": frappe.session.user,
+                "reference_ticket": doc.name,
+                "user_to": agent,
+                "notification_type": "Assignment",
+            }
+            for doc, agent in assignments
+            if agent != frappe.session.user
+        ]
+    )
+
+
+def add_assignments(assignments: list[tuple]):
+    """
+    Assign tickets through `assign_to.add`, so assignees get the same share,
+    permission check, notification and ToDo hooks as a regular assignment.
+    The ToDo hooks move agent loads.
+
+    :param assignments: `(ticket, agent)` pairs, tickets holding their current
+        `_assign`
+    """
+    for doc, agent in assignments:
+        assign({"assign_to": [agent], "doctype": "HD Ticket", "name": doc.name})
+        doc._assign = json.dumps([*json.loads(doc._assign or "[]"), agent])
+
+
+MERGE_BACKGROUND_THRESHOLD = 500
+
+
 @frappe.whitelist()
 @agent_only
 def merge_ticket(source: int, target: int):
@@ -334,30 +577,69 @@ def merge_ticket(source: int, target: int):
     if source == target:
         frappe.throw(_("Source and target ticket cannot be same"))
 
-    controller = get_controller("HD Ticket")
+    # Very long threads are copied in the background, progress is published
+    # against the target ticket
+    if count_merge_rows(source) > MERGE_BACKGROUND_THRESHOLD:
+        frappe.enqueue(
+            "helpdesk.helpdesk.doctype.hd_ticket.api.merge_ticket_rows",
+            queue="long",
+            job_id=f"helpdesk:merge_ticket:{source}",
+            deduplicate=True,
+            enqueue_after_commit=True,
+            source=source,
+            target=target,
+        )
+        return {"queued": True}
 
-    source_comments = frappe.db.get_list(
-        "HD Ticket Comment", filters={"reference_ticket": source}, pluck="name"
-    )
-    duplicate_list_retain_timestamp(
-        "HD Ticket Comment", source_comments, target, controller
-    )
+    merge_ticket_rows(source, target)
+    return {"queued": False}
 
-    source_communications = frappe.db.get_list(
-        "Communication",
-        filters={"reference_doctype": "HD Ticket", "reference_name": source},
-        pluck="name",
-    )
-    duplicate_list_retain_timestamp(
-        "Communication", source_communications, target, controller
-    )
 
-    source_attachments = frappe.db.get_list(
-        "File",
-        filters={"attached_to_doctype": "HD Ticket", "attached_to_name": source},
-        pluck="name",
+def get_merge_tables(source: int) -> list[tuple[str, str, dict]]:
+    """
+    Tables copied to the target ticket when merging, as (doctype, column
+    pointing at the ticket, filters selecting the source rows)
+    """
+    return [
+        ("HD Ticket Comment", "reference_ticket", {"reference_ticket": source}),
+        (
+            "Communication",
+            "reference_name",
+            {"reference_doctype": "HD Ticket", "reference_name": source},
+        ),
+        (
+            "File",
+            "attached_to_name",
+            {"attached_to_doctype": "HD Ticket", "attached_to_name": source},
+        ),
+    ]
+
+
+def count_merge_rows(source: int) -> int:
+    return sum(
+        frappe.db.count(doctype, filters)
+        for doctype, _field, filters in get_merge_tables(source)
     )
-    duplicate_list_retain_timestamp("File", source_attachments, target, controller)
+
+
+def merge_ticket_rows(source: int, target: int):
+    """
+    Copy comments, communications and files of `source` to `target` with
+    INSERT ... SELECT, keeping their timestamps, then close `source`
+    """
+    controller = get_controller("HD Ticket")
+    suffix = f"-{target}"
+    tables = get_merge_tables(source)
+    for i, (doctype, field, filters) in enumerate(tables):
+        copy_rows(
+            doctype, filters, suffix, {field: target}, ("HD Ticket", source, target)
+        )
+        frappe.publish_progress(
+            (i + 1) * 100 / (len(tables) + 1),
+            title=_("Merging tickets"),
+            doctype="HD Ticket",
+            docname=target,
+        )
 
     doc = frappe.get_doc("HD Ticket", source)
 
@@ -384,61 +666,286 @@ def merge_ticket(source: int, target: int):
         f"Ticket <a href={source_link}> #{source}</a>  has been merged with ticket #{target}."
     )
     c.save()
+    frappe.publish_progress(
+        100, title=_("Merging tickets"), doctype="HD Ticket", docname=target
+    )
 
 
-def duplicate_list_retain_timestamp(doctype, activities: list, target: int, controller):
-    for activity in activities:
-        attachments = get_attachments(
-            "HD Ticket Comment",
-            activity,
+def copy_rows(
+    doctype: str,
+    filters: dict,
+    suffix: str,
+    overrides: dict,
+    relink: tuple | None = None,
+):
+    """
+    Copy rows of `doctype` matching `filters` in a single INSERT ... SELECT,
+    along with their child rows and the files attached to them. Copies are
+    named `<name><suffix>` so that running this again is a no-op.
+
+    :param doctype: Doctype to copy rows of
+    :param filters: Column values selecting the rows to copy
+    :param suffix: Appended to names of copied rows
+    :param overrides: Column values to set on the copies
+    :param relink: `(link_doctype, old, new)`, dynamic links of copied child
+        rows pointing at `old` point at `new` instead
+    """
+    table = f"tab{doctype}"
+    conditions = " and ".join(f"`{table}`.`{f}` = %({f})s" for f in filters)
+    values = {**filters, **{f"new_{k}": v for k, v in overrides.items()}}
+    values["suffix"] = suffix
+
+    insert_select(doctype, conditions, values, overrides)
+
+    # Child tables, e.g. comment reactions or communication timeline links
+    source_names = f"select `name` from `{table}` where {conditions}"
+    for df in frappe.get_meta(doctype).get_table_fields():
+        child_values = {**values, "parenttype": doctype}
+        expressions = {}
+        if relink and {"link_doctype", "link_name"} <= set(
+            frappe.db.get_table_columns(df.options)
+        ):
+            child_values.update(
+                zip(["relink_doctype", "relink_old", "relink_new"], map(str, relink))
+            )
+            expressions["link_name"] = (
+                "case when `link_doctype` = %(relink_doctype)s"
+                " and `link_name` = %(relink_old)s"
+                " then %(relink_new)s else `link_name` end"
+            )
+        insert_select(
+            df.options,
+            f"`parenttype` = %(parenttype)s and `parent` in ({source_names})",
+            child_values,
+            {"parent": None},
+            expressions,
         )
 
-        original_doc = frappe.get_doc(doctype, activity)
+    # Files attached to the copied rows themselves
+    if doctype != "File":
+        insert_select(
+            "File",
+            "`attached_to_doctype` = %(parenttype)s"
+            f" and `attached_to_name` in ({source_names})",
+            {**values, "parenttype": doctype},
+            {"attached_to_name": None},
+        )
 
-        duplicate_doc = frappe.copy_doc(original_doc)
 
-        if doctype == "Communication":
-            duplicate_doc.reference_name = target
-            attachments = get_attachments(
-                "Communication",
-                activity,
-            )
+def insert_select(
+    doctype: str,
+    conditions: str,
+    values: dict,
+    overrides: dict,
+    expressions: dict | None = None,
+):
+    """
+    Overrides set to None point the copy at the copied parent, i.e. the
+    column value plus the suffix. `expressions` are SQL selected for a column
+    instead of its value.
+    """
+    columns = frappe.db.get_table_columns(doctype)
+    expressions = expressions or {}
+    select = []
+    for column in columns:
+        if column in expressions:
+            select.append(expressions[column])
+        elif column == "name":
+            select.append("concat(`name`, %(suffix)s)")
+        elif column in overrides and overrides[column] is None:
+            select.append(f"concat(`{column}`, %(suffix)s)")
+        elif column in overrides:
+            select.append(f"%(new_{column})s")
+        else:
+            select.append(f"`{column}`")
+
+    frappe.db.sql(
+        f"""insert ignore into `tab{doctype}` ({", ".join(f"`{c}`" for c in columns)})
+        select {", ".join(select)} from `tab{doctype}` where {conditions}""",
+        values,
+    )
 
-        elif doctype == "HD Ticket Comment":
-            duplicate_doc.reference_ticket = target
-            attachments = get_attachments(
-                "Communication",
-                activity,
-            )
 
-        elif doctype == "File":
-            duplicate_doc.attached_to_name = target
+PURGE_CHUNK_SIZE = 500
+# Rows pointing at tickets, as (doctype, column holding the ticket name,
+# extra column values)
+PURGE_TABLES = [
+    ("HD Ticket Activity", "ticket", {}),
+    ("HD Ticket Change", "ticket", {}),
+    ("HD Ticket Seen", "ticket", {}),
+    ("HD Notification", "reference_ticket", {}),
+    ("HD Email Feedback", "ticket", {}),
+    ("HD Ticket Comment", "reference_ticket", {}),
+    ("Communication", "reference_name", {"reference_doctype": "HD Ticket"}),
+    ("Communication Link", "link_name", {"link_doctype": "HD Ticket"}),
+    ("View Log", "reference_name", {"reference_doctype": "HD Ticket"}),
+    ("Tag Link", "document_name", {"document_type": "HD Ticket"}),
+    ("ToDo", "reference_name", {"reference_type": "HD Ticket"}),
+    ("DocShare", "share_name", {"share_doctype": "HD Ticket"}),
+    ("Comment", "reference_name", {"reference_doctype": "HD Ticket"}),
+    ("Version", "docname", {"ref_doctype": "HD Ticket"}),
+]
 
-        duplicate_doc.insert(ignore_permissions=True)
 
-        if doctype == "File":
-            return
+@frappe.whitelist()
+@agent_only
+def purge_tickets(tickets: list[str | int]) -> dict:
+    """
+    Permanently delete `tickets` and every row hanging off them in a background
+    job. Progress is published to the caller, and `helpdesk:tickets-purged`
+    carries the rows removed per table once done.
+
+    :param tickets: Tickets to delete
+    """
+    frappe.has_permission("HD Ticket", "delete", throw=True)
+    tickets = frappe.get_list(
+        "HD Ticket", filters={"name": ["in", tickets]}, pluck="name"
+    )
+    if not tickets:
+        return {"queued": 0}
+    frappe.enqueue(
+        "helpdesk.helpdesk.doctype.hd_ticket.api.purge_ticket_rows",
+        queue="long",
+        timeout=60 * 60,
+        enqueue_after_commit=True,
+        tickets=tickets,
+    )
+    return {"queued": len(tickets)}
+
+
+def purge_ticket_rows(tickets: list[str | int]) -> dict[str, int]:
+    """
+    Delete `tickets` chunk by chunk, committing after each chunk so that a
+    failure halfway keeps the progress made. No Deleted Document is kept.
 
-        attachments = get_attachments(
-            doctype,
-            activity,
+    :return: Rows removed per table
+    """
+    QBTicket = frappe.qb.DocType("HD Ticket")
+    removed = defaultdict(int)
+    for i in range(0, len(tickets), PURGE_CHUNK_SIZE):
+        chunk = [str(t) for t in tickets[i : i + PURGE_CHUNK_SIZE]]
+        for doctype, count in delete_ticket_dependents(chunk).items():
+            removed[doctype] += count
+        removed["HD Ticket"] += delete_rows(QBTicket, QBTicket.name.isin(chunk))
+        frappe.db.commit()  # nosemgrep
+        done = min(i + PURGE_CHUNK_SIZE, len(tickets))
+        frappe.publish_progress(
+            done * 100 / len(tickets),
+            title=_("Deleting tickets"),
+            description=_("{0} of {1} tickets deleted").format(done, len(tickets)),
         )
-        for attachment in attachments:
-            controller.attach_file_with_doc(
-                duplicate_doc, doctype, duplicate_doc.name, attachment["file_url"]
+
+    clear_navigation_windows()
+    removed = dict(removed)
+    frappe.publish_realtime(
+        "helpdesk:tickets-purged",
+        message={"removed": removed},
+        user=frappe.session.user,
+        after_commit=True,
+    )
+    return removed
+
+
+def delete_ticket_dependents(tickets: list[str]) -> dict[str, int]:
+    """
+    Delete rows of other tables belonging to `tickets` with one DELETE per
+    table, along with their child rows, attached files and search entries.
+    The tickets themselves are left alone.
+
+    :return: Rows removed per table
+    """
+    removed = {}
+    QBComment = frappe.qb.DocType("HD Ticket Comment")
+    QBCommunication = frappe.qb.DocType("Communication")
+    parents = {
+        "HD Ticket": tickets,
+        "HD Ticket Comment": frappe.qb.from_(QBComment)
+        .select(QBComment.name)
+        .where(QBComment.reference_ticket.isin(tickets)),
+        "Communication": frappe.qb.from_(QBCommunication)
+        .select(QBCommunication.name)
+        .where(QBCommunication.reference_doctype == "HD Ticket")
+        .where(QBCommunication.reference_name.isin(tickets)),
+    }
+
+    # Child rows and files go first, while their parents can still be selected
+    for parenttype, names in parents.items():
+        for df in frappe.get_meta(parenttype).get_table_fields():
+            QBChild = frappe.qb.DocType(df.options)
+            count = delete_rows(
+                QBChild,
+                (QBChild.parenttype == parenttype) & QBChild.parent.isin(names),
             )
+            removed[df.options] = removed.get(df.options, 0) + count
+    removed["File"] = delete_ticket_files(parents)
+    unread = get_ticket_unread_counts(tickets)
+    change_unread_counts({user: -count for user, count in unread.items()})
+
+    for doctype, field, values in PURGE_TABLES:
+        QBTable = frappe.qb.DocType(doctype)
+        conditions = [QBTable[field].isin(tickets)]
+        conditions += [QBTable[k] == v for k, v in values.items()]
+        count = delete_rows(QBTable, Criterion.all(conditions))
+        removed[doctype] = removed.get(doctype, 0) + count
+
+    removed["Search Index"] = HelpdeskSearch().remove_docs("HD Ticket", tickets)
+    get_attachments.clear_cache()
+    return removed
 
-        frappe.db.set_value(
-            duplicate_doc.doctype,
-            duplicate_doc.name,
-            {
-                "creation": original_doc.creation,
-                "modified": original_doc.modified,
-                "owner": original_doc.owner,
-                "modified_by": original_doc.modified_by,
-            },
-            update_modified=False,
-        )
+
+def delete_rows(table, condition) -> int:
+    count = frappe.qb.from_(table).select(Count("*")).where(condition).run()[0][0]
+    if count:
+        frappe.qb.from_(table).delete().where(condition).run()
+    return count
+
+
+def delete_ticket_files(parents: dict) -> int:
+    """
+    Delete File rows attached to the tickets or their comments and
+    communications. Files on disk go once the deletion is committed, unless
+    another File row, e.g. one copied by a merge, still points at them.
+    """
+    QBFile = frappe.qb.DocType("File")
+    condition = Criterion.any(
+        (QBFile.attached_to_doctype == doctype) & QBFile.attached_to_name.isin(names)
+        for doctype, names in parents.items()
+    )
+    files = (
+        frappe.qb.from_(QBFile)
+        .select(QBFile.name, QBFile.file_url)
+        .where(condition)
+        .where(QBFile.is_folder == 0)
+        .run(as_dict=True)
+    )
+    if not files:
+        return 0
+
+    removed = 0
+    for i in range(0, len(files), PURGE_CHUNK_SIZE):
+        names = [f.name for f in files[i : i + PURGE_CHUNK_SIZE]]
+        removed += delete_rows(QBFile, QBFile.name.isin(names))
+
+    urls = {f.file_url for f in files if f.file_url}
+    if urls:
+        # A rolled back deletion, e.g. a failed link check after `on_trash`,
+        # must keep its files
+        frappe.db.after_commit.add(partial(delete_unused_files, urls))
+    return removed
+
+
+def delete_unused_files(urls: set[str]):
+    QBFile = frappe.qb.DocType("File")
+    in_use = set(
+        frappe.qb.from_(QBFile)
+        .select(QBFile.file_url)
+        .where(QBFile.file_url.isin(list(urls)))
+        .distinct()
+        .run(pluck=True)
+    )
+    for url in urls - in_use:
+        if url.startswith(("/files/", "/private/files/")):
+            delete_file(url)
 
 
 @frappe.whitelist()
@@ -488,6 +995,16 @@ def split_ticket(subject: str, communication_id: str):
         new_ticket,
         update_modified=False,
     )
+    frappe.db.set_value(
+        "HD Ticket Change",
+        {
+            "ticket": ticket_id,
+            "creation": [">=", communicaton_creation_time],
+        },
+        "ticket",
+        new_ticket,
+        update_modified=False,
+    )
 
     # update attachments
     frappe.db.set_value(
@@ -567,29 +1084,52 @@ def get_ticket_customizations():
     return {"custom_fields": custom_fields, "_form_script": form_scripts}
 
 
+NAVIGATION_WINDOW_SIZE = 200
+NAVIGATION_PAGE_LENGTH = 40
+# refill the window in background when fewer IDs than this are left after a ticket
+NAVIGATION_REFILL_MARGIN = 20
+NAVIGATION_WINDOW_TTL = 60 * 10
+# a window older than this is rebuilt when the opened ticket is not in it
+NAVIGATION_WINDOW_REBUILD_AFTER = 30
+# Tickets changed recently, scored by the time of the change. Windows drop the
+# ones changed after they were built, as they may have left the view.
+NAVIGATION_CHANGES_KEY = "helpdesk:nav_changed"
+
+
 @frappe.whitelist()
-# TODO: make it bette, on mount fetch only once and cache it
 def get_navigation_tickets(ticket: str | int, current_view: str | None = None):
     """
-    Get a list of tickets to navigate
+    Get a list of tickets to navigate. The current ticket comes first, followed
+    by the tickets after it in the view. Ticket IDs of the view are kept in a
+    cached window so that browsing does not query the view again.
     """
-
-    filters = get_navigation_filters(ticket, current_view)
-    order_by = get_navigation_order_by(current_view)
-
     try:
-        tickets = frappe.get_list(
-            "HD Ticket",
-            pluck="name",
-            filters=filters,
-            order_by=order_by,
-            limit=40,
-        )
-
-        # Extract just the ticket IDs
-        ticket_ids = [int(ticket), *tickets]
-        # print("\n\n", ticket_ids, "\n\n")
-        return ticket_ids
+        ticket = int(ticket)
+        window = get_navigation_window(current_view, keep=ticket)
+        ids = window["ids"]
+
+        if (
+            ticket not in ids
+            and time.time() - window.get("built_at", 0)
+            > NAVIGATION_WINDOW_REBUILD_AFTER
+        ):
+            # Changed tickets are only dropped from windows, a ticket missing
+            # from an older window is likely new or moved into the view
+            window = get_navigation_window(current_view, rebuild=True)
+            ids = window["ids"]
+        if ticket not in ids:
+            return [ticket, *[i for i in ids if i != ticket][:NAVIGATION_PAGE_LENGTH]]
+
+        idx = ids.index(ticket)
+        after = ids[idx + 1 : idx + 1 + NAVIGATION_PAGE_LENGTH]
+        if len(ids) - idx <= NAVIGATION_REFILL_MARGIN and not window["complete"]:
+            frappe.enqueue(
+                "helpdesk.helpdesk.doctype.hd_ticket.api.extend_navigation_window",
+                current_view=current_view,
+                job_id=get_navigation_window_key(current_view),
+                deduplicate=True,
+            )
+        return [ticket, *after]
 
     except Exception as e:
         frappe.log_error(f"Error in get_navigation_tickets: {str(e)}")
@@ -597,7 +1137,154 @@ def get_navigation_tickets(ticket: str | int, current_view: str | None = None):
         return []
 
 
-def get_navigation_filters(ticket: str, current_view: str = None):
+def get_navigation_window_key(view: str | None = None) -> str:
+    user = frappe.session.user
+    versions = [
+        get_navigation_version(scope) for scope in ("", f"user:{user}", f"view:{view}")
+    ]
+    return f"helpdesk:nav_window:{':'.join(versions)}:{user}:{view or ''}"
+
+
+def get_navigation_version(scope: str) -> str:
+    key = f"helpdesk:nav_window_version:{scope}"
+    version = frappe.cache().get_value(key)
+    if not version:
+        version = frappe.generate_hash(length=10)
+        frappe.cache().set_value(key, version)
+    return version
+
+
+def clear_navigation_windows(doc=None, method=None):
+    """
+    Invalidate navigation windows of all users, for changes which remove many
+    tickets at once
+    """
+    frappe.cache().delete_value("helpdesk:nav_window_version:")
+
+
+def clear_view_navigation_windows(doc, method=None):
+    """
+    Invalidate windows of a changed HD View, and those of its owner whose
+    default view it may be
+    """
+    frappe.cache().delete_value(f"helpdesk:nav_window_version:view:{doc.name}")
+    if doc.user:
+        clear_user_navigation_windows([doc.user])
+
+
+def clear_user_navigation_windows(users: list[str]):
+    """
+    Invalidate windows of `users`, e.g. when the tickets they can see change
+    """
+    for user in users:
+        frappe.cache().delete_value(f"helpdesk:nav_window_version:user:{user}")
+
+
+def mark_navigation_changed(ticket: str | int):
+    """
+    Drop `ticket` from navigation windows once the transaction commits
+    """
+    pending = frappe.flags.helpdesk_navigation_changes
+    if pending is None:
+        pending = frappe.flags.helpdesk_navigation_changes = set()
+        frappe.db.after_commit.add(record_navigation_changes)
+        frappe.db.after_rollback.add(discard_navigation_changes)
+    pending.add(int(ticket))
+
+
+def record_navigation_changes():
+    pending = frappe.flags.helpdesk_navigation_changes
+    discard_navigation_changes()
+    if not pending:
+        return
+    key = frappe.cache().make_key(NAVIGATION_CHANGES_KEY)
+    now = time.time()
+    pipe = frappe.cache().pipeline()
+    pipe.zadd(key, dict.fromkeys(pending, now))
+    # Windows never live longer than this
+    pipe.zremrangebyscore(key, 0, now - NAVIGATION_WINDOW_TTL)
+    pipe.expire(key, NAVIGATION_WINDOW_TTL)
+    pipe.execute()
+
+
+def discard_navigation_changes():
+    frappe.flags.helpdesk_navigation_changes = None
+
+
+def get_navigation_window(
+    view: str | None = None, rebuild: bool = False, keep: int | None = None
+) -> dict:
+    """
+    :param keep: Ticket which stays in the window even if it changed
+    """
+    key = get_navigation_window_key(view)
+    window = None if rebuild else frappe.cache().get_value(key)
+    if window is not None:
+        return drop_changed_tickets(key, window, keep)
+
+    # Taken before the query, so changes committed meanwhile are dropped later
+    built_at = time.time()
+    order_by = get_navigation_order_by(view)
+    ids = fetch_navigation_ids(view, order_by, 0)
+    window = {
+        "order_by": order_by,
+        "ids": ids,
+        "complete": len(ids) < NAVIGATION_WINDOW_SIZE,
+        "built_at": built_at,
+        "checked_at": built_at,
+    }
+    frappe.cache().set_value(key, window, expires_in_sec=NAVIGATION_WINDOW_TTL)
+    return window
+
+
+def drop_changed_tickets(key: str, window: dict, keep: int | None = None) -> dict:
+    """
+    Drop tickets changed since the window was last checked, they may not be
+    in the view anymore
+    """
+    checked_at = time.time()
+    pipe = frappe.cache().pipeline()
+    pipe.zrangebyscore(
+        frappe.cache().make_key(NAVIGATION_CHANGES_KEY),
+        window.get("checked_at", window.get("built_at", 0)),
+        "+inf",
+    )
+    changed = {int(i) for i in pipe.execute()[0]} - {keep}
+    if changed and not changed.isdisjoint(window["ids"]):
+        window["ids"] = [i for i in window["ids"] if i not in changed]
+        window["checked_at"] = checked_at
+        frappe.cache().set_value(key, window, expires_in_sec=NAVIGATION_WINDOW_TTL)
+    return window
+
+
+def extend_navigation_window(current_view: str | None = None):
+    key = get_navigation_window_key(current_view)
+    window = frappe.cache().get_value(key)
+    if not window or window["complete"]:
+        return
+
+    ids = fetch_navigation_ids(current_view, window["order_by"], len(window["ids"]))
+    seen = set(window["ids"])
+    window["ids"].extend(i for i in ids if i not in seen)
+    window["complete"] = len(ids) < NAVIGATION_WINDOW_SIZE
+    frappe.cache().set_value(key, window, expires_in_sec=NAVIGATION_WINDOW_TTL)
+
+
+def fetch_navigation_ids(view: str | None, order_by: str, start: int) -> list[int]:
+    return [
+        int(name)
+        for name in frappe.get_list(
+            "HD Ticket",
+            pluck="name",
+            filters=handle_at_me_support(get_navigation_view_filters(view)),
+            order_by=order_by,
+            limit_start=start,
+            limit=NAVIGATION_WINDOW_SIZE,
+        )
+    ]
+
+
+def get_navigation_view_filters(current_view: str = None):
     filters = []
     if current_view:
         _filters = frappe.get_value("HD View", current_view, "filters")
@@ -627,16 +1314,15 @@ def get_navigation_filters(ticket: str, current_view: str = None):
             except (json.JSONDecodeError, TypeError):
                 filters = []
 
-    # Base filters - exclude the current ticket
-    base_filters = {"name": ["!=", ticket]}
+    if filters and isinstance(filters, dict):
+        return dict(filters)
+    return {}
 
-    # Combine base filters with view filters
-    # is instance of {}
 
-    if filters and isinstance(filters, object):
-        final_filters = {**filters, **base_filters}
-    else:
-        final_filters = base_filters
+def get_navigation_filters(ticket: str, current_view: str = None):
+    # Base filters - exclude the current ticket
+    base_filters = {"name": ["!=", ticket]}
+    final_filters = {**get_navigation_view_filters(current_view), **base_filters}
     final_filters = handle_at_me_support(final_filters)
 
     return final_filters
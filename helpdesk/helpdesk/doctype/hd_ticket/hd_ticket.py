@@ -13,23 +13,39 @@ from frappe.desk.form.assign_to import clear as clear_all_assignments
 from frappe.desk.form.assign_to import get as get_assignees
 from frappe.model.document import Document
 from frappe.permissions import add_permission, update_permission_property
-from frappe.query_builder import DocType, Order
+from frappe.query_builder import Order
 from frappe.utils import add_to_date, getdate, now_datetime
 from pypika.functions import Count
 from pypika.queries import Query
 from pypika.terms import Criterion
 
-from helpdesk.consts import DEFAULT_TICKET_PRIORITY, DEFAULT_TICKET_TYPE
+from helpdesk.helpdesk.doctype.hd_escalation_rule.hd_escalation_rule import (
+    get_escalation_values,
+    has_threshold,
+    match_escalation_rule,
+)
 from helpdesk.helpdesk.doctype.hd_settings.helpers import (
     get_default_email_content,
     is_email_content_empty,
 )
+from helpdesk.helpdesk.doctype.hd_team.utils import (
+    change_agent_loads,
+    get_team,
+    get_ticket_load_deltas,
+    pick_agent,
+)
 from helpdesk.helpdesk.doctype.hd_ticket_activity.hd_ticket_activity import (
     log_ticket_activity,
 )
 from helpdesk.helpdesk.utils.email import (
     default_outgoing_email_account,
     default_ticket_outgoing_email_account,
+    queue_ticket_email,
+)
+from helpdesk.reference_data import (
+    get_reference_data,
+    get_status_category,
+    get_type_priority,
 )
 from helpdesk.search import HelpdeskSearch
 from helpdesk.utils import (
@@ -39,35 +55,44 @@ from helpdesk.utils import (
     get_doc_room,
     is_admin,
     is_agent,
-    publish_event,
+    publish_coalesced_event,
 )
 
 from ..hd_notification.utils import clear as clear_notifications
-from ..hd_service_level_agreement.utils import get_sla
+from ..hd_notification.utils import create_notifications
+from ..hd_service_level_agreement.utils import get_sla, get_sla_runtime
+from ..hd_ticket_change.hd_ticket_change import get_field_changes, log_ticket_changes
+from ..hd_ticket_seen.hd_ticket_seen import buffer_ticket_seen
+from .api import delete_ticket_dependents, mark_navigation_changed
 
 
 class HDTicket(Document):
     @property
     def default_open_status(self):
-        return frappe.db.get_value(
-            "HD Service Level Agreement",
-            self.sla,
-            "default_ticket_status",
-        ) or frappe.db.get_single_value("HD Settings", "default_ticket_status")
+        return (
+            frappe.db.get_value(
+                "HD Service Level Agreement",
+                self.sla,
+                "default_ticket_status",
+            )
+            or get_reference_data().default_status
+        )
 
     @property
     def ticket_reopen_status(self):
-        return frappe.db.get_value(
-            "HD Service Level Agreement",
-            self.sla,
-            "ticket_reopen_status",
-        ) or frappe.db.get_single_value("HD Settings", "ticket_reopen_status")
+        return (
+            frappe.db.get_value(
+                "HD Service Level Agreement",
+                self.sla,
+                "ticket_reopen_status",
+            )
+            or get_reference_data().reopen_status
+        )
 
     def publish_update(self):
         room = get_doc_room("HD Ticket", self.name)
-        publish_event(
-            "helpdesk:ticket-update", room=room, data={"ticket_id": self.name}
-        )
+        publish_coalesced_event("helpdesk:ticket-update", self.name, room=room)
+        mark_navigation_changed(self.name)
         capture_event("ticket_updated")
 
     def autoname(self):
@@ -85,7 +110,7 @@ class HDTicket(Document):
         self.set_feedback_values()
         self.set_default_status()
         self.set_status_category()
-        # self.apply_escalation_rule()
+        self.apply_escalation_rule()
         self.set_sla()
 
         self.set_contact()
@@ -154,24 +179,27 @@ class HDTicket(Document):
         )
         default_feedback_email_content = get_default_email_content("share_feedback")
         try:
-            frappe.sendmail(
-                recipients=[self.raised_by],
-                subject=f"Re: {self.subject}",
-                message=self._get_rendered_template(
-                    feedback_email_content,
-                    default_feedback_email_content,
-                    {"url": url},
-                ),
-                reference_doctype="HD Ticket",
-                reference_name=self.name,
-                now=True,
-                in_reply_to=last_communication.name if last_communication else None,
-                email_headers={"X-Auto-Generated": "hd-email-feedback"},
+            message = self._get_rendered_template(
+                feedback_email_content,
+                default_feedback_email_content,
+                {"url": url},
             )
-            frappe.msgprint(_("Feedback email has been sent to the customer"))
         except Exception as e:
             frappe.throw(_("Could not send feedback email,due to: {0}").format(e))
 
+        queued = queue_ticket_email(
+            "share_feedback",
+            recipients=[self.raised_by],
+            subject=f"Re: {self.subject}",
+            message=message,
+            reference_doctype="HD Ticket",
+            reference_name=self.name,
+            in_reply_to=last_communication.name if last_communication else None,
+            email_headers={"X-Auto-Generated": "hd-email-feedback"},
+        )
+        if queued:
+            frappe.msgprint(_("Feedback email has been queued for the customer"))
+
     def after_insert(self):
         if self.ticket_split_from:
             log_ticket_activity(
@@ -182,7 +210,7 @@ class HDTicket(Document):
             return
 
         capture_event("ticket_created")
-        publish_event("helpdesk:new-ticket")
+        publish_coalesced_event("helpdesk:new-ticket", self.name)
         if self.get("description"):
             self.create_communication_via_contact(self.description, new_ticket=True)
             self.handle_inline_media_new_ticket()
@@ -204,27 +232,32 @@ class HDTicket(Document):
                 self.get_doc_before_save()
                 and self.get_doc_before_save().status_category != "Open"
             ):
-                agents = self.get_assigned_agents()
-                if agents:
-                    for agent in agents:
-                        if agent.name == frappe.session.user:
-                            continue
-                        self.notify_agent(agent.name, "Reaction")
-
-        self.remove_assignment_if_not_in_team()
+                agents = self.get_assigned_agents() or []
+                self.notify_agents([agent.name for agent in agents], "Reaction")
+
+        change_agent_loads(get_ticket_load_deltas(self))
+        unassigned = self.remove_assignment_if_not_in_team()
+        self.assign_from_team(unassigned)
+        # Whoever saves the ticket has seen the change
+        buffer_ticket_seen(self.name)
         self.publish_update()
         self.update_search_index()
 
     def notify_agent(self, agent, notification_type="Assignment"):
-        frappe.get_doc(
-            frappe._dict(
-                doctype="HD Notification",
-                user_from=frappe.session.user,
-                reference_ticket=self.name,
-                user_to=agent,
-                notification_type=notification_type,
-            )
-        ).insert(ignore_permissions=True)
+        self.notify_agents([agent], notification_type)
+
+    def notify_agents(self, agents, notification_type="Assignment"):
+        create_notifications(
+            [
+                {
+                    "user_from": frappe.session.user,
+                    "reference_ticket": self.name,
+                    "user_to": agent,
+                    "notification_type": notification_type,
+                }
+                for agent in agents
+            ]
+        )
 
     def update_search_index(self):
         search = HelpdeskSearch()
@@ -233,9 +266,7 @@ class HDTicket(Document):
     def set_ticket_type(self):
         if self.ticket_type:
             return
-        settings = frappe.get_doc("HD Settings")
-        ticket_type = settings.default_ticket_type or DEFAULT_TICKET_TYPE
-        self.ticket_type = ticket_type
+        self.ticket_type = get_reference_data().default_ticket_type
 
     def set_raised_by(self):
         self.raised_by = self.raised_by or frappe.session.user
@@ -269,9 +300,7 @@ class HDTicket(Document):
         if self.priority:
             return
         self.priority = (
-            frappe.get_cached_value("HD Ticket Type", self.ticket_type, "priority")
-            or frappe.get_cached_value("HD Settings", "HD Settings", "default_priority")
-            or DEFAULT_TICKET_PRIORITY
+            get_type_priority(self.ticket_type) or get_reference_data().default_priority
         )
 
     def set_first_responded_on(self):
@@ -338,44 +367,29 @@ class HDTicket(Document):
 
     def handle_ticket_activity_update(self):
         """
-        Handles the ticket activity update.
-        Should be called inside on_update
+        Journals changes to all fields, one insert per save.
+        Should be called inside before_save
         """
-        field_maps = {
-            "status": "status",
-            "priority": "priority",
-            "agent_group": "team",
-            "ticket_type": "type",
-            "contact": "contact",
-        }
-        for field in [
-            "status",
-            "priority",
-            "agent_group",
-            "contact",
-            "ticket_type",
-        ]:
-            if self.has_value_changed(field):
-                log_ticket_activity(
-                    self.name, f"set {field_maps[field]} to {self.as_dict()[field]}"
-                )
+        log_ticket_changes(get_field_changes(self))
 
     def generate_key(self):
         self.key = uuid.uuid4()
 
-    def remove_assignment_if_not_in_team(self):
+    def remove_assignment_if_not_in_team(self) -> bool:
         """
         Removes the assignment if the agent is not in the team.
         Should be called inside on_update
+
+        :return: Whether the assignment was removed
         """
         if self.is_new():
-            return
+            return False
         if not self.agent_group or (hasattr(self, "_assign") and not self._assign):
-            return
+            return False
         if self.has_value_changed("agent_group") and self.status_category == "Open":
             current_assigned_agent = self.get_assigned_agent()
             if not current_assigned_agent:
-                return
+                return False
             is_agent_in_assigned_team = self.agent_in_assigned_team(
                 current_assigned_agent, self.agent_group
             )
@@ -389,39 +403,33 @@ class HDTicket(Document):
                     {"ticket_id": self.name},
                     after_commit=True,
                 )
+                return True
+        return False
 
     def agent_in_assigned_team(self, agent, team):
-        return frappe.db.exists(
-            "HD Team Member",
-            {
-                "parent": team,
-                "user": agent,
-            },
-        )
+        team = get_team(team)
+        return bool(team and agent in team.members)
 
     def users_present_in_team_assignment_rule(self):
-        if not self.agent_group:
-            return False
-
-        assignment_rule = frappe.db.get_value(
-            "HD Team", self.agent_group, "assignment_rule"
-        )
-        if not assignment_rule:
-            return False
+        team = get_team(self.agent_group)
+        return bool(team and team.rule_active)
 
-        is_disabled = frappe.db.get_value(
-            "Assignment Rule", assignment_rule, "disabled"
-        )
-        if is_disabled:
-            return False
-
-        users = frappe.get_all(
-            "Assignment Rule User", filters={"parent": assignment_rule}
-        )
-        if not users:
-            return False
+    def assign_from_team(self, unassigned: bool = False):
+        """
+        Assign an open ticket without agent to the least loaded agent of its
+        team, when it is created or moved to another team. Should be called
+        inside on_update.
 
-        return True
+        :param unassigned: The assignment was just removed
+        """
+        if self.status_category != "Open" or not self.agent_group:
+            return
+        if not self.has_value_changed("agent_group"):
+            return
+        if json.loads(self.get("_assign") or "[]") and not unassigned:
+            return
+        if agent := pick_agent(self.agent_group):
+            self.assign_agent(agent)
 
     @frappe.whitelist()
     def assign_agent(self, agent: str):
@@ -455,15 +463,8 @@ class HDTicket(Document):
         return None
 
     def on_trash(self):
-        activities = frappe.db.get_all("HD Ticket Activity", {"ticket": self.name})
-        for activity in activities:
-            frappe.db.delete("HD Ticket Activity", activity)
-
-        comments = frappe.db.get_all(
-            "HD Ticket Comment", {"reference_ticket": self.name}
-        )
-        for comment in comments:
-            frappe.db.delete("HD Ticket Comment", comment)
+        delete_ticket_dependents([str(self.name)])
+        mark_navigation_changed(self.name)
 
     def skip_email_workflow(self):
         skip: str = frappe.get_value("HD Settings", None, "skip_email_workflow") or "0"
@@ -631,37 +632,38 @@ class HDTicket(Document):
             except Exception as e:
                 frappe.throw(_("Could not an email due to: {0}").format(e))
 
-        send_delayed = True
-        send_now = False
+        queued = queue_ticket_email(
+            "reply_via_agent",
+            attachments=_attachments,
+            bcc=bcc,
+            cc=cc,
+            communication=communication.name,
+            expose_recipients="header",
+            message=rendered_template if rendered_template is not None else message,
+            as_markdown=True,
+            recipients=recipients,
+            reference_doctype="HD Ticket",
+            reference_name=self.name,
+            reply_to=reply_to_email,
+            sender=reply_to_email,
+            subject=subject,
+            with_container=False,
+            in_reply_to=(
+                last_communication.name
+                if last_communication and last_communication.name
+                else None
+            ),
+        )
+        if not queued:
+            frappe.throw(_("Could not queue the reply email"))
 
+        # send right after commit instead of waiting for the next queue flush
         if self.instantly_send_email():
-            send_delayed = False
-            send_now = True
-
-        try:
-            frappe.sendmail(
-                attachments=_attachments,
-                bcc=bcc,
-                cc=cc,
+            frappe.enqueue(
+                "helpdesk.helpdesk.utils.email.send_queued_communication_emails",
                 communication=communication.name,
-                delayed=send_delayed,
-                expose_recipients="header",
-                message=rendered_template if rendered_template is not None else message,
-                as_markdown=True,
-                now=send_now,
-                recipients=recipients,
-                reference_doctype="HD Ticket",
-                reference_name=self.name,
-                reply_to=reply_to_email,
-                sender=reply_to_email,
-                subject=subject,
-                with_container=False,
-                in_reply_to=(
-                    last_communication.name if last_communication.name else None
-                ),
+                enqueue_after_commit=True,
             )
-        except Exception as e:
-            frappe.throw(_(e))
 
     @frappe.whitelist()
     # flake8: noqa
@@ -744,25 +746,27 @@ class HDTicket(Document):
         )
         default_email_content = get_default_email_content("reply_to_agents")
         try:
-            frappe.sendmail(
-                recipients=recipients,
-                subject=f"Re: {self.subject} - #{self.name}",
-                message=self._get_rendered_template(
-                    email_content,
-                    default_email_content,
-                    {
-                        "ticket_url": frappe.utils.get_url(
-                            "/helpdesk/tickets/" + str(self.name)
-                        )
-                    },
-                ),
-                reference_doctype="HD Ticket",
-                reference_name=self.name,
-                now=True,
+            message = self._get_rendered_template(
+                email_content,
+                default_email_content,
+                {
+                    "ticket_url": frappe.utils.get_url(
+                        "/helpdesk/tickets/" + str(self.name)
+                    )
+                },
             )
         except Exception as e:
             frappe.throw(_(e))
 
+        queue_ticket_email(
+            "reply_to_agents",
+            recipients=recipients,
+            subject=f"Re: {self.subject} - #{self.name}",
+            message=message,
+            reference_doctype="HD Ticket",
+            reference_name=self.name,
+        )
+
     def send_acknowledgement_email(self):
         acknowledgement_email_content = frappe.db.get_single_value(
             "HD Settings", "acknowledgement_email_content"
@@ -772,83 +776,54 @@ class HDTicket(Document):
         )
 
         try:
-            frappe.sendmail(
-                recipients=[self.raised_by],
-                subject=_("Ticket #{0}: We've received your request").format(self.name),
-                message=self._get_rendered_template(
-                    acknowledgement_email_content,
-                    default_acknowledgement_email_content,
-                ),
-                reference_doctype="HD Ticket",
-                reference_name=self.name,
-                now=True,
-                expose_recipients="header",
-                email_headers={"X-Auto-Generated": "hd-acknowledgement"},
+            message = self._get_rendered_template(
+                acknowledgement_email_content,
+                default_acknowledgement_email_content,
             )
         except Exception as e:
             frappe.throw(
                 _("Could not send an acknowledgement email due to: {0}").format(e)
             )
 
+        queue_ticket_email(
+            "acknowledgement",
+            recipients=[self.raised_by],
+            subject=_("Ticket #{0}: We've received your request").format(self.name),
+            message=message,
+            reference_doctype="HD Ticket",
+            reference_name=self.name,
+            expose_recipients="header",
+            email_headers={"X-Auto-Generated": "hd-acknowledgement"},
+        )
+
     @frappe.whitelist()
     def mark_seen(self):
-        self.add_viewed(
-            unique_views=True, force=True
-        )  # Document class method, no way to add unique_views via document settings, hence used force and unique_views=True
-        self.add_seen()
+        # Buffered in Redis, the View Log and seen rows are written in bulk
+        buffer_ticket_seen(self.name)
         clear_notifications(ticket=self.name)
 
     def get_escalation_rule(self):
-        filters = [
-            {
-                "priority": self.priority,
-                "team": self.agent_group,
-                "ticket_type": self.ticket_type,
-            },
-            {
-                "priority": self.priority,
-                "team": self.agent_group,
-            },
-            {
-                "priority": self.priority,
-                "ticket_type": self.ticket_type,
-            },
-            {
-                "team": self.agent_group,
-                "ticket_type": self.ticket_type,
-            },
-            {
-                "priority": self.priority,
-            },
-            {
-                "team": self.agent_group,
-            },
-            {
-                "ticket_type": self.ticket_type,
-            },
-        ]
-
-        for i in range(len(filters)):
-            try:
-                f = {
-                    **filters[i],
-                    "is_enabled": True,
-                }
-                rule = frappe.get_last_doc("HD Escalation Rule", filters=f)
-                if rule:
-                    return rule
-            except Exception:
-                pass
+        return match_escalation_rule(self.priority, self.agent_group, self.ticket_type)
 
     def apply_escalation_rule(self):
-        if not self.status_category == "Open" or self.is_new():
+        """
+        Apply the matching escalation rule when a save changes the priority,
+        team or ticket type, unless it waits for a threshold and is left to
+        `sweep_escalations`. A ticket is escalated only once, so the values set
+        by one rule never chain into another.
+        """
+        if not self.status_category == "Open" or self.is_new() or self.escalation_rule:
+            return
+        if not any(
+            self.has_value_changed(field)
+            for field in ["priority", "agent_group", "ticket_type"]
+        ):
             return
         escalation_rule = self.get_escalation_rule()
-        if not escalation_rule:
+        if not escalation_rule or has_threshold(escalation_rule):
             return
-        self.agent_group = escalation_rule.to_team or self.agent_group
-        self.priority = escalation_rule.to_priority or self.priority
-        self.ticket_type = escalation_rule.to_ticket_type or self.ticket_type
+        self.update(get_escalation_values(escalation_rule))
+        self.escalation_rule = escalation_rule.name
 
         if escalation_rule.to_agent:
             self.assign_agent(escalation_rule.to_agent)
@@ -864,11 +839,11 @@ class HDTicket(Document):
         """
         Apply SLA if set.
         """
-        if sla := frappe.get_last_doc("HD Service Level Agreement", {"name": self.sla}):
-            sla.apply(self)
+        if self.sla:
+            get_sla_runtime(self.sla).apply(self)
 
     def get_sla(self):
-        return frappe.get_doc("HD Service Level Agreement", {"name": self.sla})
+        return get_sla_runtime(self.sla)
 
     def is_currently_outside_working_hours(self):
         """Return True if current time is outside this SLA's working hours."""
@@ -885,17 +860,9 @@ class HDTicket(Document):
         )
 
         day_name = current_date.strftime("%A")
-        Holiday = DocType("HD Holiday")
 
         # Check holidays for this SLA
-        holidays = (
-            frappe.qb.from_(Holiday)
-            .select(Holiday.holiday_date)
-            .where(Holiday.parent == sla.name)
-            .run(pluck=True)
-        )
-
-        if current_date in holidays:
+        if current_date in sla.get_holidays():
             return True
 
         working_hours = sla.get_working_hours()
@@ -915,11 +882,7 @@ class HDTicket(Document):
             self.status = self.default_open_status
 
     def set_status_category(self):
-        self.status_category = self.status_category or frappe.get_value(
-            "HD Ticket Status",
-            self.status,
-            "category",
-        )
+        self.status_category = self.status_category or get_status_category(self.status)
 
     # `on_communication_update` is a special method exposed from `Communication` doctype.
     # It is called when a communication is updated. Beware of changes as this effectively
@@ -1,26 +1,44 @@
 # Copyright (c) 2023, Frappe Technologies and Contributors
 # See license.txt
 
+import os
 from datetime import timedelta
+from unittest.mock import patch
 
 import frappe
 from frappe.tests import IntegrationTestCase
 from frappe.utils import add_to_date, get_datetime, getdate, now_datetime
 
+from helpdesk.helpdesk.doctype.hd_service_level_agreement.utils import SLA_VERSION_KEY
 from helpdesk.helpdesk.doctype.hd_ticket.api import (
+    bulk_update,
+    clear_navigation_windows,
+    delete_ticket_dependents,
+    get_history,
+    get_navigation_tickets,
     merge_ticket,
+    purge_ticket_rows,
     show_outside_hours_banner,
     split_ticket,
 )
 from helpdesk.test_utils import (
     add_comment,
     add_holiday,
+    count_queries,
     get_current_week_monday,
     get_priority_response_resolution_time,
     make_status,
     make_ticket,
     remove_holidays,
 )
+from helpdesk.utils import (
+    COALESCED_EVENT,
+    bump_cache_version,
+    flush_debounced_events,
+    get_coalesce_key,
+    pop_changed_ids,
+    publish_coalesced_event,
+)
 
 ERROR_MSG_RESPONSE = "Response time differs by more than 1 second"
 ERROR_MSG_RESOLUTION = "Resolution time differs by more than 1 second"
@@ -387,6 +405,192 @@ class TestHDTicket(IntegrationTestCase):
         ticket.save()
         self.assertEqual(ticket.agreement_status, "Fulfilled")
 
+    def test_bulk_update(self):
+        tickets = [make_ticket(priority="Urgent") for _ in range(3)]
+        names = [t.name for t in tickets]
+
+        result = bulk_update(names, {"status": "Replied", "priority": "High"})
+        self.assertEqual(sorted(result["updated"]), sorted(names))
+
+        for ticket in tickets:
+            ticket.reload()
+            self.assertEqual(ticket.status_category, "Paused")
+            self.assertEqual(ticket.agreement_status, "Paused")
+            self.assertEqual(ticket.priority, "High")
+            self.assertTrue(ticket.first_responded_on)
+            activities = [h.action for h in get_history(ticket.name)]
+            self.assertIn("set status to Replied", activities)
+            self.assertIn("set priority to High", activities)
+
+        self.assertRaises(
+            frappe.ValidationError, bulk_update, names, {"subject": "Changed"}
+        )
+
+    def test_bulk_update_assigns(self):
+        tickets = [make_ticket(priority="Urgent") for _ in range(3)]
+        tickets[0].assign_agent(agent)
+        names = [t.name for t in tickets]
+
+        bulk_update(names, {"priority": "High"}, assign_to=agent)
+
+        for name in names:
+            self.assertEqual(
+                frappe.parse_json(frappe.db.get_value("HD Ticket", name, "_assign")),
+                [agent],
+            )
+            todos = frappe.get_all(
+                "ToDo",
+                filters={
+                    "reference_type": "HD Ticket",
+                    "reference_name": name,
+                    "allocated_to": agent,
+                    "status": "Open",
+                },
+            )
+            self.assertEqual(len(todos), 1, name)
+            # Assigned like a regular assignment, the agent is notified
+            self.assertTrue(
+                frappe.db.exists(
+                    "Notification Log",
+                    {
+                        "document_type": "HD Ticket",
+                        "document_name": name,
+                        "for_user": agent,
+                        "type": "Assignment",
+                    },
+                ),
+                name,
+            )
+
+    def test_bulk_update_validates(self):
+        ticket = make_ticket(priority="Urgent")
+        with patch(
+            "helpdesk.helpdesk.doctype.hd_ticket.hd_ticket.HDTicket.validate",
+            side_effect=frappe.ValidationError,
+        ):
+            self.assertRaises(
+                frappe.ValidationError,
+                bulk_update,
+                [ticket.name],
+                {"priority": "High"},
+            )
+        self.assertEqual(
+            frappe.db.get_value("HD Ticket", ticket.name, "priority"), "Urgent"
+        )
+
+    def test_realtime_events_are_coalesced(self):
+        event, room = "helpdesk:ticket-update", "helpdesk-test-room"
+        key = get_coalesce_key(event, room)
+        frappe.cache().delete(key, f"{key}:window", f"{key}:scheduled")
+
+        def published():
+            return [
+                (c.args[0], c.kwargs["message"])
+                for c in publish.call_args_list
+                if c.kwargs.get("room") == room
+            ]
+
+        with (
+            patch("frappe.publish_realtime") as publish,
+            patch("frappe.enqueue") as enqueue,
+        ):
+            publish_coalesced_event(event, "T1", room)
+            publish_coalesced_event(event, "T2", room)
+            frappe.db.after_commit.run()
+            self.assertEqual(
+                published(),
+                [(COALESCED_EVENT, {"event": event, "ticket_ids": ["T1", "T2"]})],
+            )
+
+            # Within the window the change is held back for the trailing flush
+            publish.reset_mock()
+            enqueue.reset_mock()
+            publish_coalesced_event(event, "T3", room)
+            frappe.db.after_commit.run()
+            self.assertEqual(published(), [])
+            enqueue.assert_called_once_with(
+                "helpdesk.utils.flush_debounced_events",
+                queue="short",
+                event=event,
+                room=room,
+            )
+
+            # Only one flush is scheduled at a time
+            enqueue.reset_mock()
+            publish_coalesced_event(event, "T4", room)
+            frappe.db.after_commit.run()
+            enqueue.assert_not_called()
+
+            flush_debounced_events(event, room)
+            self.assertEqual(
+                published(),
+                [(COALESCED_EVENT, {"event": event, "ticket_ids": ["T3", "T4"]})],
+            )
+            self.assertFalse(frappe.cache().exists(key))
+
+            # A change arriving after the running flush found nothing left is
+            # still sent by it, without scheduling another flush
+            publish.reset_mock()
+            publish_coalesced_event(event, "T5", room)
+            frappe.db.after_commit.run()
+            enqueue.reset_mock()
+
+            late = ["T6"]
+
+            def pop_with_late_change(key):
+                ticket_ids = pop_changed_ids(key)
+                if not ticket_ids and late:
+                    publish_coalesced_event(event, late.pop(), room)
+                    frappe.db.after_commit.run()
+                return ticket_ids
+
+            with patch(
+                "helpdesk.utils.pop_changed_ids", side_effect=pop_with_late_change
+            ):
+                flush_debounced_events(event, room)
+            self.assertEqual(
+                published(),
+                [(event, {"ticket_id": "T5"}), (event, {"ticket_id": "T6"})],
+            )
+            enqueue.assert_not_called()
+            self.assertFalse(frappe.cache().exists(key))
+
+    def test_changed_tickets_leave_navigation_window(self):
+        first, second, third = (make_ticket(priority="High") for _ in range(3))
+        frappe.db.after_commit.run()
+        clear_navigation_windows()
+
+        with patch("frappe.enqueue"):
+            tickets = get_navigation_tickets(third.name)
+            self.assertEqual(tickets[:3], [third.name, second.name, first.name])
+
+            first.reload()
+            first.subject = "Moved out of the window"
+            first.save()
+            frappe.db.after_commit.run()
+
+            tickets = get_navigation_tickets(third.name)
+            self.assertIn(second.name, tickets)
+            self.assertNotIn(first.name, tickets)
+
+    def test_sla_runtime_is_cached_across_saves(self):
+        ticket = make_ticket(priority="High")
+
+        def save(subject):
+            ticket.reload()
+            ticket.subject = subject
+            with count_queries() as counts:
+                ticket.save()
+            return counts
+
+        bump_cache_version(SLA_VERSION_KEY)
+        cold = save("Cold save")
+        warm = save("Warm save")
+
+        self.assertLess(warm["*"], cold["*"])
+        for table in ["HD Service Day", "HD Service Level Priority", "HD Holiday"]:
+            self.assertEqual(warm[table], 0, table)
+
     def test_hold_time_resolution_time(self):
         # Keep the ticket in paused state for 30 minutes to test hold time, resolution_by should increase by 30 minutes
         ticket = None
@@ -610,6 +814,136 @@ class TestHDTicket(IntegrationTestCase):
             len(comments), 3
         )  # 2 original comments + 1 merge comment (Ticket 1 merged into Ticket 2)
 
+    def test_ticket_merge_copies_all_rows(self):
+        source = make_ticket(description="Source ticket")
+        comments = [add_comment(source.name, f"Comment {i}") for i in range(3)]
+        comments[0].append("reactions", {"emoji": "👍", "user": "Administrator"})
+        comments[0].save()
+        frappe.get_doc(
+            {
+                "doctype": "File",
+                "file_name": "merge-test.txt",
+                "content": "merge test",
+                "attached_to_doctype": "HD Ticket",
+                "attached_to_name": source.name,
+            }
+        ).insert(ignore_permissions=True)
+        communication = frappe.get_last_doc(
+            "Communication",
+            filters={"reference_doctype": "HD Ticket", "reference_name": source.name},
+        )
+        communication.add_link("HD Ticket", source.name)
+        communication.save(ignore_permissions=True)
+        target = make_ticket(description="Target ticket")
+
+        def get_rows(ticket):
+            return {
+                "HD Ticket Comment": frappe.get_all(
+                    "HD Ticket Comment",
+                    filters={"reference_ticket": ticket},
+                    fields=["content", "creation", "owner"],
+                    order_by="creation",
+                ),
+                "Communication": frappe.get_all(
+                    "Communication",
+                    filters={
+                        "reference_doctype": "HD Ticket",
+                        "reference_name": ticket,
+                    },
+                    fields=["subject", "creation", "sender"],
+                    order_by="creation",
+                ),
+                "File": frappe.get_all(
+                    "File",
+                    filters={
+                        "attached_to_doctype": "HD Ticket",
+                        "attached_to_name": ticket,
+                    },
+                    fields=["file_name", "creation"],
+                    order_by="creation",
+                ),
+            }
+
+        before = get_rows(source.name)
+        target_before = get_rows(target.name)
+        merge_ticket(source=source.name, target=target.name)
+        after = get_rows(target.name)
+
+        for doctype, rows in before.items():
+            self.assertTrue(rows, doctype)
+            for row in rows:
+                self.assertIn(row, after[doctype], doctype)
+        self.assertEqual(
+            len(after["HD Ticket Comment"]),
+            len(before["HD Ticket Comment"])
+            + len(target_before["HD Ticket Comment"])
+            + 1,
+        )
+        self.assertEqual(
+            frappe.db.count(
+                "HD Comment Reaction",
+                {"parent": ["in", [c.name for c in comments]]},
+            ),
+            frappe.db.count(
+                "HD Comment Reaction",
+                {"parent": ["in", [f"{c.name}-{target.name}" for c in comments]]},
+            ),
+        )
+        links = frappe.get_all(
+            "Communication Link",
+            filters={
+                "parent": f"{communication.name}-{target.name}",
+                "link_doctype": "HD Ticket",
+            },
+            pluck="link_name",
+        )
+        self.assertIn(str(target.name), links)
+        self.assertNotIn(str(source.name), links)
+
+    def test_purge_tickets(self):
+        tickets = [make_ticket(description=f"Purge {i}") for i in range(2)]
+        names = [t.name for t in tickets]
+        comment = add_comment(names[0], "Purge comment")
+        comment.append("reactions", {"emoji": "👍", "user": "Administrator"})
+        comment.save()
+        tickets[1].reply_via_agent(message="Purge reply")
+
+        removed = purge_ticket_rows(names)
+
+        self.assertEqual(removed["HD Ticket"], 2)
+        self.assertEqual(removed["HD Ticket Comment"], 1)
+        self.assertEqual(removed["HD Comment Reaction"], 1)
+        self.assertGreaterEqual(removed["Communication"], 1)
+        self.assertFalse(frappe.db.exists("HD Ticket", {"name": ["in", names]}))
+        self.assertFalse(
+            frappe.db.exists("HD Comment Reaction", {"parent": comment.name})
+        )
+        self.assertFalse(
+            frappe.db.exists(
+                "Communication",
+                {"reference_doctype": "HD Ticket", "reference_name": ["in", names]},
+            )
+        )
+
+    def test_files_deleted_from_disk_after_commit(self):
+        ticket = make_ticket(description="Ticket with file")
+        file = frappe.get_doc(
+            {
+                "doctype": "File",
+                "file_name": "trash-test.txt",
+                "content": "trash test",
+                "attached_to_doctype": "HD Ticket",
+                "attached_to_name": ticket.name,
+            }
+        ).insert(ignore_permissions=True)
+        path = file.get_full_path()
+
+        delete_ticket_dependents([str(ticket.name)])
+        # A failing delete would still roll back here
+        self.assertTrue(os.path.exists(path))
+        frappe.db.after_commit.run()
+        self.assertFalse(os.path.exists(path))
+
     def test_ticket_split(self):
         ticket1 = make_ticket(description="Test Desc for split")
         ticket1.reply_via_agent(message="Test reply to split")
@@ -0,0 +1,251 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import json
+
+import frappe
+from frappe.model import no_value_fields, table_fields
+from frappe.model.document import Document
+from frappe.utils import add_to_date, get_datetime, now_datetime
+from pypika import Criterion
+
+# Every changed ticket field is journaled, these are shown in the activity
+# history and this is how they read there
+HISTORY_FIELDS = {
+    "status": "status",
+    "priority": "priority",
+    "agent_group": "team",
+    "ticket_type": "type",
+    "contact": "contact",
+}
+VERSION_RETENTION_DAYS = 90
+MIGRATION_BATCH_SIZE = 1000
+PURGE_BATCH_SIZE = 1000
+JOURNAL_COLUMNS = [
+    "name",
+    "ticket",
+    "actor",
+    "field_code",
+    "old_value",
+    "new_value",
+    "creation",
+    "modified",
+    "owner",
+    "modified_by",
+]
+
+
+class HDTicketChange(Document):
+    pass
+
+
+def log_ticket_changes(changes: list[dict], ignore_duplicates: bool = False):
+    """
+    Append rows to the ticket change journal with a single insert
+
+    :param changes: Dicts with `ticket`, `field_code`, `old_value` and
+        `new_value`. `actor`, `creation` and `name` are optional.
+    :param ignore_duplicates: Skip rows whose name already exists
+    """
+    if not changes:
+        return
+    now = now_datetime()
+    user = frappe.session.user
+    values = []
+    for change in changes:
+        actor = change.get("actor") or user
+        creation = change.get("creation") or now
+        values.append(
+            (
+                change.get("name") or frappe.generate_hash(length=10),
+                change["ticket"],
+                actor,
+                change["field_code"],
+                change.get("old_value"),
+                change.get("new_value"),
+                creation,
+                creation,
+                actor,
+                actor,
+            )
+        )
+    frappe.db.bulk_insert(
+        "HD Ticket Change",
+        fields=JOURNAL_COLUMNS,
+        values=values,
+        ignore_duplicates=ignore_duplicates,
+    )
+
+
+def get_field_changes(doc: Document) -> list[dict]:
+    """
+    Journal rows for every value field of `doc` which changed since its doc
+    before save, like the diff of a Version
+    """
+    before = doc.get_doc_before_save()
+    if not before:
+        return []
+    changes = []
+    for df in doc.meta.fields:
+        if df.fieldtype in no_value_fields or df.fieldtype in table_fields:
+            continue
+        old, new = before.get(df.fieldname), doc.get(df.fieldname)
+        if old == new or (old in (None, "") and new in (None, "")):
+            continue
+        changes.append(
+            {
+                "ticket": doc.name,
+                "field_code": df.fieldname,
+                "old_value": old,
+                "new_value": new,
+            }
+        )
+    return changes
+
+
+def get_ticket_changes(ticket: str) -> list[dict]:
+    """
+    Journal rows of `ticket` shaped like HD Ticket Activity rows, for the history
+    """
+    QBChange = frappe.qb.DocType("HD Ticket Change")
+    rows = (
+        frappe.qb.from_(QBChange)
+        .select(
+            QBChange.name,
+            QBChange.field_code,
+            QBChange.new_value,
+            QBChange.actor,
+            QBChange.creation,
+        )
+        .where(QBChange.ticket == str(ticket))
+        .where(QBChange.field_code.isin(list(HISTORY_FIELDS)))
+        .run(as_dict=True)
+    )
+    return [
+        frappe._dict(
+            name=row.name,
+            action=get_change_action(row.field_code, row.new_value),
+            owner=row.actor,
+            creation=row.creation,
+        )
+        for row in rows
+    ]
+
+
+def get_change_action(field_code: str, value) -> str:
+    return f"set {HISTORY_FIELDS.get(field_code, field_code)} to {value}"
+
+
+def migrate_ticket_versions(before=None, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """
+    Copy all changed fields of HD Ticket Version rows into the journal, and drop
+    the HD Ticket Activity rows they duplicate. Safe to run more than once.
+
+    :param before: Only migrate versions created before this
+    :return: Number of journal rows written
+    """
+    QBVersion = frappe.qb.DocType("Version")
+    last, total = "", 0
+    while True:
+        query = (
+            frappe.qb.from_(QBVersion)
+            .select(
+                QBVersion.name,
+                QBVersion.docname,
+                QBVersion.owner,
+                QBVersion.creation,
+                QBVersion.data,
+            )
+            .where(QBVersion.ref_doctype == "HD Ticket")
+            .where(QBVersion.name > last)
+            .orderby(QBVersion.name)
+            .limit(batch_size)
+        )
+        if before:
+            query = query.where(QBVersion.creation < before)
+        versions = query.run(as_dict=True)
+        if not versions:
+            break
+        last = versions[-1].name
+
+        changes = []
+        for version in versions:
+            try:
+                changed = json.loads(version.data or "{}").get("changed") or []
+            except ValueError:
+                continue
+            for field, old, new in changed:
+                changes.append(
+                    {
+                        "name": f"{version.name}-{field}",
+                        "ticket": version.docname,
+                        "actor": version.owner,
+                        "field_code": field,
+                        "old_value": old,
+                        "new_value": new,
+                        "creation": version.creation,
+                    }
+                )
+        log_ticket_changes(changes, ignore_duplicates=True)
+        delete_duplicate_activities(changes)
+        frappe.db.commit()  # nosemgrep
+        total += len(changes)
+    return total
+
+
+def delete_duplicate_activities(changes: list[dict]):
+    """
+    Saves before the journal wrote an activity row next to each version, drop
+    those once the version is in the journal
+    """
+    QBActivity = frappe.qb.DocType("HD Ticket Activity")
+    changes = [c for c in changes if c["field_code"] in HISTORY_FIELDS]
+    for i in range(0, len(changes), 200):
+        conditions = []
+        for change in changes[i : i + 200]:
+            creation = get_datetime(change["creation"])
+            conditions.append(
+                (QBActivity.ticket == change["ticket"])
+                & (
+                    QBActivity.action
+                    == get_change_action(change["field_code"], change["new_value"])
+                )
+                & QBActivity.creation[
+                    add_to_date(creation, seconds=-5) : add_to_date(creation, seconds=5)
+                ]
+            )
+        if conditions:
+            frappe.qb.from_(QBActivity).delete().where(Criterion.any(conditions)).run()
+
+
+def purge_ticket_versions():
+    """
+    Retention for HD Ticket Version rows. Versions older than
+    `VERSION_RETENTION_DAYS` are moved into the journal and deleted.
+    """
+    cutoff = add_to_date(now_datetime(), days=-VERSION_RETENTION_DAYS)
+    migrate_ticket_versions(before=cutoff)
+    delete_ticket_versions(before=cutoff)
+
+
+def delete_ticket_versions(before, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """
+    Delete HD Ticket Version rows created before `before`, which must already
+    be migrated, a batch per transaction
+
+    :return: Number of versions deleted
+    """
+    QBVersion = frappe.qb.DocType("Version")
+    total = 0
+    while names := (
+        frappe.qb.from_(QBVersion)
+        .select(QBVersion.name)
+        .where(QBVersion.ref_doctype == "HD Ticket")
+        .where(QBVersion.creation < before)
+        .limit(batch_size)
+        .run(pluck=True)
+    ):
+        frappe.qb.from_(QBVersion).delete().where(QBVersion.name.isin(names)).run()
+        frappe.db.commit()  # nosemgrep
+        total += len(names)
+    return total
@@ -0,0 +1,107 @@
+# Copyright (c) 2026, Frappe Technologies and Contributors
+# See license.txt
+
+import json
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from helpdesk.helpdesk.doctype.hd_ticket.api import get_history
+from helpdesk.helpdesk.doctype.hd_ticket_change.hd_ticket_change import (
+    delete_ticket_versions,
+    migrate_ticket_versions,
+)
+from helpdesk.test_utils import make_ticket
+
+
+class TestHDTicketChange(IntegrationTestCase):
+    def test_save_writes_journal(self):
+        ticket = make_ticket(priority="Low")
+        ticket.priority = "High"
+        ticket.save()
+
+        changes = frappe.get_all(
+            "HD Ticket Change",
+            filters={"ticket": ticket.name},
+            fields=["field_code", "old_value", "new_value"],
+        )
+        self.assertIn(
+            {"field_code": "priority", "old_value": "Low", "new_value": "High"},
+            changes,
+        )
+        self.assertFalse(
+            frappe.db.exists(
+                "Version", {"ref_doctype": "HD Ticket", "docname": ticket.name}
+            )
+        )
+        self.assertIn(
+            "set priority to High", [h.action for h in get_history(ticket.name)]
+        )
+
+    def test_save_journals_every_field(self):
+        ticket = make_ticket(priority="Low")
+        ticket.subject = "Changed subject"
+        ticket.save()
+
+        self.assertTrue(
+            frappe.db.exists(
+                "HD Ticket Change",
+                {
+                    "ticket": ticket.name,
+                    "field_code": "subject",
+                    "new_value": "Changed subject",
+                },
+            )
+        )
+        # The history only shows the fields it has labels for
+        self.assertNotIn(
+            "set subject to Changed subject",
+            [h.action for h in get_history(ticket.name)],
+        )
+
+    def test_delete_versions_in_batches(self):
+        ticket = make_ticket(priority="Low")
+        for _i in range(3):
+            frappe.get_doc(
+                {
+                    "doctype": "Version",
+                    "ref_doctype": "HD Ticket",
+                    "docname": ticket.name,
+                    "data": json.dumps({"changed": [["subject", "a", "b"]]}),
+                }
+            ).insert(ignore_permissions=True)
+        before = add_to_date(now_datetime(), seconds=1)
+
+        self.assertGreaterEqual(delete_ticket_versions(before, batch_size=2), 3)
+        self.assertFalse(
+            frappe.db.exists(
+                "Version", {"ref_doctype": "HD Ticket", "docname": ticket.name}
+            )
+        )
+
+    def test_migrate_versions(self):
+        ticket = make_ticket(priority="Low")
+        frappe.get_doc(
+            {
+                "doctype": "Version",
+                "ref_doctype": "HD Ticket",
+                "docname": ticket.name,
+                "data": json.dumps({"changed": [["priority", "Low", "Medium"]]}),
+            }
+        ).insert(ignore_permissions=True)
+
+        migrate_ticket_versions()
+        migrate_ticket_versions()
+
+        self.assertEqual(
+            frappe.db.count(
+                "HD Ticket Change",
+                {
+                    "ticket": ticket.name,
+                    "field_code": "priority",
+                    "new_value": "Medium",
+                },
+            ),
+            1,
+        )
@@ -5,8 +5,17 @@ import frappe
 from frappe import _
 from frappe.model.document import Document
 
+from helpdesk.helpdesk.doctype.hd_notification.utils import (
+    change_unread_counts,
+    create_notifications,
+)
 from helpdesk.mixins.mentions import HasMentions
-from helpdesk.utils import capture_event, get_doc_room, publish_event
+from helpdesk.utils import (
+    capture_event,
+    get_doc_room,
+    publish_coalesced_event,
+    publish_event,
+)
 
 PRESET_EMOJIS = ["👍", "👎", "❤️", "🎉", "👀", "✅"]
 
@@ -20,24 +29,18 @@ class HDTicketComment(HasMentions, Document):
 
     def after_insert(self):
         event = "helpdesk:ticket-comment"
-        data = {"ticket_id": self.reference_ticket}
         telemetry_event = "ticket_comment_added"
 
         room = get_doc_room("HD Ticket", self.reference_ticket)
-        publish_event(
-            event,
-            room=room,
-            data=data,
-        )
+        publish_coalesced_event(event, self.reference_ticket, room=room)
         capture_event(telemetry_event)
 
     def after_delete(self):
         event = "helpdesk:ticket-comment"
-        data = {"ticket_id": self.reference_ticket}
         telemetry_event = "ticket_comment_deleted"
 
         room = get_doc_room("HD Ticket", self.reference_ticket)
-        publish_event(event, room=room, data=data)
+        publish_coalesced_event(event, self.reference_ticket, room=room)
         capture_event(telemetry_event)
 
 
@@ -156,7 +159,7 @@ def notify_reaction(doc, emoji, user):
             "user_to": doc.commented_by,
             "notification_type": "Reaction",
         },
-        ["name"],
+        ["name", "read"],
         as_dict=True,
     )
 
@@ -166,18 +169,20 @@ def notify_reaction(doc, emoji, user):
             existing.name,
             {"message": message, "user_from": user, "read": 0},
         )
+        change_unread_counts({doc.commented_by: int(existing.read)})
     else:
-        frappe.get_doc(
-            {
-                "doctype": "HD Notification",
-                "message": message,
-                "notification_type": "Reaction",
-                "reference_comment": doc.name,
-                "reference_ticket": doc.reference_ticket,
-                "user_from": user,
-                "user_to": doc.commented_by,
-            }
-        ).insert(ignore_permissions=True)
+        create_notifications(
+            [
+                {
+                    "message": message,
+                    "notification_type": "Reaction",
+                    "reference_comment": doc.name,
+                    "reference_ticket": doc.reference_ticket,
+                    "user_from": user,
+                    "user_to": doc.commented_by,
+                }
+            ]
+        )
 
 
 @frappe.whitelist()
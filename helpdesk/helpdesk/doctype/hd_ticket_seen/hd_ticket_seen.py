@@ -0,0 +1,192 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import json
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import get_datetime, now_datetime
+
+SEEN_BUFFER_KEY = "helpdesk:ticket_seen_buffer"
+FLUSH_CHUNK_SIZE = 500
+
+
+class HDTicketSeen(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_unique(
+        "HD Ticket Seen", ["ticket", "user"], constraint_name="unique_ticket_user"
+    )
+
+
+def get_buffer_key() -> bytes:
+    return frappe.cache().make_key(SEEN_BUFFER_KEY)
+
+
+def get_flushing_key() -> bytes:
+    return get_buffer_key() + b":flushing"
+
+
+def get_buffer_field(ticket: str, user: str) -> str:
+    return json.dumps([str(ticket), user])
+
+
+def buffer_ticket_seen(ticket: str, user: str | None = None):
+    """
+    Record that `user` opened `ticket`. Only Redis is written here, rows are
+    upserted in bulk by `flush_ticket_seen`
+    """
+    user = user or frappe.session.user
+    if user == "Guest":
+        return
+    pipe = frappe.cache().pipeline()
+    pipe.hset(get_buffer_key(), get_buffer_field(ticket, user), str(now_datetime()))
+    pipe.execute()
+
+
+def get_last_seen(tickets: list[str], user: str | None = None) -> dict:
+    """
+    When `user` last saw each of `tickets`, including views not flushed yet
+
+    :return: Mapping of ticket to datetime, tickets never seen are left out
+    """
+    user = user or frappe.session.user
+    tickets = [str(t) for t in tickets]
+    if not tickets:
+        return {}
+
+    QBSeen = frappe.qb.DocType("HD Ticket Seen")
+    last_seen = dict(
+        frappe.qb.from_(QBSeen)
+        .select(QBSeen.ticket, QBSeen.last_seen)
+        .where(QBSeen.user == user)
+        .where(QBSeen.ticket.isin(tickets))
+        .run()
+    )
+
+    # Views taken by a running flush are not in the table until it commits
+    fields = [get_buffer_field(t, user) for t in tickets]
+    pipe = frappe.cache().pipeline()
+    pipe.hmget(get_buffer_key(), fields)
+    pipe.hmget(get_flushing_key(), fields)
+    pending, flushing = pipe.execute()
+    for ticket, *views in zip(tickets, pending, flushing):
+        for view in filter(None, views):
+            view = get_datetime(frappe.safe_decode(view))
+            last_seen[ticket] = max(last_seen.get(ticket) or view, view)
+    return last_seen
+
+
+def set_unread_flags(rows: list[dict], user: str | None = None):
+    """
+    Set `_unread` on ticket list rows. A ticket is unread if `user` has not
+    opened it since it was last modified. Rows need `name` and `modified`.
+    """
+    last_seen = get_last_seen([row.get("name") for row in rows], user)
+    for row in rows:
+        seen = last_seen.get(str(row.get("name")))
+        row["_unread"] = not seen or seen < get_datetime(row.get("modified"))
+
+
+def flush_ticket_seen():
+    """
+    Move buffered views into HD Ticket Seen and View Log, in bulk
+    """
+    cache = frappe.cache()
+    key = get_buffer_key()
+    flushing = get_flushing_key()
+
+    # A previous flush which failed halfway is retried before taking new views
+    pipe = cache.pipeline()
+    pipe.exists(flushing)
+    pipe.exists(key)
+    has_flushing, has_pending = pipe.execute()
+    if not has_flushing:
+        if not has_pending:
+            return
+        pipe.rename(key, flushing)
+        pipe.execute()
+
+    pipe.hgetall(flushing)
+    entries = pipe.execute()[0]
+    seen = []
+    for field, value in entries.items():
+        ticket, user = json.loads(frappe.safe_decode(field))
+        seen.append((ticket, user, get_datetime(frappe.safe_decode(value))))
+
+    for i in range(0, len(seen), FLUSH_CHUNK_SIZE):
+        chunk = seen[i : i + FLUSH_CHUNK_SIZE]
+        upsert_ticket_seen(chunk)
+        add_view_logs(chunk)
+    frappe.db.commit()  # nosemgrep
+
+    pipe.delete(flushing)
+    pipe.execute()
+
+
+def upsert_ticket_seen(seen: list[tuple]):
+    now = now_datetime()
+    values = []
+    for ticket, user, last_seen in seen:
+        values.extend(
+            [frappe.generate_hash(length=10), ticket, user, last_seen, now, now]
+            + [user, user]
+        )
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(seen))
+    frappe.db.sql(
+        f"""insert into `tabHD Ticket Seen`
+        (`name`, `ticket`, `user`, `last_seen`, `creation`, `modified`, `owner`, `modified_by`)
+        values {placeholders}
+        on duplicate key update
+            `last_seen` = greatest(`last_seen`, values(`last_seen`)),
+            `modified` = values(`modified`)""",
+        values,
+    )
+
+
+def add_view_logs(seen: list[tuple]):
+    """
+    Keep the single View Log per user and ticket which the activity view shows
+    """
+    QBViewLog = frappe.qb.DocType("View Log")
+    existing = set(
+        frappe.qb.from_(QBViewLog)
+        .select(QBViewLog.reference_name, QBViewLog.viewed_by)
+        .where(QBViewLog.reference_doctype == "HD Ticket")
+        .where(QBViewLog.reference_name.isin({t for t, _u, _s in seen}))
+        .run()
+    )
+    values = []
+    for ticket, user, last_seen in seen:
+        if (ticket, user) in existing:
+            continue
+        existing.add((ticket, user))
+        values.append(
+            (
+                frappe.generate_hash(length=10),
+                user,
+                "HD Ticket",
+                ticket,
+                last_seen,
+                last_seen,
+                user,
+                user,
+            )
+        )
+    if values:
+        frappe.db.bulk_insert(
+            "View Log",
+            fields=[
+                "name",
+                "viewed_by",
+                "reference_doctype",
+                "reference_name",
+                "creation",
+                "modified",
+                "owner",
+                "modified_by",
+            ],
+            values=values,
+        )
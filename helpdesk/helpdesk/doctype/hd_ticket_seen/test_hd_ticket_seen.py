@@ -0,0 +1,61 @@
+# Copyright (c) 2026, Frappe Technologies and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from helpdesk.helpdesk.doctype.hd_ticket_seen.hd_ticket_seen import (
+    buffer_ticket_seen,
+    flush_ticket_seen,
+    get_buffer_key,
+    get_flushing_key,
+    set_unread_flags,
+)
+from helpdesk.test_utils import make_ticket
+
+
+class TestHDTicketSeen(IntegrationTestCase):
+    def test_seen_is_buffered_then_flushed(self):
+        ticket = make_ticket()
+        user = "Administrator"
+        buffer_ticket_seen(ticket.name, user)
+
+        self.assertFalse(
+            frappe.db.exists("HD Ticket Seen", {"ticket": ticket.name, "user": user})
+        )
+        rows = [{"name": ticket.name, "modified": ticket.modified}]
+        set_unread_flags(rows, user)
+        self.assertFalse(rows[0]["_unread"])
+
+        flush_ticket_seen()
+        self.assertTrue(
+            frappe.db.exists("HD Ticket Seen", {"ticket": ticket.name, "user": user})
+        )
+        self.assertTrue(
+            frappe.db.exists(
+                "View Log",
+                {
+                    "reference_doctype": "HD Ticket",
+                    "reference_name": ticket.name,
+                    "viewed_by": user,
+                },
+            )
+        )
+
+        rows = [{"name": ticket.name, "modified": add_to_date(now_datetime(), hours=1)}]
+        set_unread_flags(rows, user)
+        self.assertTrue(rows[0]["_unread"])
+
+    def test_views_being_flushed_are_seen(self):
+        ticket = make_ticket()
+        user = "Administrator"
+        flush_ticket_seen()
+        buffer_ticket_seen(ticket.name, user)
+        # As a flush does before writing the rows
+        frappe.cache().rename(get_buffer_key(), get_flushing_key())
+
+        rows = [{"name": ticket.name, "modified": ticket.modified}]
+        set_unread_flags(rows, user)
+        self.assertFalse(rows[0]["_unread"])
+        flush_ticket_seen()
@@ -4,6 +4,11 @@
 import frappe
 from frappe.tests import IntegrationTestCase
 
+from helpdesk.reference_data import (
+    REFERENCE_DOCTYPES,
+    get_status_category,
+    get_statuses,
+)
 from helpdesk.setup.install import add_default_status
 
 # On IntegrationTestCase, the doctype test records and all
@@ -41,3 +46,24 @@ class IntegrationTestHDTicketStatus(IntegrationTestCase):
         self.assertRaises(
             frappe.ValidationError, frappe.delete_doc("HD Ticket Status", "Closed")
         )
+
+    def test_reference_data_invalidated_on_save(self):
+        self.assertIn("Open", get_statuses("Open"))
+        doc = frappe.get_doc(
+            {
+                "doctype": "HD Ticket Status",
+                "label_agent": "Registry Status",
+                "category": "Paused",
+            }
+        ).insert()
+        self.assertEqual(get_status_category(doc.name), "Paused")
+        self.assertIn(doc.name, get_statuses("Paused"))
+
+    def test_reference_doctypes_are_hooked(self):
+        doc_events = frappe.get_hooks("doc_events")
+        for doctype in REFERENCE_DOCTYPES:
+            self.assertIn(
+                "helpdesk.reference_data.clear_reference_data",
+                doc_events[doctype]["on_update"],
+                doctype,
+            )
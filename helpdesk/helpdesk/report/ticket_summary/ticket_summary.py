@@ -10,6 +10,8 @@ from frappe import _, scrub
 from frappe.utils import flt
 from six import iteritems
 
+from helpdesk.reference_data import get_reference_data
+
 
 def execute(filters=None):
     return TicketSummary(filters).run()
@@ -30,12 +32,7 @@ class TicketSummary:
 
     def get_ticket_statuses(self):
         """Get all enabled ticket statuses from HD Ticket Status doctype"""
-        status_data = frappe.get_all(
-            "HD Ticket Status",
-            filters={"enabled": 1},
-            fields=["label_agent", "color"],
-            order_by="`tabHD Ticket Status`.order",
-        )
+        status_data = [s for s in get_reference_data().statuses if s.enabled]
 
         self.statuses = [status.label_agent for status in status_data]
 
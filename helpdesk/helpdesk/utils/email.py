@@ -1,5 +1,11 @@
+import re
+from functools import partial
+
 import frappe
 from frappe.query_builder import DocType, Query
+from frappe.utils import add_to_date, cint, now_datetime
+
+from helpdesk.utils import agent_only
 
 
 def query_get_one(q: Query) -> dict:
@@ -39,3 +45,166 @@ def default_ticket_outgoing_email_account():
     )
 
     return query_get_one(r)
+
+
+# header used to attribute queued mails to the helpdesk template they came from
+TEMPLATE_HEADER = "X-Helpdesk-Template"
+TEMPLATE_HEADER_PATTERN = re.compile(rf"^{TEMPLATE_HEADER}: *(\S+)", re.MULTILINE)
+# minutes to wait before the nth retry of a failed mail is picked up again
+RETRY_BACKOFF_MINUTES = [1, 5, 30]
+# delivery counters per day and template, kept for a month
+EMAIL_METRICS_KEY = "helpdesk:email_metrics"
+EMAIL_METRICS_TTL = 60 * 60 * 24 * 31
+
+
+def queue_ticket_email(template: str, **kwargs) -> bool:
+    """
+    Put a rendered helpdesk mail in the Email Queue instead of sending it inside
+    the request. The queue row is committed along with the ticket, and the
+    scheduler flushes it in batches sharing an SMTP connection per account, so
+    SMTP latency or failures never roll back a ticket save.
+
+    :param template: Template identifier, recorded for delivery metrics
+    :return: Whether the mail was queued
+    """
+    email_headers = kwargs.pop("email_headers", None) or {}
+    email_headers[TEMPLATE_HEADER] = template
+    kwargs.pop("now", None)
+    kwargs.pop("delayed", None)
+
+    try:
+        frappe.sendmail(**kwargs, email_headers=email_headers, now=False, delayed=True)
+    except Exception:
+        frappe.log_error(title=f"Helpdesk: could not queue {template} email")
+        return False
+    frappe.db.after_commit.add(partial(count_email_event, template, "Queued"))
+    return True
+
+
+def send_queued_communication_emails(communication: str):
+    """
+    Send queued mails of `communication` right away. Enqueued after commit for
+    replies when `instantly_send_email` is enabled.
+    """
+    for name in frappe.get_all(
+        "Email Queue",
+        filters={"communication": communication, "status": "Not Sent"},
+        pluck="name",
+    ):
+        frappe.get_doc("Email Queue", name).send()
+
+
+def record_send_result(email_queue, before: tuple):
+    """
+    Count the outcome of a send attempt of a helpdesk mail, and delay its next
+    retry if it failed. Frappe retries a failed mail on the next flush, which
+    makes an SMTP outage burn all retries within minutes; `send_after` spaces
+    them out instead. Runs inside the flush, right after the attempt, and
+    leaves the transaction of the caller alone: the delay is set by a job
+    enqueued after commit.
+
+    :param before: Status and retry count of the mail before the attempt
+    """
+    status, retry = frappe.db.get_value(
+        "Email Queue", email_queue.name, ["status", "retry"]
+    ) or (None, None)
+    if (status, cint(retry)) == before:
+        # Not attempted, e.g. not due yet
+        return
+    if match := TEMPLATE_HEADER_PATTERN.search(email_queue.message or ""):
+        count_email_event(match.group(1), status)
+    if status == "Not Sent" and cint(retry):
+        minutes = RETRY_BACKOFF_MINUTES[
+            min(cint(retry), len(RETRY_BACKOFF_MINUTES)) - 1
+        ]
+        frappe.enqueue(
+            "helpdesk.helpdesk.utils.email.delay_email_retry",
+            queue="short",
+            enqueue_after_commit=True,
+            email_queue=email_queue.name,
+            retry=cint(retry),
+            send_after=add_to_date(now_datetime(), minutes=minutes),
+        )
+
+
+def delay_email_retry(email_queue: str, retry: int, send_after):
+    """
+    Set when a failed mail is retried, unless it was attempted again meanwhile
+    """
+    QBEmailQueue = frappe.qb.DocType("Email Queue")
+    (
+        frappe.qb.update(QBEmailQueue)
+        .set(QBEmailQueue.send_after, send_after)
+        .where(QBEmailQueue.name == email_queue)
+        .where(QBEmailQueue.status == "Not Sent")
+        .where(QBEmailQueue.retry == retry)
+        .run()
+    )
+
+
+def get_email_metrics_key(day) -> bytes:
+    return frappe.cache().make_key(f"{EMAIL_METRICS_KEY}:{day}")
+
+
+def count_email_event(template: str, status: str):
+    key = get_email_metrics_key(now_datetime().date())
+    pipe = frappe.cache().pipeline()
+    pipe.hincrby(key, f"{template}:{status}", 1)
+    pipe.expire(key, EMAIL_METRICS_TTL)
+    pipe.execute()
+
+
+@frappe.whitelist()
+@agent_only
+def get_email_metrics(days: int = 1) -> dict:
+    """
+    Helpdesk mails queued, sent, failed and retried per template over the last
+    `days`, from counters kept when mails are queued and sent
+    """
+    today = now_datetime().date()
+    pipe = frappe.cache().pipeline()
+    for i in range(max(cint(days), 1)):
+        pipe.hgetall(get_email_metrics_key(add_to_date(today, days=-i)))
+    metrics = {template: {} for template in EMAIL_TEMPLATES}
+    for counters in pipe.execute():
+        for field, count in counters.items():
+            template, status = frappe.safe_decode(field).split(":", 1)
+            statuses = metrics.setdefault(template, {})
+            statuses[status] = statuses.get(status, 0) + int(count)
+    return metrics
+
+
+INBOUND_METRICS_KEY = "helpdesk:inbound_metrics"
+
+
+def record_inbound_metrics(email_account: str, run: dict):
+    """
+    Store stats of the last inbound run of `email_account` and add its counts
+    to the running totals
+
+    :param run: Counts and timings of a single run
+    """
+    cache = frappe.cache()
+    metrics = cache.hget(INBOUND_METRICS_KEY, email_account) or {"totals": {}}
+    for key in ("fetched", "skipped", "duplicates", "processed", "errors"):
+        metrics["totals"][key] = metrics["totals"].get(key, 0) + run.get(key, 0)
+    metrics["last_run"] = run
+    cache.hset(INBOUND_METRICS_KEY, email_account, metrics)
+
+
+@frappe.whitelist()
+@agent_only
+def get_inbound_metrics() -> dict:
+    """
+    Throughput and lag of inbound mail per email account
+    """
+    metrics = frappe.cache().hgetall(INBOUND_METRICS_KEY) or {}
+    return {frappe.safe_decode(k): v for k, v in metrics.items()}
+
+
+EMAIL_TEMPLATES = [
+    "acknowledgement",
+    "reply_to_agents",
+    "reply_via_agent",
+    "share_feedback",
+]
@@ -34,9 +34,18 @@ scheduler_events = {
     "all": [
         "helpdesk.search.build_index_if_not_exists",
         "helpdesk.search.download_corpus",
+        "helpdesk.helpdesk.doctype.hd_notification.utils.send_notification_digests",
+        "helpdesk.helpdesk.doctype.hd_ticket_seen.hd_ticket_seen.flush_ticket_seen",
+        "helpdesk.helpdesk.doctype.hd_service_level_agreement.utils.sweep_breached_tickets",
+        "helpdesk.helpdesk.doctype.hd_escalation_rule.hd_escalation_rule.sweep_escalations",
+    ],
+    "hourly": [
+        "helpdesk.helpdesk.doctype.hd_notification.utils.reconcile_unread_counts",
+        "helpdesk.helpdesk.doctype.hd_team.utils.reconcile_agent_loads",
     ],
     "daily": [
-        "helpdesk.helpdesk.doctype.hd_ticket.hd_ticket.close_tickets_after_n_days"
+        "helpdesk.helpdesk.doctype.hd_ticket.hd_ticket.close_tickets_after_n_days",
+        "helpdesk.helpdesk.doctype.hd_ticket_change.hd_ticket_change.purge_ticket_versions",
     ],
 }
 
@@ -59,10 +68,131 @@ user_invitation = {
 doc_events = {
     "Contact": {
         "before_insert": "helpdesk.overrides.contact.before_insert",
+        "on_update": "helpdesk.helpdesk.doctype.hd_contact_search_term.hd_contact_search_term.sync_contact_search_terms",
+        "on_trash": "helpdesk.helpdesk.doctype.hd_contact_search_term.hd_contact_search_term.delete_contact_search_terms",
+    },
+    "Custom Field": {
+        "on_update": "helpdesk.api.doc.clear_list_meta_cache",
+        "on_trash": "helpdesk.api.doc.clear_list_meta_cache",
+    },
+    "Property Setter": {
+        "on_update": "helpdesk.api.doc.clear_list_meta_cache",
+        "on_trash": "helpdesk.api.doc.clear_list_meta_cache",
+    },
+    "HD View": {
+        "on_update": [
+            "helpdesk.api.doc.clear_list_meta_cache",
+            "helpdesk.helpdesk.doctype.hd_ticket.api.clear_view_navigation_windows",
+        ],
+        "on_trash": [
+            "helpdesk.api.doc.clear_list_meta_cache",
+            "helpdesk.helpdesk.doctype.hd_ticket.api.clear_view_navigation_windows",
+        ],
+    },
+    # Template fields are child rows, their changes save the template
+    "HD Ticket Template": {
+        "on_update": "helpdesk.api.doc.clear_list_meta_cache",
+        "on_trash": "helpdesk.api.doc.clear_list_meta_cache",
+    },
+    "HD Service Level Agreement": {
+        "on_update": "helpdesk.helpdesk.doctype.hd_service_level_agreement.utils.clear_sla_cache",
+        "on_trash": "helpdesk.helpdesk.doctype.hd_service_level_agreement.utils.clear_sla_cache",
+        "after_rename": "helpdesk.helpdesk.doctype.hd_service_level_agreement.utils.clear_sla_cache",
+    },
+    "HD Service Holiday List": {
+        "on_update": "helpdesk.helpdesk.doctype.hd_service_level_agreement.utils.clear_sla_cache",
+        "on_trash": "helpdesk.helpdesk.doctype.hd_service_level_agreement.utils.clear_sla_cache",
     },
     "Assignment Rule": {
-        "on_trash": "helpdesk.extends.assignment_rule.on_assignment_rule_trash",
+        "on_trash": [
+            "helpdesk.extends.assignment_rule.on_assignment_rule_trash",
+            "helpdesk.helpdesk.doctype.hd_team.utils.clear_team_agents",
+        ],
         "validate": "helpdesk.extends.assignment_rule.on_assignment_rule_validate",
+        "on_update": "helpdesk.helpdesk.doctype.hd_team.utils.clear_team_agents",
+    },
+    "HD Team": {
+        "on_update": [
+            "helpdesk.helpdesk.doctype.hd_team.utils.clear_team_agents",
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+        "on_trash": [
+            "helpdesk.helpdesk.doctype.hd_team.utils.clear_team_agents",
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+        "after_rename": [
+            "helpdesk.helpdesk.doctype.hd_team.utils.clear_team_agents",
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+    },
+    "HD Article Category": {
+        "on_update": "helpdesk.utils.clear_link_label_cache",
+        "on_trash": "helpdesk.utils.clear_link_label_cache",
+        "after_rename": "helpdesk.utils.clear_link_label_cache",
+    },
+    "HD Customer": {
+        "on_update": "helpdesk.utils.clear_link_label_cache",
+        "on_trash": "helpdesk.utils.clear_link_label_cache",
+        "after_rename": "helpdesk.utils.clear_link_label_cache",
+    },
+    "HD Ticket Priority": {
+        "on_update": [
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+        "on_trash": [
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+        "after_rename": [
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+    },
+    "HD Ticket Status": {
+        "on_update": [
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+        "on_trash": [
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+        "after_rename": [
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+    },
+    "HD Ticket Type": {
+        "on_update": [
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+        "on_trash": [
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+        "after_rename": [
+            "helpdesk.reference_data.clear_reference_data",
+            "helpdesk.utils.clear_link_label_cache",
+        ],
+    },
+    "HD Settings": {
+        "on_update": "helpdesk.reference_data.clear_reference_data",
+    },
+    "HD Agent": {
+        "on_update": "helpdesk.helpdesk.doctype.hd_team.utils.clear_team_agents",
+        "on_trash": "helpdesk.helpdesk.doctype.hd_team.utils.clear_team_agents",
+    },
+    "ToDo": {
+        "on_update": "helpdesk.helpdesk.doctype.hd_team.utils.update_todo_load",
+        "on_trash": "helpdesk.helpdesk.doctype.hd_team.utils.update_todo_load",
+    },
+    "Communication": {
+        "after_insert": "helpdesk.overrides.email_account.remember_received_communication",
     },
 }
 
@@ -81,6 +211,7 @@ permission_query_conditions = {
 # Override standard doctype classes
 override_doctype_class = {
     "Email Account": "helpdesk.overrides.email_account.CustomEmailAccount",
+    "Email Queue": "helpdesk.overrides.email_queue.CustomEmailQueue",
 }
 
 ignore_links_on_delete = [
@@ -1,5 +1,4 @@
-import frappe
-
+from helpdesk.helpdesk.doctype.hd_notification.utils import create_notifications
 from helpdesk.utils import extract_mentions
 
 
@@ -12,22 +11,17 @@ class HasMentions:
         mentions_field = getattr(self, "mentions_field", None)
         if not mentions_field:
             return
-        mentions = extract_mentions(self.get(mentions_field))
-        for mention in mentions:
-            values = frappe._dict(
-                doctype="HD Notification",
-                user_from=self.owner,
-                user_to=mention.email,
-                notification_type="Mention",
-                message=self.content,
-            )
-            # Why mention oneself?
-            if values.user_from == values.user_to:
-                continue
+        notifications = []
+        for mention in extract_mentions(self.get(mentions_field)):
+            values = {
+                "user_from": self.owner,
+                "user_to": mention.email,
+                "notification_type": "Mention",
+                "message": self.content,
+            }
             # Only comment (in tickets) has mentions as of now
             if self.doctype == "HD Ticket Comment":
-                values.reference_comment = self.name
-                values.reference_ticket = self.reference_ticket
-            if frappe.db.exists("HD Notification", values):
-                return
-            frappe.get_doc(values).insert()
+                values["reference_comment"] = self.name
+                values["reference_ticket"] = self.reference_ticket
+            notifications.append(values)
+        create_notifications(notifications, skip_existing=True)
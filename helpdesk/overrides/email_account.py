@@ -1,55 +1,42 @@
-from email import message_from_string
+import time
+from collections import deque
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+from functools import partial
 
 import frappe
 from frappe import _
 from frappe.email.doctype.email_account.email_account import EmailAccount
 from frappe.email.receive import InboundMail
 
+from helpdesk.helpdesk.utils.email import record_inbound_metrics
+
+HEADER_PARSER = BytesHeaderParser()
+SEEN_MESSAGE_IDS_TTL = 60 * 60 * 24 * 7
+# Mails fetched from an IMAP folder at a time, only one chunk is held in memory
+IMAP_FETCH_CHUNK_SIZE = 20
+# A pull holding a folder longer than this is assumed to be dead
+IMAP_PULL_LOCK_TTL = 60 * 15
+
 
 class CustomEmailAccount(EmailAccount):
-    def get_inbound_mails(self) -> list[InboundMail]:
-        """retrive and return inbound mails."""
-        mails = []
-
-        def process_mail(messages, append_to=None):
-            for index, message in enumerate(messages.get("latest_messages", [])):
-                try:
-                    _msg = message_from_string(
-                        message.decode("utf-8", errors="replace")
-                    )
-
-                    # Important: If the email is auto-generated, we do not create a ticket
-                    if _msg.get("X-Auto-Generated"):
-                        continue
-
-                    uid = (
-                        messages["uid_list"][index]
-                        if messages.get("uid_list")
-                        else None
-                    )
-                    seen_status = messages.get("seen_status", {}).get(uid)
-                    if self.email_sync_option != "UNSEEN" or seen_status != "SEEN":
-                        _inbound_mail = InboundMail(
-                            message,
-                            self,
-                            frappe.safe_decode(uid),
-                            seen_status,
-                            append_to,
-                        )
-                        mails.append(_inbound_mail)
-                except Exception as e:
-                    # Log the error but continue processing other emails
-                    frappe.log_error(
-                        title=_(
-                            "Error processing email at index {0}, message: {1}"
-                        ).format(index, e),
-                        message=frappe.get_traceback(),
-                    )
-                    self.handle_bad_emails(index, message, frappe.get_traceback())
-                    continue
+    def receive(self):
+        try:
+            return super().receive()
+        finally:
+            for folder in self.flags.helpdesk_pull_locks or []:
+                release_pull_lock(self.name, folder)
+            self.flags.helpdesk_pull_locks = None
 
+    def get_inbound_mails(self) -> "InboundMailStream":
+        """
+        Retrieve inbound mails. Only headers are parsed upfront, `InboundMail`
+        objects are built one at a time while the caller iterates. IMAP folders
+        are fetched in chunks as the caller reaches them.
+        """
+        stream = InboundMailStream(self)
         if not self.enable_incoming:
-            return []
+            return stream
 
         try:
             if self.service == "Frappe Mail":
@@ -57,7 +44,7 @@ class CustomEmailAccount(EmailAccount):
                 messages = frappe_mail_client.pull_raw(
                     last_received_at=self.last_synced_at
                 )
-                process_mail(messages)
+                stream.add(messages)
                 self.db_set(
                     "last_synced_at",
                     messages["last_received_at"],
@@ -70,27 +57,308 @@ class CustomEmailAccount(EmailAccount):
                 )
                 if self.use_imap:
                     # process all given imap folder
-                    for folder in self.imap_folder:
+                    for folder in self.get_folders_to_pull():
                         if email_server.select_imap_folder(folder.folder_name):
                             email_server.settings["uid_validity"] = folder.uidvalidity
-                            messages = (
-                                email_server.get_messages(
-                                    folder=f'"{folder.folder_name}"'
-                                )
-                                or {}
+                            stream.add_imap_folder(
+                                email_server,
+                                f'"{folder.folder_name}"',
+                                folder.append_to,
                             )
-                            process_mail(messages, folder.append_to)
+                    # closed once the caller went through all chunks
+                    stream.server = email_server
                 else:
                     # process the pop3 account
                     messages = email_server.get_messages() or {}
-                    process_mail(messages)
-
-                # close connection to mailserver
-                email_server.logout()
+                    stream.add(messages)
+                    # close connection to mailserver
+                    email_server.logout()
         except Exception:
             self.log_error(
                 title=_("Error while connecting to email account {0}").format(self.name)
             )
-            return []
+            return InboundMailStream(self)
+
+        return stream
+
+    def get_folders_to_pull(self) -> list:
+        """
+        With several IMAP folders, only the first one is pulled here. The others
+        are pulled by their own jobs so that folders are fetched in parallel.
+        """
+        if folder := self.flags.helpdesk_imap_folder:
+            folders = [f for f in self.imap_folder if f.folder_name == folder]
+        else:
+            for folder in self.imap_folder[1:]:
+                # Skipped while a pull of the folder is running
+                if is_pull_locked(self.name, folder.folder_name):
+                    continue
+                frappe.enqueue(
+                    "helpdesk.overrides.email_account.pull_imap_folder",
+                    queue="short",
+                    job_id=get_pull_lock_key(self.name, folder.folder_name),
+                    deduplicate=True,
+                    email_account=self.name,
+                    folder=folder.folder_name,
+                )
+            folders = self.imap_folder[:1]
+
+        # Pulls of the same folder, by the scheduler or a folder job, never
+        # overlap. Locks are released when `receive` is done.
+        locked = []
+        for folder in folders:
+            if acquire_pull_lock(self.name, folder.folder_name):
+                locked.append(folder)
+        self.flags.helpdesk_pull_locks = [f.folder_name for f in locked]
+        return locked
+
+
+def pull_imap_folder(email_account: str, folder: str):
+    account = frappe.get_doc("Email Account", email_account)
+    account.flags.helpdesk_imap_folder = folder
+    account.receive()
+
+
+def get_pull_lock_key(email_account: str, folder: str) -> str:
+    return f"helpdesk:pull_imap_folder:{email_account}:{folder}"
+
+
+def acquire_pull_lock(email_account: str, folder: str) -> bool:
+    key = frappe.cache().make_key(get_pull_lock_key(email_account, folder))
+    return bool(frappe.cache().set(key, 1, nx=True, ex=IMAP_PULL_LOCK_TTL))
+
+
+def is_pull_locked(email_account: str, folder: str) -> bool:
+    key = frappe.cache().make_key(get_pull_lock_key(email_account, folder))
+    return bool(frappe.cache().exists(key))
+
+
+def release_pull_lock(email_account: str, folder: str):
+    frappe.cache().delete(
+        frappe.cache().make_key(get_pull_lock_key(email_account, folder))
+    )
+
+
+def get_message_id(headers) -> str:
+    return (headers.get("Message-ID") or "").strip(" <>")
+
+
+def get_seen_key(email_account: str) -> str:
+    return frappe.cache().make_key(f"helpdesk:inbound_seen:{email_account}")
+
+
+def get_seen_message_ids(email_account: str, message_ids: set[str]) -> set[str]:
+    """
+    Message-IDs which already are communications. The per account seen-set in
+    Redis answers first, the rest are looked up with one query and remembered.
+    Newly received mails are added to the seen-set as they are ingested, see
+    `remember_received_communication`.
+
+    :param email_account: Account the mails were pulled from
+    :param message_ids: Message-IDs without angle brackets
+    :return: Subset of `message_ids` which were seen before
+    """
+    if not message_ids:
+        return set()
+
+    key = get_seen_key(email_account)
+    ids = list(message_ids)
+    pipe = frappe.cache().pipeline()
+    for message_id in ids:
+        pipe.zscore(key, message_id)
+    seen = {i for i, score in zip(ids, pipe.execute()) if score is not None}
+
+    if unknown := message_ids - seen:
+        found = set(
+            frappe.get_all(
+                "Communication",
+                filters={"message_id": ["in", list(unknown)]},
+                pluck="message_id",
+            )
+        )
+        remember_message_ids(email_account, found)
+        seen |= found
+    return seen
+
+
+def remember_message_ids(email_account: str, message_ids: set[str]):
+    if not message_ids:
+        return
+    key = get_seen_key(email_account)
+    now = time.time()
+    pipe = frappe.cache().pipeline()
+    pipe.zadd(key, dict.fromkeys(message_ids, now))
+    # Only the last few days matter for retries and replays
+    pipe.zremrangebyscore(key, 0, now - SEEN_MESSAGE_IDS_TTL)
+    pipe.expire(key, SEEN_MESSAGE_IDS_TTL)
+    pipe.execute()
+
+
+def remember_received_communication(doc, method=None):
+    """
+    Add the Message-ID of a mail to the seen-set of its account once it is
+    committed as a communication, so the next pull does not look it up again.
+    Hooked on `Communication` insert.
+    """
+    if doc.sent_or_received != "Received" or not doc.email_account:
+        return
+    if message_id := (doc.message_id or "").strip(" <>"):
+        frappe.db.after_commit.add(
+            partial(remember_message_ids, doc.email_account, {message_id})
+        )
+
+
+class InboundMailStream:
+    """
+    Inbound mails of one pull. Auto-generated mails are dropped using headers
+    alone, the rest are turned into `InboundMail` lazily and their raw bytes are
+    released once handed out, so a large backlog is never held twice in memory.
+    """
+
+    def __init__(self, email_account: CustomEmailAccount):
+        self.email_account = email_account
+        self.pending = deque()
+        # IMAP folders with UIDs left to fetch, see `add_imap_folder`
+        self.folders = deque()
+        self.server = None
+        self.count = 0
+        self.stats = {
+            "fetched": 0,
+            "skipped": 0,
+            "duplicates": 0,
+            "processed": 0,
+            "errors": 0,
+        }
+        self.max_lag = 0
+        self.started_at = time.monotonic()
+
+    def __len__(self):
+        return self.count + sum(len(uids) for _s, _f, _a, uids in self.folders)
+
+    def add_imap_folder(self, email_server, folder: str, append_to: str | None):
+        """
+        Queue the new mails of a selected IMAP folder. Only their UIDs are
+        fetched here, the mails are fetched in chunks while iterating.
+        """
+        if uids := list(email_server.get_new_mails(folder) or []):
+            self.folders.append((email_server, folder, append_to, deque(uids)))
+
+    def fetch_next_chunk(self):
+        email_server, folder, append_to, uids = self.folders[0]
+        chunk = [uids.popleft() for _i in range(min(IMAP_FETCH_CHUNK_SIZE, len(uids)))]
+        if not uids:
+            self.folders.popleft()
+        # `get_messages` fetches the mails `get_new_mails` returns
+        email_server.get_new_mails = lambda folder: chunk
+        try:
+            messages = email_server.get_messages(folder=folder) or {}
+        except Exception:
+            self.email_account.log_error(
+                title=_("Error while fetching mails of folder {0}").format(folder)
+            )
+            self.folders.clear()
+            return
+        self.add(messages, append_to)
+
+    def add(self, messages: dict, append_to: str | None = None):
+        account = self.email_account
+        candidates = []
+        for index, message in enumerate(messages.get("latest_messages", [])):
+            self.stats["fetched"] += 1
+            try:
+                headers = HEADER_PARSER.parsebytes(message)
+
+                # Important: If the email is auto-generated, we do not create a ticket
+                if headers.get("X-Auto-Generated"):
+                    self.stats["skipped"] += 1
+                    continue
+
+                uid = messages["uid_list"][index] if messages.get("uid_list") else None
+                seen_status = messages.get("seen_status", {}).get(uid)
+                if account.email_sync_option == "UNSEEN" and seen_status == "SEEN":
+                    self.stats["skipped"] += 1
+                    continue
+
+                candidates.append(
+                    (headers, (messages, index, uid, seen_status, append_to))
+                )
+            except Exception as e:
+                self.handle_error(index, message, e)
+
+        # Retried syncs and replays hand back mails which are already
+        # communications, drop them before any MIME parsing
+        seen = get_seen_message_ids(
+            account.name, {get_message_id(h) for h, _item in candidates} - {""}
+        )
+        for headers, item in candidates:
+            if message_id := get_message_id(headers):
+                if message_id in seen:
+                    self.stats["duplicates"] += 1
+                    continue
+                seen.add(message_id)
+            self.track_lag(headers.get("Date"))
+            self.pending.append(item)
+            self.count += 1
+
+    def __iter__(self):
+        account = self.email_account
+        while self.pending or self.folders:
+            if not self.pending:
+                self.fetch_next_chunk()
+                continue
+            messages, index, uid, seen_status, append_to = self.pending.popleft()
+            message = messages["latest_messages"][index]
+            messages["latest_messages"][index] = None
+            try:
+                mail = InboundMail(
+                    message, account, frappe.safe_decode(uid), seen_status, append_to
+                )
+            except Exception as e:
+                self.handle_error(index, message, e)
+                continue
+            self.stats["processed"] += 1
+            yield mail
+        self.close()
+        self.record()
+
+    def close(self):
+        if self.server:
+            # close connection to mailserver
+            self.server.logout()
+            self.server = None
+
+    def track_lag(self, date: str | None):
+        try:
+            sent_at = parsedate_to_datetime(date).timestamp()
+        except (TypeError, ValueError):
+            return
+        self.max_lag = max(self.max_lag, time.time() - sent_at)
+
+    def handle_error(self, index: int, message: bytes, e: Exception):
+        # Log the error but continue processing other emails
+        self.stats["errors"] += 1
+        frappe.log_error(
+            title=_("Error processing email at index {0}, message: {1}").format(
+                index, e
+            ),
+            message=frappe.get_traceback(),
+        )
+        self.email_account.handle_bad_emails(index, message, frappe.get_traceback())
 
-        return mails
+    def record(self):
+        if not self.stats["fetched"]:
+            return
+        duration = time.monotonic() - self.started_at
+        record_inbound_metrics(
+            self.email_account.name,
+            {
+                **self.stats,
+                "folder": self.email_account.flags.helpdesk_imap_folder,
+                "duration": round(duration, 3),
+                "throughput": (
+                    round(self.stats["processed"] / duration, 3) if duration else 0
+                ),
+                "max_lag": round(self.max_lag),
+                "finished_at": str(frappe.utils.now_datetime()),
+            },
+        )
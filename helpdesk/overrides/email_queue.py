@@ -0,0 +1,12 @@
+from frappe.email.doctype.email_queue.email_queue import EmailQueue
+
+from helpdesk.helpdesk.utils.email import record_send_result
+
+
+class CustomEmailQueue(EmailQueue):
+    def send(self, *args, **kwargs):
+        before = (self.status, self.retry or 0)
+        result = super().send(*args, **kwargs)
+        if self.reference_doctype == "HD Ticket":
+            record_send_result(self, before)
+        return result
@@ -0,0 +1,6 @@
+from helpdesk.setup.install import add_ticket_indexes
+
+
+def execute():
+    print("Adding composite indexes on HD Ticket")
+    add_ticket_indexes()
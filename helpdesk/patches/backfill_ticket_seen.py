@@ -0,0 +1,32 @@
+import json
+
+import frappe
+
+from helpdesk.helpdesk.doctype.hd_ticket_seen.hd_ticket_seen import upsert_ticket_seen
+
+
+def execute():
+    # `_seen` only lists users, the ticket's last change is the best guess of
+    # when they saw it
+    last = 0
+    while True:
+        tickets = frappe.get_all(
+            "HD Ticket",
+            filters={"_seen": ["is", "set"], "name": [">", last]},
+            fields=["name", "_seen", "modified"],
+            order_by="name asc",
+            limit=1000,
+        )
+        if not tickets:
+            break
+        last = tickets[-1].name
+        seen = []
+        for ticket in tickets:
+            try:
+                users = json.loads(ticket._seen or "[]")
+            except ValueError:
+                continue
+            seen.extend((str(ticket.name), user, ticket.modified) for user in users)
+        if seen:
+            upsert_ticket_seen(seen)
+        frappe.db.commit()  # nosemgrep
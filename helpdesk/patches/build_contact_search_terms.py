@@ -0,0 +1,13 @@
+import frappe
+
+from helpdesk.helpdesk.doctype.hd_contact_search_term.hd_contact_search_term import (
+    sync_contact_search_terms,
+)
+
+
+def execute():
+    contacts = frappe.get_all("Contact", pluck="name", order_by="creation")
+    for i, name in enumerate(contacts, start=1):
+        sync_contact_search_terms(frappe.get_doc("Contact", name))
+        if i % 500 == 0:
+            frappe.db.commit()  # nosemgrep
@@ -0,0 +1,8 @@
+import frappe
+
+
+def execute():
+    # Mails for existing notifications went out on insert, keep the digest
+    # from sending them again
+    QBNotification = frappe.qb.DocType("HD Notification")
+    frappe.qb.update(QBNotification).set(QBNotification.emailed, 1).run()
@@ -0,0 +1,134 @@
+import frappe
+
+from helpdesk.consts import DEFAULT_TICKET_PRIORITY, DEFAULT_TICKET_TYPE
+from helpdesk.utils import clear_versioned_cache, get_versioned_cache
+
+REFERENCE_DATA_VERSION_KEY = "helpdesk:reference_data_version"
+# Saving any of these invalidates the registry
+REFERENCE_DOCTYPES = [
+    "HD Ticket Status",
+    "HD Ticket Priority",
+    "HD Ticket Type",
+    "HD Team",
+    "HD Settings",
+]
+
+
+def get_reference_data() -> frappe._dict:
+    """
+    Statuses, priorities, ticket types, teams and their defaults. Built once
+    per process and rebuilt when the version in Redis changes.
+    """
+    return get_versioned_cache(REFERENCE_DATA_VERSION_KEY, build_reference_data)
+
+
+def get_customer_reference_data() -> frappe._dict:
+    """
+    Part of the registry portal customers see: statuses with their customer
+    labels, priorities and ticket types. Teams and agent labels are left out.
+    """
+    data = get_reference_data()
+    return frappe._dict(
+        statuses=[
+            frappe._dict(
+                {
+                    field: status[field]
+                    for field in ["name", "label_customer", "category", "color"]
+                }
+            )
+            for status in data.statuses
+            if status.enabled
+        ],
+        status_categories=data.status_categories,
+        priorities=data.priorities,
+        ticket_types=[
+            frappe._dict(name=t.name) for t in data.ticket_types if not t.disabled
+        ],
+    )
+
+
+def clear_reference_data(doc=None, method=None):
+    """
+    Bump the registry version so that every process rebuilds it. Hooked on
+    each of `REFERENCE_DOCTYPES`.
+    """
+    clear_versioned_cache(REFERENCE_DATA_VERSION_KEY)
+
+
+def build_reference_data() -> frappe._dict:
+    statuses = frappe.get_all(
+        "HD Ticket Status",
+        fields=[
+            "name",
+            "label_agent",
+            "label_customer",
+            "different_view",
+            "category",
+            "color",
+            "order",
+            "enabled",
+        ],
+        order_by="`tabHD Ticket Status`.order asc, `tabHD Ticket Status`.creation asc",
+    )
+    categories = {}
+    for status in statuses:
+        categories.setdefault(status.category, []).append(status.name)
+
+    settings = frappe.db.get_value(
+        "HD Settings",
+        None,
+        [
+            "default_ticket_status",
+            "ticket_reopen_status",
+            "default_priority",
+            "default_ticket_type",
+        ],
+        as_dict=True,
+    )
+    return frappe._dict(
+        statuses=statuses,
+        status_categories={s.name: s.category for s in statuses},
+        categories=categories,
+        default_status=settings.default_ticket_status,
+        reopen_status=settings.ticket_reopen_status,
+        priorities=frappe.get_all(
+            "HD Ticket Priority",
+            fields=["name", "integer_value"],
+            order_by="integer_value asc, name asc",
+        ),
+        default_priority=settings.default_priority or DEFAULT_TICKET_PRIORITY,
+        ticket_types=frappe.get_all(
+            "HD Ticket Type",
+            fields=["name", "priority", "disabled"],
+            order_by="name asc",
+        ),
+        default_ticket_type=settings.default_ticket_type or DEFAULT_TICKET_TYPE,
+        teams=frappe.get_all(
+            "HD Team",
+            fields=["name", "assignment_rule", "ignore_restrictions"],
+            order_by="name asc",
+        ),
+    )
+
+
+def get_status_category(status: str | None) -> str | None:
+    return get_reference_data().status_categories.get(status)
+
+
+def get_statuses(category: str, enabled_only: bool = False) -> list[str]:
+    """
+    Names of the statuses in `category`, in their display order
+    """
+    if not enabled_only:
+        return list(get_reference_data().categories.get(category, []))
+    return [
+        s.name
+        for s in get_reference_data().statuses
+        if s.category == category and s.enabled
+    ]
+
+
+def get_type_priority(ticket_type: str | None) -> str | None:
+    for row in get_reference_data().ticket_types:
+        if row.name == ticket_type:
+            return row.priority
@@ -146,11 +146,45 @@ class Search:
         if self.index_exists():
             self.redis.ft(self.index_name).add_document(doc_id, replace=True, **mapping)
 
+    def add_documents(self, docs: dict[str, dict]):
+        """
+        Index many documents in pipelined batches instead of one round trip each
+
+        :param docs: Mapping of document id to fields
+        """
+        if not (docs and self.index_exists()):
+            return
+        indexer = self.redis.ft(self.index_name).batch_indexer(chunk_size=500)
+        for id, doc in docs.items():
+            doc = frappe._dict(doc)
+            doc_id = self.redis.make_key(f"{self.prefix}:{id}").decode()
+            mapping = {
+                field.name: cstr(doc[field.name])
+                for field in self.schema
+                if field.name in doc
+            }
+            indexer.add_document(doc_id, replace=True, **mapping)
+        indexer.commit()
+
     def remove_document(self, id):
         key = self.redis.make_key(f"{self.prefix}:{id}").decode()
         if self.index_exists():
             self.redis.ft(self.index_name).delete_document(key)
 
+    def remove_documents(self, ids: list[str]) -> int:
+        """
+        Remove many documents in a single pipeline
+
+        :return: Number of documents which were in the index
+        """
+        if not (ids and self.index_exists()):
+            return 0
+        pipe = self.redis.pipeline()
+        for id in ids:
+            key = self.redis.make_key(f"{self.prefix}:{id}").decode()
+            self.redis.ft(self.index_name).delete_document(key, conn=pipe)
+        return sum(bool(removed) for removed in pipe.execute())
+
     def search(
         self,
         query,
@@ -258,7 +292,19 @@ class HelpdeskSearch(Search):
                 update_progress_bar("Indexing", i, total)
 
     def index_doc(self, doc):
-        id = f"{doc.doctype}:{doc.name}"
+        if fields := self.get_doc_fields(doc):
+            self.add_document(f"{doc.doctype}:{doc.name}", fields)
+
+    def index_docs(self, docs):
+        self.add_documents(
+            {
+                f"{doc.doctype}:{doc.name}": fields
+                for doc in docs
+                if (fields := self.get_doc_fields(doc))
+            }
+        )
+
+    def get_doc_fields(self, doc) -> dict | None:
         fields = None
         if doc.doctype == "HD Ticket":
             fields = {
@@ -277,13 +323,15 @@ class HelpdeskSearch(Search):
                 "headings": doc.headings,
                 "modified": doc.modified,
             }
-        if fields:
-            self.add_document(id, fields)
+        return fields
 
     def remove_doc(self, doc):
         key = f"{doc.doctype}:{doc.name}"
         self.remove_document(key)
 
+    def remove_docs(self, doctype: str, names: list[str]) -> int:
+        return self.remove_documents([f"{doctype}:{name}" for name in names])
+
     def extract_headings(self, content: str | None) -> str:
         try:
             soup = BeautifulSoup(content, "html.parser")
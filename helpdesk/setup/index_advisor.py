@@ -0,0 +1,110 @@
+import frappe
+
+from helpdesk.api.dashboard import COUNT_NAME
+
+LIST_FIELDS = ["name", "subject", "status", "priority", "agent_group", "modified"]
+
+
+def run(user: str = "Administrator") -> list[dict]:
+    """
+    Replay the common HD Ticket list, dashboard and report queries with
+    EXPLAIN as `user` and print the ones which scan a whole table.
+
+    :param user: User whose permission query conditions are applied
+    :return: Plan summary of every query
+    """
+    frappe.set_user(user)
+    report = []
+    for label, query in get_queries().items():
+        plan = frappe.db.sql(f"EXPLAIN {query}", as_dict=True)
+        full_scans = [
+            row.table for row in plan if row.type == "ALL" and row.table is not None
+        ]
+        report.append(
+            {
+                "query": label,
+                "full_scans": full_scans,
+                "keys": [row.key for row in plan if row.key],
+                "rows": sum(row.rows or 0 for row in plan),
+            }
+        )
+
+    for r in report:
+        status = "FULL SCAN " + ", ".join(r["full_scans"]) if r["full_scans"] else "ok"
+        print(f"{r['query']:<40} {status:<40} rows~{r['rows']:<10} {r['keys']}")
+    return report
+
+
+def get_sample(fieldname: str):
+    return frappe.db.get_value("HD Ticket", {fieldname: ["is", "set"]}, fieldname)
+
+
+def get_queries() -> dict[str, str]:
+    team = get_sample("agent_group")
+    customer = get_sample("customer")
+    raised_by = get_sample("raised_by")
+    today = frappe.utils.nowdate()
+    month_ago = frappe.utils.add_days(today, -30)
+
+    def get_list(**kwargs):
+        return str(frappe.get_list("HD Ticket", run=0, **kwargs))
+
+    return {
+        "list: default": get_list(
+            fields=LIST_FIELDS, order_by="modified desc", limit=20
+        ),
+        "list: open tickets of team": get_list(
+            fields=LIST_FIELDS,
+            filters={"agent_group": team, "status_category": "Open"},
+            order_by="modified desc",
+            limit=20,
+        ),
+        "list: total count": get_list(fields=[COUNT_NAME]),
+        "list: open count": get_list(
+            fields=[COUNT_NAME], filters={"status_category": "Open"}
+        ),
+        "recent tickets of customer": get_list(
+            fields=["name"],
+            filters={"customer": customer},
+            order_by="creation desc",
+            limit=2,
+        ),
+        "recent tickets of contact": get_list(
+            fields=["name"],
+            filters={"raised_by": raised_by},
+            order_by="creation desc",
+            limit=4,
+        ),
+        "dashboard: tickets by team": get_list(
+            fields=["agent_group", COUNT_NAME],
+            filters={"creation": ["between", [month_ago, today]]},
+            group_by="agent_group",
+        ),
+        "dashboard: team trend": get_list(
+            fields=["name"],
+            filters={
+                "creation": ["between", [month_ago, today]],
+                "agent_group": team,
+            },
+        ),
+        "report: opening date range": get_list(
+            fields=["name", "status"],
+            filters={"opening_date": ["between", [month_ago, today]]},
+        ),
+        "sla: breached tickets": get_list(
+            fields=["name"],
+            filters={"agreement_status": "Failed"},
+        ),
+        "auto close candidates": """
+            SELECT t.name
+            FROM `tabHD Ticket` t
+            INNER JOIN (
+                SELECT reference_name, MAX(communication_date) as last_communication_date
+                FROM `tabCommunication`
+                WHERE reference_doctype = 'HD Ticket'
+                GROUP BY reference_name
+            ) latest_comm ON t.name = latest_comm.reference_name
+            WHERE t.status = 'Replied'
+            AND latest_comm.last_communication_date < DATE_SUB(NOW(), INTERVAL 7 DAY)
+        """,
+    }
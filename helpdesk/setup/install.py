@@ -5,6 +5,7 @@ from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
 from frappe.permissions import add_permission, update_permission_property
 
 from helpdesk.consts import DEFAULT_ARTICLE_CATEGORY
+from helpdesk.reference_data import clear_reference_data
 
 from .default_template import create_default_template
 from .file import create_helpdesk_folder
@@ -31,8 +32,9 @@ def after_install():
     create_ticket_feedback_options()
     add_property_setters()
     add_website_settings_permission()
-    # Always keep this at last, because sql_ddl makes the db commit
+    # Always keep these at last, because sql_ddl makes the db commit
     add_fts_index()
+    add_ticket_indexes()
 
 
 def add_default_categories_and_articles():
@@ -353,6 +355,7 @@ def add_default_status():
 
     frappe.db.set_single_value("HD Settings", "default_ticket_status", "Open")
     frappe.db.set_single_value("HD Settings", "ticket_reopen_status", "Open")
+    clear_reference_data()
 
 
 def add_fts_index():
@@ -393,3 +396,29 @@ def add_index_if_not_exists(table, column, index_name):
             table=table, index_name=index_name, column=column
         )
     )
+
+
+# Composite indexes for the hot HD Ticket queries: permission query, list views,
+# recent tickets, dashboards and reports. Validate changes with
+# `bench --site <site> helpdesk-index-advisor` on a production sized copy.
+TICKET_INDEXES = [
+    ["agent_group", "status_category", "modified"],
+    ["agent_group", "creation"],
+    ["status_category", "modified"],
+    ["customer", "creation"],
+    ["raised_by", "creation"],
+    ["contact", "creation"],
+    ["opening_date", "agent_group"],
+    ["sla", "agreement_status"],
+    ["agreement_status", "response_by"],
+    ["agreement_status", "resolution_by"],
+]
+
+
+def get_index_name(fields: list[str]) -> str:
+    return "hd_" + "_".join(fields)[:55] + "_idx"
+
+
+def add_ticket_indexes():
+    for fields in TICKET_INDEXES:
+        frappe.db.add_index("HD Ticket", fields, index_name=get_index_name(fields))
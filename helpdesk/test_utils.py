@@ -1,3 +1,6 @@
+import re
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
 
 import frappe
@@ -280,3 +283,24 @@ def add_comment(
     if save:
         return comment.insert()
     return comment
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the queries run inside the block, in total under `*` and per table
+    """
+    counts = Counter()
+    sql = frappe.db.sql
+
+    def counting_sql(query, *args, **kwargs):
+        counts["*"] += 1
+        for table in set(re.findall(r"`tab([^`]+)`", str(query))):
+            counts[table] += 1
+        return sql(query, *args, **kwargs)
+
+    frappe.db.sql = counting_sql
+    try:
+        yield counts
+    finally:
+        del frappe.db.sql
@@ -1,5 +1,6 @@
 import functools
 import json
+import pickle
 import re
 
 import frappe
@@ -7,7 +8,6 @@ import phonenumbers
 from bs4 import BeautifulSoup
 from frappe import _
 from frappe.model.document import Document
-from frappe.query_builder import Order
 from frappe.realtime import get_website_room
 from frappe.utils import floor
 from frappe.utils.safe_exec import get_safe_globals
@@ -15,7 +15,10 @@ from frappe.utils.telemetry import capture as _capture
 from phonenumbers import NumberParseException
 from phonenumbers import PhoneNumberFormat as PNF
 from pypika import Criterion
-from pypika.functions import Replace
+
+COALESCED_EVENT = "helpdesk:tickets-changed"
+REALTIME_COALESCE_WINDOW_MS = 1000
+REALTIME_COALESCE_MAX_IDS = 500
 
 
 def check_permissions(doctype, parent, doc=None):
@@ -80,6 +83,112 @@ def publish_event(
     )
 
 
+def publish_coalesced_event(event: str, ticket_id: str, room: str | None = None):
+    """
+    Queue `ticket_id` as changed for `event` in a room. Everything queued in a
+    transaction is published once per room after commit
+
+    :param event: Event name. Example: "helpdesk:ticket-update"
+    :param ticket_id: Ticket which changed
+    :param room: Room to publish to, defaults to website room
+    """
+    room = room or get_website_room()
+    buffer = frappe.local.flags.helpdesk_realtime_buffer
+    if buffer is None:
+        buffer = frappe.local.flags.helpdesk_realtime_buffer = {}
+        frappe.db.after_commit.add(flush_coalesced_events)
+        frappe.db.after_rollback.add(discard_coalesced_events)
+    buffer.setdefault((room, event), set()).add(str(ticket_id))
+
+
+def discard_coalesced_events():
+    frappe.local.flags.pop("helpdesk_realtime_buffer", None)
+
+
+def flush_coalesced_events():
+    buffer = frappe.local.flags.pop("helpdesk_realtime_buffer", None) or {}
+    for (room, event), ticket_ids in buffer.items():
+        publish_changed_ids(event, room, ticket_ids)
+
+
+def get_coalesce_key(event: str, room: str) -> str:
+    # Decoded, as the window key is derived from it
+    return frappe.safe_decode(
+        frappe.cache().make_key(f"helpdesk:realtime:{room}:{event}")
+    )
+
+
+def publish_changed_ids(event: str, room: str, ticket_ids: set[str]):
+    """
+    Publish `ticket_ids` right away if nothing went out for this room and event
+    within the coalesce window, otherwise hold them back for a trailing flush
+    """
+    key = get_coalesce_key(event, room)
+    cache = frappe.cache()
+    if cache.set(f"{key}:window", 1, nx=True, px=REALTIME_COALESCE_WINDOW_MS):
+        ticket_ids = set(ticket_ids) | pop_changed_ids(key)
+        send_changed_ids(event, room, ticket_ids)
+        return
+
+    pipe = cache.pipeline()
+    pipe.sadd(key, *ticket_ids)
+    pipe.expire(key, 60)
+    pipe.execute()
+    # Set after the IDs are added, a running flush clears it before its last pop
+    if cache.set(f"{key}:scheduled", 1, nx=True, ex=60):
+        frappe.enqueue(
+            "helpdesk.utils.flush_debounced_events",
+            queue="short",
+            event=event,
+            room=room,
+        )
+
+
+def flush_debounced_events(event: str, room: str):
+    """
+    Trailing flush of the IDs held back for a room and event. Everything which
+    came in while the job was queued goes out together, and a new window opens.
+    """
+    key = get_coalesce_key(event, room)
+    frappe.cache().set(f"{key}:window", 1, px=REALTIME_COALESCE_WINDOW_MS)
+    scheduled = True
+    while True:
+        if ticket_ids := pop_changed_ids(key):
+            send_changed_ids(event, room, ticket_ids)
+            continue
+        if not scheduled:
+            break
+        # IDs added from here on schedule a new flush, the ones added before
+        # are taken by one more pop
+        frappe.cache().delete(f"{key}:scheduled")
+        scheduled = False
+
+
+def pop_changed_ids(key: str) -> set[str]:
+    # Raw client like the `sadd` in `publish_changed_ids`, the key is prefixed
+    # already
+    pipe = frappe.cache().pipeline()
+    pipe.spop(key, REALTIME_COALESCE_MAX_IDS)
+    return {frappe.safe_decode(i) for i in pipe.execute()[0] or []}
+
+
+def send_changed_ids(event: str, room: str, ticket_ids: set[str]):
+    """
+    A single change keeps the original event and payload so existing listeners
+    work as before. Several changes go out as one `helpdesk:tickets-changed`
+    message carrying the original event name and the changed IDs
+    """
+    ticket_ids = sorted(ticket_ids)
+    if len(ticket_ids) == 1:
+        frappe.publish_realtime(event, message={"ticket_id": ticket_ids[0]}, room=room)
+        return
+    frappe.publish_realtime(
+        COALESCED_EVENT,
+        message={"event": event, "ticket_ids": ticket_ids},
+        room=room,
+    )
+
+
 def get_doc_room(doctype: str, name: str) -> str:
     return f"open_doc:{doctype}/{name}"
 
@@ -189,6 +298,85 @@ def get_agents_team():
     return teams
 
 
+# Doctypes whose link labels are cached, labels of others are queried each time
+LINK_LABEL_DOCTYPES = {
+    "HD Article Category",
+    "HD Customer",
+    "HD Team",
+    "HD Ticket Priority",
+    "HD Ticket Status",
+    "HD Ticket Type",
+}
+
+
+def get_label_cache_key(doctype: str) -> str:
+    return f"helpdesk:link_labels:{doctype}"
+
+
+def get_link_labels(doctype: str, label_field: str, names: list) -> dict:
+    """
+    Resolve `label_field` of many `doctype` records with at most one query.
+    Labels of `LINK_LABEL_DOCTYPES` are cached per (doctype, label_field) and
+    the cache is cleared whenever a document of `doctype` changes.
+
+    :param doctype: DocType of the records
+    :param label_field: Field to be used as label
+    :param names: Names of the records
+    :return: Mapping of name to label
+    """
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    if doctype not in LINK_LABEL_DOCTYPES:
+        return dict(
+            frappe.get_all(
+                doctype,
+                filters={"name": ["in", list(names)]},
+                fields=["name", label_field],
+                as_list=True,
+            )
+        )
+
+    # Raw client, one `hmget` for all names. Values are pickled like the
+    # `hget`/`hset` of the cache wrapper.
+    key = frappe.cache().make_key(get_label_cache_key(doctype))
+    names = list(names)
+    labels = {}
+    missing = []
+    pipe = frappe.cache().pipeline()
+    pipe.hmget(key, [f"{label_field}:{name}" for name in names])
+    for name, label in zip(names, pipe.execute()[0]):
+        if label is None:
+            missing.append(name)
+        else:
+            labels[name] = pickle.loads(label)
+
+    if not missing:
+        return labels
+
+    rows = frappe.get_all(
+        doctype,
+        filters={"name": ["in", missing]},
+        fields=["name", label_field],
+        as_list=True,
+    )
+    labels.update(rows)
+    if found := {
+        f"{label_field}:{name}": pickle.dumps(label)
+        for name, label in rows
+        if label is not None
+    }:
+        pipe = frappe.cache().pipeline()
+        pipe.hset(key, mapping=found)
+        pipe.execute()
+    return labels
+
+
+def clear_link_label_cache(doc, method=None):
+    if doc.doctype in LINK_LABEL_DOCTYPES:
+        frappe.cache().delete_value(get_label_cache_key(doc.doctype))
+
+
 contact_default_columns = [
     {
         "label": "Name",
@@ -337,91 +525,98 @@ def parse_phone_number(phone_number, default_country="IN"):
 
 
 def get_contact(phone_number):
+    from helpdesk.helpdesk.doctype.hd_contact_search_term.hd_contact_search_term import (
+        get_contact_by_phone,
+    )
+
     if not phone_number:
         return {"mobile_no": phone_number}
 
-    cleaned_number = (
-        phone_number.strip()
-        .replace(" ", "")
-        .replace("-", "")
-        .replace("(", "")
-        .replace(")", "")
-        .replace("+", "")
-    )
-
-    # Check if the number is associated with a contact
-    Contact = frappe.qb.DocType("Contact")
-    normalized_phone = Replace(
-        Replace(
-            Replace(Replace(Replace(Contact.phone, " ", ""), "-", ""), "(", ""), ")", ""
-        ),
-        "+",
-        "",
-    )
-    query = (
-        frappe.qb.from_(Contact)
-        .select(Contact.name, Contact.full_name, Contact.image, Contact.phone)
-        .where(normalized_phone.like(f"%{cleaned_number}%"))
-        .orderby("modified", order=Order.desc)
-    )
-    contacts = query.run(as_dict=True)
-    return contacts[0] if contacts else {"mobile_no": phone_number}
+    return get_contact_by_phone(phone_number) or {"mobile_no": phone_number}
 
 
 def get_contact_by_phone_number(phone_number):
     """Get contact by phone number."""
+    return get_contact(get_lookup_number(phone_number))
+
+
+@functools.lru_cache(maxsize=1024)
+def get_lookup_number(phone_number):
+    """National number if `phone_number` is valid, else the number as is."""
+    if not phone_number:
+        return phone_number
     number = parse_phone_number(phone_number)
     if number.get("is_valid"):
-        return get_contact(number.get("national_number"))
-    else:
-        return get_contact(phone_number)
+        return number.get("national_number")
+    return phone_number
 
 
 def parse_call_log(call):
-    call["show_recording"] = False
-    call["_duration"] = seconds_to_duration(call.get("duration"))
-    if call.get("type") == "Incoming":
-        call["activity_type"] = "incoming_call"
-        contact = get_contact_by_phone_number(call.get("from"))
-        receiver = (
-            frappe.db.get_values(
-                "User", call.get("receiver"), ["full_name", "user_image"]
-            )[0]
-            if call.get("receiver")
-            else [None, None]
-        )
-        call["_caller"] = {
-            "label": contact.get("full_name", "Unknown"),
-            "image": contact.get("image"),
-        }
-        call["_receiver"] = {
-            "label": receiver[0] or "Unknown",
-            "image": receiver[1] or "",
-        }
-    elif call.get("type") == "Outgoing":
-        call["activity_type"] = "outgoing_call"
-        contact = get_contact_by_phone_number(call.get("to"))
-        caller = (
-            frappe.db.get_values(
-                "User", call.get("caller"), ["full_name", "user_image"]
-            )[0]
-            if call.get("caller")
-            else [None, None]
+    return parse_call_logs([call])[0]
+
+
+def parse_call_logs(calls):
+    """
+    Add display fields to call logs. Contacts of all numbers and all agents are
+    resolved with one query each.
+    """
+    from helpdesk.helpdesk.doctype.hd_contact_search_term.hd_contact_search_term import (
+        get_contacts_by_phone,
+        normalize_phone,
+    )
+
+    if not calls:
+        return []
+
+    numbers = []
+    users = set()
+    for call in calls:
+        number = None
+        if call.get("type") == "Incoming":
+            number = get_lookup_number(call.get("from"))
+            users.add(call.get("receiver"))
+        elif call.get("type") == "Outgoing":
+            number = get_lookup_number(call.get("to"))
+            users.add(call.get("caller"))
+        numbers.append(number)
+
+    contacts = get_contacts_by_phone([n for n in numbers if n])
+    users = {
+        u.name: u
+        for u in frappe.get_all(
+            "User",
+            filters={"name": ["in", [u for u in users if u]]},
+            fields=["name", "full_name", "user_image"],
         )
-        call["_caller"] = {
-            "label": caller[0] or "Unknown",
-            "image": caller[1] or "",
-        }
-        call["_receiver"] = {
+    }
+
+    for call, number in zip(calls, numbers):
+        call["show_recording"] = False
+        call["_duration"] = seconds_to_duration(call.get("duration"))
+        contact = contacts.get(normalize_phone(number)) or {"mobile_no": number}
+        _contact = {
             "label": contact.get("full_name", "Unknown"),
             "image": contact.get("image"),
         }
 
-    return call
-
-
-def parse_call_logs(calls):
-    return [parse_call_log(call) for call in calls] if calls else []
+        if call.get("type") == "Incoming":
+            call["activity_type"] = "incoming_call"
+            receiver = users.get(call.get("receiver")) or {}
+            call["_caller"] = _contact
+            call["_receiver"] = {
+                "label": receiver.get("full_name") or "Unknown",
+                "image": receiver.get("user_image") or "",
+            }
+        elif call.get("type") == "Outgoing":
+            call["activity_type"] = "outgoing_call"
+            caller = users.get(call.get("caller")) or {}
+            call["_caller"] = {
+                "label": caller.get("full_name") or "Unknown",
+                "image": caller.get("user_image") or "",
+            }
+            call["_receiver"] = _contact
+
+    return calls
 
 
 def is_json_valid(json_string):
@@ -444,3 +639,50 @@ def is_frappe_version(version: str, above: bool = False, below: bool = False):
     if below:
         return major_version < target_version
     return major_version == target_version
+
+
+# Per site and key, the version a cached value was built for along with it
+_versioned_cache: dict[tuple[str, str], tuple[str, object]] = {}
+
+
+def get_versioned_cache(key: str, build):
+    """
+    Value of `build()` kept in process and rebuilt whenever the version stored
+    in Redis under `key` changes. The version is read once per request or job.
+
+    :param key: Redis key holding the version
+    :param build: Builds the value, without arguments
+    """
+    local = frappe.flags.helpdesk_versioned_cache
+    if local is None:
+        local = frappe.flags.helpdesk_versioned_cache = {}
+    if key in local:
+        return local[key]
+
+    version = frappe.cache().get_value(key)
+    if not version:
+        version = frappe.generate_hash(length=10)
+        frappe.cache().set_value(key, version)
+    cache_key = (frappe.local.site, key)
+    cached = _versioned_cache.get(cache_key)
+    if not cached or cached[0] != version:
+        cached = (version, build())
+        _versioned_cache[cache_key] = cached
+    local[key] = cached[1]
+    return cached[1]
+
+
+def clear_versioned_cache(key: str):
+    """
+    Bump the version under `key` now, and again once the transaction ends so
+    that no process keeps what it read before the change was committed
+    """
+    bump = functools.partial(bump_cache_version, key)
+    bump()
+    frappe.db.after_commit.add(bump)
+    frappe.db.after_rollback.add(bump)
+
+
+def bump_cache_version(key: str):
+    frappe.cache().delete_value(key)
+    (frappe.flags.helpdesk_versioned_cache or {}).pop(key, None)
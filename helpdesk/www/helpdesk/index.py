@@ -4,6 +4,9 @@ from frappe.integrations.frappe_providers.frappecloud_billing import is_fc_site
 from frappe.utils import cint
 from frappe.utils.telemetry import capture
 
+from helpdesk.reference_data import get_customer_reference_data, get_reference_data
+from helpdesk.utils import is_agent
+
 no_cache = 1
 
 
@@ -25,7 +28,7 @@ def get_context_for_dev():
 
 
 def get_boot():
-    return frappe._dict(
+    boot = frappe._dict(
         {
             "default_route": get_default_route(),
             "site_name": frappe.local.site,
@@ -38,6 +41,11 @@ def get_boot():
             "time_format": frappe.get_system_settings("time_format"),
         }
     )
+    if is_agent():
+        boot.reference_data = get_reference_data()
+    elif frappe.session.user != "Guest":
+        boot.reference_data = get_customer_reference_data()
+    return boot
 
 
 def get_default_route():
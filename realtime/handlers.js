@@ -7,34 +7,28 @@ function helpdesk_handlers(socket) {
     if (!ticket_id) return;
     const room = open_doc_room("HD Ticket", ticket_id);
     socket.join(room);
+    add_ticket_viewer(socket, ticket_id);
 
-    // Notify all viewers in this ticket room about the new viewer
-    notify_ticket_viewers({
-      socket: socket,
-      ticket_id: ticket_id,
-    });
+    // Send the full viewer list to the new viewer only, others get a delta
+    send_ticket_viewers(socket, ticket_id);
   });
 
   socket.on("stop_view_ticket", (ticket_id) => {
     if (!ticket_id) return;
     const room = open_doc_room("HD Ticket", ticket_id);
     socket.leave(room);
-
-    // Notify remaining viewers that someone left
-    notify_ticket_viewers({
-      socket: socket,
-      ticket_id: ticket_id,
-    });
+    remove_ticket_viewer(socket, ticket_id);
   });
 
   socket.on("ticket_get_viewers", (ticket_id) => {
     if (!ticket_id) return;
-    // Send current viewers list to the requesting user only
-    notify_ticket_viewers({
-      socket: socket,
-      ticket_id: ticket_id,
-      toUser: true, // saying that whenever we ask for viewers, send only to the user who asked
-    });
+    send_ticket_viewers(socket, ticket_id);
+  });
+
+  socket.on("disconnect", () => {
+    for (const ticket_id of Array.from(socket_tickets.get(socket.id) || [])) {
+      remove_ticket_viewer(socket, ticket_id);
+    }
   });
 
   socket.on("notify_ticket_update", (ticket_id, field, value) => {
@@ -72,34 +66,92 @@ function helpdesk_handlers(socket) {
   });
 }
 
-function notify_ticket_viewers(args) {
-  if (!(args && args.socket && args.ticket_id)) return;
+// Presence registry, kept per process so viewer lookups never scan the
+// namespace. ticket_id -> Map(socket id -> user)
+const ticket_viewers = new Map();
+// socket id -> Set(ticket_id), used to clean up on disconnect
+const socket_tickets = new Map();
+// ticket_id -> { joined: Set, left: Set, timer }
+const pending_deltas = new Map();
+const PRESENCE_THROTTLE_MS = 500;
+
+function get_viewer_users(ticket_id) {
+  return new Set((ticket_viewers.get(ticket_id) || new Map()).values());
+}
 
-  const socket = args.socket;
-  const ticket_id = args.ticket_id;
+function add_ticket_viewer(socket, ticket_id) {
+  if (!ticket_viewers.has(ticket_id)) ticket_viewers.set(ticket_id, new Map());
+  const viewers = ticket_viewers.get(ticket_id);
+  if (viewers.has(socket.id)) return;
 
-  const ticket_room = open_doc_room("HD Ticket", ticket_id);
+  const was_viewing = get_viewer_users(ticket_id).has(socket.user);
+  viewers.set(socket.id, socket.user);
 
-  const clients = Array.from(socket.nsp.adapter.rooms.get(ticket_room) || []);
+  if (!socket_tickets.has(socket.id)) socket_tickets.set(socket.id, new Set());
+  socket_tickets.get(socket.id).add(ticket_id);
 
-  let users = [];
+  // A user with several tabs on the same ticket only joins once
+  if (!was_viewing) queue_viewer_delta(socket, ticket_id, socket.user, true);
+}
 
-  // Extract user information for each socket in the room
-  socket.nsp.sockets.forEach((sock) => {
-    if (clients.includes(sock.id)) {
-      users.push(sock.user);
-    }
-  });
+function remove_ticket_viewer(socket, ticket_id) {
+  const viewers = ticket_viewers.get(ticket_id);
+  if (!(viewers && viewers.has(socket.id))) return;
 
-  const target_room = args.toUser
-    ? user_room(args.socket.user) // Send to specific user only
-    : ticket_room; // Send to all viewers in the ticket room
+  viewers.delete(socket.id);
+  if (!viewers.size) ticket_viewers.delete(ticket_id);
+
+  const tickets = socket_tickets.get(socket.id);
+  if (tickets) {
+    tickets.delete(ticket_id);
+    if (!tickets.size) socket_tickets.delete(socket.id);
+  }
+
+  if (!get_viewer_users(ticket_id).has(socket.user)) {
+    queue_viewer_delta(socket, ticket_id, socket.user, false);
+  }
+}
+
+function queue_viewer_delta(socket, ticket_id, user, joined) {
+  if (!pending_deltas.has(ticket_id)) {
+    pending_deltas.set(ticket_id, {
+      joined: new Set(),
+      left: new Set(),
+      timer: setTimeout(
+        () => flush_viewer_delta(socket.nsp, ticket_id),
+        PRESENCE_THROTTLE_MS
+      ),
+    });
+  }
+
+  // A join and a leave within the same window cancel out
+  const delta = pending_deltas.get(ticket_id);
+  const [add, remove] = joined
+    ? [delta.joined, delta.left]
+    : [delta.left, delta.joined];
+  if (remove.has(user)) remove.delete(user);
+  else add.add(user);
+}
+
+function flush_viewer_delta(nsp, ticket_id) {
+  const delta = pending_deltas.get(ticket_id);
+  pending_deltas.delete(ticket_id);
+  if (!(delta && (delta.joined.size || delta.left.size))) return;
+
+  nsp.to(open_doc_room("HD Ticket", ticket_id)).emit("ticket_viewers_delta", {
+    ticket_id,
+    joined: Array.from(delta.joined),
+    left: Array.from(delta.left),
+    total_viewers: get_viewer_users(ticket_id).size,
+  });
+}
 
-  // Emit the notification with current viewers list
-  socket.nsp.to(target_room).emit("ticket_viewers", {
+function send_ticket_viewers(socket, ticket_id) {
+  const users = Array.from(get_viewer_users(ticket_id));
+  socket.emit("ticket_viewers", {
     ticket_id,
-    users: JSON.stringify(Array.from(new Set(users))), // Remove duplicate users
-    total_viewers: Array.from(new Set(users)).length,
+    users,
+    total_viewers: users.length,
   });
 }
 